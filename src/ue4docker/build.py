@@ -1,8 +1,27 @@
-import argparse, getpass, humanfriendly, json, os, platform, shutil, sys, tempfile, time
+import argparse, getpass, humanfriendly, json, os, platform, re, shutil, subprocess, sys, tempfile, time
 from .infrastructure import *
 from .version import __version__
 from os.path import join
 
+# The name of the BuildKit named build context used to supply the Engine source code from the host
+SOURCE_BUILD_CONTEXT = "engine-source"
+
+# The directories excluded from the source build context (anywhere in the tree, or only at the root)
+SOURCE_CONTEXT_EXCLUDED_DIRS = ["Intermediate", "Saved", "DerivedDataCache"]
+SOURCE_CONTEXT_EXCLUDED_ROOT_DIRS = [".git"]
+
+# The header that identifies .dockerignore files that we generated ourselves
+SOURCE_CONTEXT_IGNORE_HEADER = "# Generated by ue4-docker"
+
+# The location of the report describing the size of the debug symbols before and after compression in the ue4-minimal image
+DEBUG_COMPRESSION_REPORT = "/home/ue4/.ue4-docker/debug-compression.json"
+
+# The values assumed for labels that are missing from ue4-minimal images built by older versions of ue4-docker when verifying them for a rebase
+REBASE_LABEL_DEFAULTS = {
+    "com.adamrehn.ue4-docker.excluded.client": "0",
+    "com.adamrehn.ue4-docker.excluded.server": "0",
+}
+
 
 def _getCredential(args, name, envVar, promptFunc):
     # Check if the credential was specified via the command-line
@@ -34,6 +53,261 @@ def _getPassword(args):
     )
 
 
+def _getBuildSecrets(config, logger):
+    # Retrieve the values of any build secrets that the BuildGraph step reads from environment variables,
+    # skipping any that the user has already supplied to `docker build` via the `--docker-build-args` flag
+    secrets = {}
+    for var in config.opts.get("build_secret_vars", []):
+        if any(
+            [
+                arg.lstrip("-").startswith("secret")
+                and re.search(r"\bid={}(,|\s|$)".format(re.escape(var)), arg)
+                is not None
+                for arg in config.args.docker_build_args
+            ]
+        ):
+            continue
+        if var in os.environ:
+            secrets[var] = os.environ[var]
+        else:
+            logger.warning(
+                "Warning: build secret variable {} is not set in the environment".format(
+                    var
+                ),
+                False,
+            )
+    return secrets
+
+
+def _verifyRebaseSource(config, image, logger):
+    # Verify that the existing ue4-minimal image was built with the same Engine components as the image we are building,
+    # since rebasing copies the Installed Build from that image rather than building the Engine again
+    if not DockerUtils.exists(image):
+        logger.error(
+            "Error: cannot rebase because the image {} does not exist".format(image),
+            False,
+        )
+        sys.exit(1)
+    labels = DockerUtils.getLabels(image)
+    expected = {
+        "com.adamrehn.ue4-docker.excluded.{}".format(component): (
+            "1" if excluded == True else "0"
+        )
+        for component, excluded in config.opts["excluded_components"].items()
+    }
+    if "game_configurations" in config.opts or (
+        "com.adamrehn.ue4-docker.game-configurations" in labels
+    ):
+        expected["com.adamrehn.ue4-docker.game-configurations"] = config.opts.get(
+            "game_configurations"
+        )
+    if "compress_debug" in config.opts or (
+        "com.adamrehn.ue4-docker.debug-compression" in labels
+    ):
+        expected["com.adamrehn.ue4-docker.debug-compression"] = config.opts.get(
+            "compress_debug"
+        )
+
+    # Images built without labels cannot be verified, so we just warn the user about them
+    if not any([label in labels for label in expected]):
+        logger.warning(
+            "Warning: the image {} has no labels identifying its excluded components, unable to verify it before rebasing".format(
+                image
+            ),
+            False,
+        )
+        return
+
+    # Images built before the client and server labels were introduced always include the client and server targets
+    mismatched = [
+        label
+        for label, value in expected.items()
+        if labels.get(label, REBASE_LABEL_DEFAULTS.get(label)) != value
+    ]
+    if len(mismatched) > 0:
+        logger.error(
+            "Error: cannot rebase the image {} because it was built with different settings:".format(
+                image
+            ),
+            False,
+        )
+        for label in mismatched:
+            logger.error(
+                "- {}: expected {}, found {}".format(
+                    label,
+                    expected[label],
+                    labels.get(label, REBASE_LABEL_DEFAULTS.get(label)),
+                ),
+                False,
+            )
+        sys.exit(1)
+
+
+def _verifyRebaseConanSource(config, tag, logger):
+    # Determine where the ue4-full image will get its Conan packages from when rebasing, before we rebuild anything
+    # (Returns True if they can be copied from the existing ue4-full image, or False if they must be generated from the ue4-source image)
+    existing = "{}:{}".format(GlobalConfiguration.resolveTag("ue4-full"), tag)
+    if DockerUtils.exists(existing):
+        return True
+    source = "{}:{}".format(GlobalConfiguration.resolveTag("ue4-source"), tag)
+    if not DockerUtils.exists(source):
+        logger.error(
+            "Error: cannot rebase the ue4-full image because neither {} nor {} exists to provide its Conan packages".format(
+                existing, source
+            ),
+            False,
+        )
+        sys.exit(1)
+    logger.warning(
+        "Warning: the image {} does not exist, so its Conan packages will be generated from {}{}".format(
+            existing,
+            source,
+            (
+                " (this requires the Engine source tree in the BuildKit cache mount that was populated when building it)"
+                if config.opts.get("volatile_builder", False) == True
+                else ""
+            ),
+        ),
+        False,
+    )
+    return False
+
+
+def _reportDebugCompression(image, logger):
+    # Display the size of the debug symbols before and after compression, as recorded in the built image
+    try:
+        report = json.loads(DockerUtils.readFile(image, DEBUG_COMPRESSION_REPORT))
+    except Exception as e:
+        logger.warning(
+            "Warning: unable to read the debug symbol compression report from the image {}: {}".format(
+                image, e
+            ),
+            False,
+        )
+        return
+
+    logger.info(
+        "Debug symbols compressed using {}: {} files reduced from {} to {}".format(
+            report["method"],
+            report["files"],
+            humanfriendly.format_size(report["before"], binary=True),
+            humanfriendly.format_size(report["after"], binary=True),
+        ),
+        False,
+    )
+    if report["method"] != report["requested"]:
+        logger.warning(
+            "Warning: {} compression was requested but is not supported by the version of objcopy in the build prerequisites image".format(
+                report["requested"]
+            ),
+            False,
+        )
+    if report["failed"] > 0:
+        logger.warning(
+            "Warning: {} debug symbol files could not be compressed and were left as-is".format(
+                report["failed"]
+            ),
+            False,
+        )
+
+
+def _pushOciLayout(path, reference, logger):
+    # Push the image directly from the OCI image layout, streaming each blob to the registry without loading it into the Docker daemon
+    # (skopeo skips any blobs that already exist in the destination repository, so unchanged layers are not uploaded again)
+    transport = "oci-archive" if path.endswith(".tar") else "oci"
+    logger.action('Pushing {} to "{}"...'.format(path, reference))
+    startTime = time.time()
+    subprocess.run(
+        [
+            "skopeo",
+            "copy",
+            "--preserve-digests",
+            "{}:{}".format(transport, path),
+            "docker://{}".format(reference),
+        ],
+        check=True,
+    )
+    logger.action(
+        'Pushed "{}" in {}'.format(
+            reference, humanfriendly.format_timespan(time.time() - startTime)
+        ),
+        newline=False,
+    )
+
+
+def _getPushImages(config, builtImages, mainTags):
+    # Determine the tags applied to each of the images that we built, skipping the ue4-source image since it is only needed during the build process
+    # (The final image is also skipped if it was written to an OCI image layout, since it was never loaded into the Docker daemon)
+    images = []
+    for name in builtImages:
+        if name in ["ue4-source", "ue4-base-build-prerequisites", config.ociTarget]:
+            continue
+        tags = [config.prereqsTag] if name == "ue4-build-prerequisites" else mainTags
+        images.extend(
+            ["{}:{}".format(GlobalConfiguration.resolveTag(name), tag) for tag in tags]
+        )
+
+    # Include any image variants that we derived from the ue4-minimal image
+    for _, variantPrereqsTag in config.derivedVariants:
+        variantTag = "{}{}-{}".format(config.release, config.suffix, variantPrereqsTag)
+        images.append(
+            "{}:{}".format(
+                GlobalConfiguration.resolveTag("ue4-build-prerequisites"),
+                variantPrereqsTag,
+            )
+        )
+        for name in ["ue4-minimal", "ue4-full"]:
+            if name in builtImages:
+                images.append(
+                    "{}:{}".format(GlobalConfiguration.resolveTag(name), variantTag)
+                )
+
+    return images
+
+
+def _prepareSourceContext(sourceDir, logger, dryRun):
+    # Generate a .dockerignore file for the source directory, unless the user has supplied their own
+    # (Returns the path to the generated file so it can be removed once the build is complete)
+    ignoreFile = join(sourceDir, ".dockerignore")
+    generated = None
+    custom = os.path.exists(ignoreFile) and not FilesystemUtils.readFile(
+        ignoreFile
+    ).startswith(SOURCE_CONTEXT_IGNORE_HEADER)
+    if custom:
+        logger.info(
+            "Using existing .dockerignore file for source directory: {}".format(
+                ignoreFile
+            ),
+            False,
+        )
+    elif not dryRun:
+        patterns = SOURCE_CONTEXT_EXCLUDED_ROOT_DIRS + [
+            "**/{}".format(d) for d in SOURCE_CONTEXT_EXCLUDED_DIRS
+        ]
+        FilesystemUtils.writeFile(
+            ignoreFile,
+            "\n".join([SOURCE_CONTEXT_IGNORE_HEADER] + patterns) + "\n",
+        )
+        generated = ignoreFile
+
+    # Report the amount of data that will be transferred to BuildKit as the build context
+    # (A user-supplied .dockerignore file may contain arbitrary patterns, so we match them in the same way as Docker,
+    # whereas our own patterns only exclude directories by name, which we can skip much more quickly)
+    if custom:
+        files, size = FilesystemUtils.contextSize(sourceDir, ignoreFile)
+    else:
+        files, size = FilesystemUtils.directorySize(
+            sourceDir, SOURCE_CONTEXT_EXCLUDED_DIRS, SOURCE_CONTEXT_EXCLUDED_ROOT_DIRS
+        )
+    logger.info(
+        "Source build context transfer size: {} in {} files".format(
+            humanfriendly.format_size(size, binary=True), files
+        ),
+        False,
+    )
+    return generated
+
+
 def build():
     # Create our logger to generate coloured output on stderr
     logger = Logger(prefix="[{} build] ".format(sys.argv[0]))
@@ -110,6 +384,14 @@ def build():
             config.layoutDir,
             config.opts,
             config.combine,
+            ImageAnalyzer(
+                logger,
+                config.sizeBudgets,
+                config.warnSizeBudget,
+                config.compressionReport,
+            ),
+            config.outputOptions,
+            config.cacheRegistry,
         )
 
         # Resolve our main set of tags for the generated images; this is used only for Source and downstream
@@ -140,7 +422,9 @@ def build():
             logger.info("Custom name:   " + config.release, False)
         elif config.release is not None:
             logger.info("Release:       " + config.release, False)
-        if config.repository is not None:
+        if config.sourceDir is not None:
+            logger.info("Source dir:    " + config.sourceDir + "\n", False)
+        elif config.repository is not None:
             logger.info("Repository:    " + config.repository, False)
             logger.info("Branch/tag:    " + config.branch + "\n", False)
 
@@ -274,9 +558,27 @@ def build():
         elif config.containerPlatform == "linux":
             logger.info("LINUX CONTAINER SETTINGS", False)
             logger.info(
-                "Base OS image: {}\n".format(config.baseImage),
+                "Base OS image: {}".format(config.baseImage),
                 False,
             )
+            for variantBaseImage, variantPrereqsTag in config.derivedVariants:
+                logger.info(
+                    "Derived variant: {} ({})".format(
+                        variantPrereqsTag, variantBaseImage
+                    ),
+                    False,
+                )
+            if config.parallelismProfile is not None:
+                logger.info(
+                    "Parallelism:   {} actions ({} cores, {:.2f}GB memory, {}GB per action)".format(
+                        config.parallelismProfile["max_parallel_actions"],
+                        config.parallelismProfile["cores"],
+                        config.parallelismProfile["memory_gb"],
+                        config.parallelismProfile["gb_per_action"],
+                    ),
+                    False,
+                )
+            print("", file=sys.stderr, flush=True)
 
         # Report which Engine components are being excluded (if any)
         logger.info("GENERAL SETTINGS", False)
@@ -308,6 +610,106 @@ def build():
                 logger.info("- {}".format(component), False)
         else:
             logger.info("Not excluding any Engine components.", False)
+        if config.compressDebug is not None:
+            logger.info(
+                "Compressing debug symbols using {}.".format(config.compressDebug),
+                False,
+            )
+        if config.symbolsImage == True:
+            logger.info(
+                "Debug symbols will be published in the ue4-minimal-symbols image.",
+                False,
+            )
+        if config.layerCompression is not None:
+            logger.info(
+                "Layer compression: {}".format(
+                    ", ".join(
+                        [
+                            "{}={}".format(option, value)
+                            for option, value in config.outputOptions.items()
+                        ]
+                    )
+                ),
+                False,
+            )
+
+            # The classic image store keeps layers uncompressed and compresses them with gzip when pushing,
+            # so the compression settings only apply to locally-stored images when using the containerd image store
+            if (
+                config.dryRun == False
+                and config.layoutDir is None
+                and not DockerUtils.usesContainerdImageStore()
+            ):
+                logger.warning(
+                    "Warning: the Docker daemon is not using the containerd image store, so images will be stored uncompressed "
+                    + "and `docker push` will compress their layers with gzip irrespective of the `--layer-compression` flag.",
+                    False,
+                )
+        if config.cacheRegistry is not None:
+            logger.info(
+                "Build cache will be shared via {}".format(config.cacheRegistry),
+                False,
+            )
+
+            # The default BuildKit builder can only export the build cache to a registry when the Docker daemon uses the containerd image store
+            if (
+                config.dryRun == False
+                and config.layoutDir is None
+                and not DockerUtils.usesContainerdImageStore()
+            ):
+                logger.error(
+                    "Error: the `--cache-registry` flag requires the Docker daemon to use the containerd image store.",
+                    False,
+                )
+                sys.exit(1)
+        if config.ociOutput is not None:
+            logger.info(
+                "The {} image will be written to the OCI image layout {}{}.".format(
+                    config.ociTarget,
+                    config.ociOutput,
+                    (
+                        ' and pushed to "{}"'.format(config.ociPush)
+                        if config.ociPush is not None
+                        else ""
+                    ),
+                ),
+                False,
+            )
+
+            # The default BuildKit builder can only use the OCI exporter when the Docker daemon uses the containerd image store,
+            # and pushing the layout requires skopeo, so verify both before we spend hours building the Engine
+            if config.dryRun == False and config.layoutDir is None:
+                if not DockerUtils.usesContainerdImageStore():
+                    logger.error(
+                        "Error: the `--output-oci` flag requires the Docker daemon to use the containerd image store.",
+                        False,
+                    )
+                    sys.exit(1)
+                if config.ociPush is not None and shutil.which("skopeo") is None:
+                    logger.error(
+                        "Error: the `--oci-push` flag requires skopeo, which could not be found.",
+                        False,
+                    )
+                    sys.exit(1)
+
+        # If we are rebasing then verify that the existing ue4-minimal image matches our configuration,
+        # and that the Conan packages for the ue4-full image are available
+        rebaseConan = True
+        if config.rebase == True:
+            logger.info(
+                "Rebasing: the Engine will be copied from the existing ue4-minimal image.",
+                False,
+            )
+            if not config.dryRun:
+                _verifyRebaseSource(
+                    config,
+                    "{}:{}".format(
+                        GlobalConfiguration.resolveTag("ue4-minimal"), mainTags[0]
+                    ),
+                    logger,
+                )
+                if config.buildTargets["full"]:
+                    rebaseConan = _verifyRebaseConanSource(config, mainTags[0], logger)
 
         # Print a warning if the user is attempting to build Linux images under Windows
         if config.containerPlatform == "linux" and (
@@ -350,6 +752,15 @@ def build():
             username = ""
             password = ""
 
+        elif config.rebase == True:
+            # Don't bother prompting the user for any credentials when we're rebasing, since we don't build the ue4-source image
+            logger.info(
+                "Rebasing the existing ue4-minimal image, no Git credentials required.",
+                False,
+            )
+            username = ""
+            password = ""
+
         elif (
             not config.buildTargets["source"]
             or builder.willBuild("ue4-source", mainTags) == False
@@ -361,6 +772,15 @@ def build():
             username = ""
             password = ""
 
+        elif config.opts.get("source_mode", "git") == "copy":
+            # Don't bother prompting the user for any credentials if we're copying the source code from the host
+            logger.info(
+                "Copying the Engine source code from the host system, no Git credentials required.",
+                False,
+            )
+            username = ""
+            password = ""
+
         else:
             # Retrieve the Git username and password from the user when building the ue4-source image
             print(
@@ -375,8 +795,9 @@ def build():
         if config.args.monitor == True:
             resourceMonitor.start()
 
-        # Prep for endpoint cleanup, if necessary
+        # Prep for endpoint and generated .dockerignore cleanup, if necessary
         endpoint = None
+        sourceIgnoreFile = None
 
         try:
             # Keep track of our starting time
@@ -388,6 +809,16 @@ def build():
                     shutil.rmtree(config.layoutDir)
                 os.makedirs(config.layoutDir)
 
+            # If we're copying the source code from a host directory then prepare the build context and report its size
+            if (
+                config.opts.get("source_build_context", False) == True
+                and config.rebase == False
+                and builder.willBuild("ue4-source", mainTags)
+            ):
+                sourceIgnoreFile = _prepareSourceContext(
+                    config.sourceDir, logger, config.dryRun
+                )
+
             # Keep track of the images we've built
             builtImages = []
 
@@ -401,6 +832,15 @@ def build():
                 # Compute the build options for the UE4 build prerequisites image
                 # (This is the only image that does not use any user-supplied tag suffix, since the tag always reflects any customisations)
                 prereqsArgs = ["--build-arg", "BASEIMAGE=" + config.baseImage]
+
+                # If we are rebasing then pull the latest base image and bypass the build cache to pick up any system package updates
+                rebaseArgs = []
+                if config.rebase == True:
+                    rebaseArgs = ["--pull"] + (
+                        ["--no-cache"]
+                        if "--no-cache" not in config.platformArgs
+                        else []
+                    )
                 if config.containerPlatform == "windows":
                     prereqsArgs = prereqsArgs + [
                         "--build-arg",
@@ -415,7 +855,7 @@ def build():
                     builder.build_builtin_image(
                         "ue4-base-build-prerequisites",
                         [config.prereqsTag],
-                        commonArgs + config.platformArgs + prereqsArgs,
+                        commonArgs + config.platformArgs + rebaseArgs + prereqsArgs,
                         builtin_name="ue4-build-prerequisites",
                     )
                     builtImages.append("ue4-base-build-prerequisites")
@@ -423,7 +863,7 @@ def build():
                     builder.build_builtin_image(
                         "ue4-build-prerequisites",
                         [config.prereqsTag],
-                        commonArgs + config.platformArgs + prereqsArgs,
+                        commonArgs + config.platformArgs + rebaseArgs + prereqsArgs,
                     )
 
                 prereqConsumerArgs = [
@@ -435,7 +875,10 @@ def build():
                     builder.build(
                         "ue4-build-prerequisites",
                         [config.prereqsTag],
-                        commonArgs + config.platformArgs + prereqConsumerArgs,
+                        commonArgs
+                        + config.platformArgs
+                        + rebaseArgs
+                        + prereqConsumerArgs,
                         dockerfile_template=custom_prerequisites_dockerfile,
                         context_dir=os.path.dirname(custom_prerequisites_dockerfile),
                     )
@@ -444,18 +887,26 @@ def build():
             else:
                 logger.info("Skipping ue4-build-prerequisities image build.")
 
-            # Build the UE4 source image
-            if config.buildTargets["source"]:
+            # Build the UE4 source image, unless we are rebasing and copying the Engine from the existing ue4-minimal image
+            if config.buildTargets["source"] and config.rebase == False:
+                # Determine whether we are cloning the source code from git or copying it from the host
+                cloning = config.opts.get("source_mode", "git") == "git"
+
                 # Start the HTTP credential endpoint as a child process and wait for it to start
-                if config.opts["credential_mode"] == "endpoint":
+                if cloning and config.opts["credential_mode"] == "endpoint":
                     endpoint = CredentialEndpoint(username, password)
                     endpoint.start()
 
                 # If we're using build secrets then pass the Git username and password to the UE4 source image as secrets
                 secrets = {}
-                if config.opts["credential_mode"] == "secrets":
+                if cloning and config.opts["credential_mode"] == "secrets":
                     secrets = {"username": username, "password": password}
-                credentialArgs = [] if len(secrets) > 0 else endpoint.args()
+                credentialArgs = endpoint.args() if endpoint is not None else []
+
+                # If we're copying the source code from a host directory then pass it to BuildKit as a named build context
+                buildContexts = None
+                if config.opts.get("source_build_context", False) == True:
+                    buildContexts = {SOURCE_BUILD_CONTEXT: config.sourceDir}
 
                 ue4SourceArgs = prereqConsumerArgs + [
                     "--build-arg",
@@ -481,6 +932,7 @@ def build():
                     + credentialArgs
                     + changelistArgs,
                     secrets=secrets,
+                    build_contexts=buildContexts,
                 )
                 builtImages.append("ue4-source")
             else:
@@ -493,12 +945,54 @@ def build():
                     "TAG={}".format(mainTags[1]),
                 ]
 
+                # Pass any build secrets that are exposed to the BuildGraph step as environment variables
+                minimalSecrets = _getBuildSecrets(config, logger)
                 builder.build_builtin_image(
                     "ue4-minimal",
                     mainTags,
                     commonArgs + config.platformArgs + minimalArgs,
+                    secrets=minimalSecrets,
+                    oci_output=(
+                        config.ociOutput if config.ociTarget == "ue4-minimal" else None
+                    ),
                 )
                 builtImages.append("ue4-minimal")
+
+                # Report the size of the debug symbols before and after compression
+                # (We can only read the report when the image has been loaded into the Docker daemon)
+                if (
+                    config.compressDebug is not None
+                    and config.dryRun == False
+                    and config.layoutDir is None
+                    and config.ociTarget != "ue4-minimal"
+                ):
+                    _reportDebugCompression(
+                        "{}:{}".format(
+                            GlobalConfiguration.resolveTag("ue4-minimal"), mainTags[0]
+                        ),
+                        logger,
+                    )
+
+                # Build the image containing the debug symbols from the builder stage of the ue4-minimal image, which BuildKit has already cached
+                # (When rebasing, the Installed Build is reused as-is and so the existing debug symbols image remains valid)
+                if config.symbolsImage == True and config.rebase == False:
+                    if config.layoutDir is not None:
+                        logger.info(
+                            "The ue4-minimal-symbols image can be built from the `symbols` target of the generated ue4-minimal Dockerfile.",
+                            False,
+                        )
+                    else:
+                        builder.build_builtin_image(
+                            "ue4-minimal-symbols",
+                            mainTags,
+                            commonArgs
+                            + config.platformArgs
+                            + minimalArgs
+                            + ["--target", "symbols"],
+                            builtin_name="ue4-minimal",
+                            secrets=minimalSecrets,
+                        )
+                        builtImages.append("ue4-minimal-symbols")
             else:
                 logger.info("Skipping ue4-minimal image build.")
 
@@ -529,11 +1023,111 @@ def build():
                     + config.platformArgs
                     + minimalArgs
                     + infrastructureFlags,
+                    context_overrides=(
+                        {"rebase": rebaseConan} if config.rebase == True else None
+                    ),
+                    oci_output=(
+                        config.ociOutput if config.ociTarget == "ue4-full" else None
+                    ),
                 )
                 builtImages.append("ue4-full")
             else:
                 logger.info("Skipping ue4-full image build.")
 
+            # Push the final image from the OCI image layout if requested
+            if (
+                config.ociPush is not None
+                and config.dryRun == False
+                and config.layoutDir is None
+            ):
+                _pushOciLayout(config.ociOutput, config.ociPush, logger)
+
+            # Derive any additional image variants by copying the Installed Build onto their build prerequisites,
+            # rather than building the Engine again for each variant
+            for variantBaseImage, variantPrereqsTag in config.derivedVariants:
+                variantTags = [
+                    "{}{}-{}".format(config.release, config.suffix, variantPrereqsTag)
+                ]
+                variantPrereqsArgs = ["--build-arg", "BASEIMAGE=" + variantBaseImage]
+                variantConsumerArgs = [
+                    "--build-arg",
+                    "PREREQS_TAG={}".format(variantPrereqsTag),
+                ]
+                if custom_prerequisites_dockerfile is not None:
+                    builder.build_builtin_image(
+                        "ue4-base-build-prerequisites",
+                        [variantPrereqsTag],
+                        commonArgs
+                        + config.platformArgs
+                        + rebaseArgs
+                        + variantPrereqsArgs,
+                        builtin_name="ue4-build-prerequisites",
+                    )
+                    builder.build(
+                        "ue4-build-prerequisites",
+                        [variantPrereqsTag],
+                        commonArgs
+                        + config.platformArgs
+                        + rebaseArgs
+                        + variantConsumerArgs,
+                        dockerfile_template=custom_prerequisites_dockerfile,
+                        context_dir=os.path.dirname(custom_prerequisites_dockerfile),
+                    )
+                else:
+                    builder.build_builtin_image(
+                        "ue4-build-prerequisites",
+                        [variantPrereqsTag],
+                        commonArgs
+                        + config.platformArgs
+                        + rebaseArgs
+                        + variantPrereqsArgs,
+                    )
+
+                # Verify that the ue4-minimal image we are deriving from matches our configuration
+                if not config.dryRun:
+                    _verifyRebaseSource(
+                        config,
+                        "{}:{}".format(
+                            GlobalConfiguration.resolveTag("ue4-minimal"), mainTags[0]
+                        ),
+                        logger,
+                    )
+
+                # Copy the Installed Build from the ue4-minimal image (and the Conan packages from the ue4-full image) we built for our main set of prerequisites
+                variantArgs = variantConsumerArgs + [
+                    "--build-arg",
+                    "SOURCE_PREREQS_TAG={}".format(config.prereqsTag),
+                    "--build-arg",
+                    "TAG={}".format(mainTags[1]),
+                ]
+                builder.build_builtin_image(
+                    "ue4-minimal",
+                    variantTags,
+                    commonArgs + config.platformArgs + variantArgs,
+                    context_overrides={"rebase": True},
+                )
+                if config.buildTargets["full"]:
+                    builder.build_builtin_image(
+                        "ue4-full",
+                        variantTags,
+                        commonArgs
+                        + config.platformArgs
+                        + variantArgs
+                        + infrastructureFlags,
+                        context_overrides={"rebase": True},
+                    )
+
+            # Push the built images to their registries if requested
+            if config.push == True:
+                if config.layoutDir is not None:
+                    logger.info(
+                        "Skipping push, since Dockerfiles were generated rather than built.",
+                        False,
+                    )
+                else:
+                    pusher = ImagePusher(logger, config.pushJobs, dryRun=config.dryRun)
+                    pusher.pushMultiple(_getPushImages(config, builtImages, mainTags))
+
             # If we are generating Dockerfiles then include information about the options used to generate them
             if config.layoutDir is not None:
                 # Determine whether we generated a single combined Dockerfile or a set of Dockerfiles
@@ -607,10 +1201,16 @@ def build():
             if endpoint is not None:
                 endpoint.stop()
 
+            # Remove the .dockerignore file we generated for the source directory
+            if sourceIgnoreFile is not None:
+                os.unlink(sourceIgnoreFile)
+
         except (Exception, KeyboardInterrupt) as e:
             # One of the images failed to build
             logger.error("Error: {}".format(e))
             resourceMonitor.stop()
             if endpoint is not None:
                 endpoint.stop()
+            if sourceIgnoreFile is not None and os.path.exists(sourceIgnoreFile):
+                os.unlink(sourceIgnoreFile)
             sys.exit(1)
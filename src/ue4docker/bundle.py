@@ -0,0 +1,458 @@
+import argparse, concurrent.futures, gzip, hashlib, humanfriendly, io, json, os, posixpath, shutil, subprocess, sys, tarfile, time
+from .infrastructure import *
+from .infrastructure.InstalledBuildManifest import HASH_CHUNK_SIZE
+
+# zstd compression requires the optional zstandard package
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# The version of the bundle format, which is recorded in the bundle index
+BUNDLE_VERSION = 1
+
+# The name of the bundle index file
+BUNDLE_INDEX = "bundle.json"
+
+# The file extension used for layer blobs compressed using each supported method
+EXTENSIONS = {"zstd": ".zst", "gzip": ".gz"}
+
+# The default compression level for each supported method
+DEFAULT_LEVELS = {"zstd": 9, "gzip": 6}
+
+# The number of bytes read from the start of each archive member to determine whether it is a layer or a metadata file
+HEADER_SIZE = 512
+
+
+def _chainIds(diffIds):
+    # Compute the chain ID for each layer in an image, which identifies the layer together with all of the layers beneath it
+    chainIds = []
+    for diffId in diffIds:
+        if len(chainIds) == 0:
+            chainIds.append(diffId)
+        else:
+            chainIds.append(
+                "sha256:"
+                + hashlib.sha256(
+                    "{} {}".format(chainIds[-1], diffId).encode("utf-8")
+                ).hexdigest()
+            )
+    return chainIds
+
+
+def _localChainIds():
+    # Retrieve the chain IDs of every layer in every image stored by the Docker daemon
+    client = DockerUtils.connect()
+    chainIds = set()
+    for image in client.images.list(all=True):
+        chainIds.update(
+            _chainIds(image.attrs.get("RootFS", {}).get("Layers", None) or [])
+        )
+    return chainIds
+
+
+def _resolveLink(path, links):
+    # Resolve a path in a saved image archive that may be a link to another layer (links are relative to the directory containing them)
+    while path in links:
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(path), links[path]))
+    return path
+
+
+def _openCompressed(path, method, level):
+    # Open a file for writing with the specified compression method, using multiple threads for zstd
+    if method == "zstd":
+        compressor = zstandard.ZstdCompressor(level=level, threads=-1)
+        return compressor.stream_writer(open(path, "wb"), closefd=True)
+    return gzip.open(path, "wb", compresslevel=level)
+
+
+def _openDecompressed(path, method):
+    # Open a compressed file for reading
+    if method == "zstd":
+        return zstandard.ZstdDecompressor().stream_reader(
+            open(path, "rb"), closefd=True
+        )
+    return gzip.open(path, "rb")
+
+
+def _verifyLayer(bundleDir, method, layer):
+    # Decompress a layer blob and verify that its contents match the recorded digest
+    hash = hashlib.sha256()
+    size = 0
+    with _openDecompressed(os.path.join(bundleDir, layer["file"]), method) as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hash.update(chunk)
+            size += len(chunk)
+    return "sha256:" + hash.hexdigest() == layer["digest"] and size == layer["size"]
+
+
+def _create(args, logger):
+    # Verify that we can use the requested compression method
+    if args.compression == "zstd" and zstandard is None:
+        logger.error(
+            "Error: zstd compression requires the zstandard package, which can be installed via `pip install ue4-docker[zstd]`.",
+            False,
+        )
+        sys.exit(1)
+    level = args.level if args.level is not None else DEFAULT_LEVELS[args.compression]
+
+    # Determine if the user specified an image and a tag or just a tag
+    images = [
+        GlobalConfiguration.resolveTag(
+            "ue4-full:{}".format(image) if ":" not in image else image
+        )
+        for image in args.images
+    ]
+    for image in images:
+        if DockerUtils.exists(image) == False:
+            logger.error(
+                'Error: the specified container image "{}" does not exist.'.format(
+                    image
+                ),
+                False,
+            )
+            sys.exit(1)
+
+    # Determine which layers the target host already has, using the chain IDs so that a layer is only skipped
+    # if the target has it on top of the same parent layers, since that is when `docker load` reuses an existing layer
+    existing = set()
+    if args.exclude_layers is not None:
+        with open(args.exclude_layers, "r") as f:
+            existing = set(json.load(f)["chainIds"])
+
+    client = DockerUtils.connect()
+    needed = set()
+    skippable = set()
+    for image in images:
+        diffIds = client.images.get(image).attrs["RootFS"]["Layers"]
+        for diffId, chainId in zip(diffIds, _chainIds(diffIds)):
+            (skippable if chainId in existing else needed).add(diffId)
+    skippable = skippable - needed
+
+    # Stream the images out of the Docker daemon, compressing each layer into a content-addressed blob as it is read
+    # (Layers stored under their digest can be skipped without reading them, whereas legacy `layer.tar` entries must be hashed first)
+    os.makedirs(os.path.join(args.bundle, "blobs", "sha256"), exist_ok=True)
+    os.makedirs(os.path.join(args.bundle, "meta"), exist_ok=True)
+    logger.action("Saving {} to bundle {}...".format(", ".join(images), args.bundle))
+    startTime = time.time()
+    meta = []
+    links = {}
+    layers = {}
+    process = subprocess.Popen(["docker", "save"] + images, stdout=subprocess.PIPE)
+    with tarfile.open(fileobj=process.stdout, mode="r|") as archive:
+        for member in archive:
+            # Legacy archives link duplicate layers to the first copy, so we record links and recreate them when loading
+            if member.issym():
+                links[member.name] = member.linkname
+                continue
+            if not member.isfile():
+                continue
+
+            # Skip layers that are stored under the digest of a layer that the target already has
+            name = member.name
+            if name.startswith("blobs/sha256/") and (
+                "sha256:" + posixpath.basename(name) in skippable
+            ):
+                layers[name] = {
+                    "digest": "sha256:" + posixpath.basename(name),
+                    "size": member.size,
+                    "file": None,
+                }
+                continue
+
+            # Metadata files (manifests, indexes, configs) are stored uncompressed, and everything else is a layer
+            data = archive.extractfile(member)
+            header = data.read(HEADER_SIZE)
+            isLayer = posixpath.basename(name) == "layer.tar" or (
+                name.startswith("blobs/") and not header.lstrip().startswith(b"{")
+            )
+            if not isLayer:
+                metaFile = os.path.join(args.bundle, "meta", *name.split("/"))
+                os.makedirs(os.path.dirname(metaFile), exist_ok=True)
+                with open(metaFile, "wb") as f:
+                    f.write(header)
+                    shutil.copyfileobj(data, f, HASH_CHUNK_SIZE)
+                meta.append(name)
+                continue
+
+            # Compress the layer to a temporary file while hashing its contents, then move it to its content-addressed location
+            hash = hashlib.sha256()
+            temporary = os.path.join(args.bundle, "blobs", ".incoming")
+            with _openCompressed(temporary, args.compression, level) as f:
+                chunk = header
+                while len(chunk) > 0:
+                    hash.update(chunk)
+                    f.write(chunk)
+                    chunk = data.read(HASH_CHUNK_SIZE)
+            digest = "sha256:" + hash.hexdigest()
+            blob = posixpath.join(
+                "blobs", "sha256", hash.hexdigest() + EXTENSIONS[args.compression]
+            )
+            os.replace(temporary, os.path.join(args.bundle, *blob.split("/")))
+            layers[name] = {"digest": digest, "size": member.size, "file": blob}
+
+    if process.wait() != 0:
+        logger.error("Error: failed to save the images.", False)
+        sys.exit(1)
+
+    # Map each layer to its diff ID using the image manifests, so we can identify layers whose digest is not their diff ID
+    # (These are legacy `layer.tar` entries and compressed layers from the containerd image store)
+    def _readMeta(name):
+        with open(os.path.join(args.bundle, "meta", *name.split("/")), "rb") as f:
+            return json.load(f)
+
+    bundledImages = []
+    for entry in _readMeta("manifest.json"):
+        diffIds = _readMeta(entry["Config"])["rootfs"]["diff_ids"]
+        for path, diffId in zip(entry["Layers"], diffIds):
+            layers[_resolveLink(path, links)]["diffId"] = diffId
+        bundledImages.append(
+            {
+                "tags": entry.get("RepoTags", None) or [],
+                "config": entry["Config"],
+                "layers": entry["Layers"],
+                "chainIds": _chainIds(diffIds),
+            }
+        )
+
+    # Remove any layers that we only discovered the target already has once we had read them
+    for layer in layers.values():
+        if layer["file"] is not None and layer.get("diffId") in skippable:
+            if not any(
+                [
+                    other is not layer and other["file"] == layer["file"]
+                    for other in layers.values()
+                ]
+            ):
+                os.unlink(os.path.join(args.bundle, *layer["file"].split("/")))
+            layer["file"] = None
+
+    # Write the bundle index
+    FilesystemUtils.writeFile(
+        os.path.join(args.bundle, BUNDLE_INDEX),
+        json.dumps(
+            {
+                "version": BUNDLE_VERSION,
+                "compression": args.compression,
+                "images": bundledImages,
+                "meta": meta,
+                "links": links,
+                "layers": layers,
+            },
+            indent=4,
+        ),
+    )
+
+    # Report the contents of the bundle
+    included = [layer for layer in layers.values() if layer["file"] is not None]
+    compressed = sum(
+        [
+            os.path.getsize(os.path.join(args.bundle, *layer["file"].split("/")))
+            for layer in {layer["file"]: layer for layer in included}.values()
+        ]
+    )
+    logger.action(
+        "Created bundle in {}: {} of {} layers included ({} uncompressed, {} compressed), {} layers skipped ({})".format(
+            humanfriendly.format_timespan(time.time() - startTime),
+            len(included),
+            len(layers),
+            humanfriendly.format_size(
+                sum([layer["size"] for layer in included]), binary=True
+            ),
+            humanfriendly.format_size(compressed, binary=True),
+            len(layers) - len(included),
+            humanfriendly.format_size(
+                sum(
+                    [
+                        layer["size"]
+                        for layer in layers.values()
+                        if layer["file"] is None
+                    ]
+                ),
+                binary=True,
+            ),
+        )
+    )
+
+
+def _load(args, logger):
+    # Read the bundle index
+    with open(os.path.join(args.bundle, BUNDLE_INDEX), "r") as f:
+        index = json.load(f)
+    if index["version"] != BUNDLE_VERSION:
+        logger.error(
+            "Error: unsupported bundle version {}.".format(index["version"]), False
+        )
+        sys.exit(1)
+    method = index["compression"]
+    if method == "zstd" and zstandard is None:
+        logger.error(
+            "Error: this bundle is compressed with zstd, which requires the zstandard package.",
+            False,
+        )
+        sys.exit(1)
+
+    # Verify that this host has every layer that was left out of the bundle, in the same position in each image
+    local = _localChainIds()
+    for image in index["images"]:
+        for path, chainId in zip(image["layers"], image["chainIds"]):
+            layer = index["layers"][_resolveLink(path, index["links"])]
+            if layer["file"] is None and chainId not in local:
+                logger.error(
+                    "Error: the bundle does not include layer {} of image {} and it does not exist on this host.".format(
+                        layer["digest"],
+                        ", ".join(image["tags"]),
+                    ),
+                    False,
+                )
+                sys.exit(1)
+
+    # Verify the contents of each layer in parallel before we import anything
+    included = {
+        layer["file"]: layer
+        for layer in index["layers"].values()
+        if layer["file"] is not None
+    }
+    if args.no_verify == False:
+        logger.action("Verifying {} layers...".format(len(included)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {
+                blob: executor.submit(_verifyLayer, args.bundle, method, layer)
+                for blob, layer in included.items()
+            }
+        corrupt = [blob for blob, future in futures.items() if not future.result()]
+        if len(corrupt) > 0:
+            logger.error(
+                "Error: the following layers are corrupt: {}".format(
+                    ", ".join(corrupt)
+                ),
+                False,
+            )
+            sys.exit(1)
+
+    # Stream the images into the Docker daemon, decompressing each layer as it is written
+    logger.action("Loading images from bundle {}...".format(args.bundle))
+    startTime = time.time()
+    process = subprocess.Popen(["docker", "load"], stdin=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=process.stdin, mode="w|") as archive:
+            for name in index["meta"]:
+                archive.add(
+                    os.path.join(args.bundle, "meta", *name.split("/")),
+                    arcname=name,
+                    recursive=False,
+                )
+            for name, layer in index["layers"].items():
+                if layer["file"] is None:
+                    continue
+                info = tarfile.TarInfo(name)
+                info.size = layer["size"]
+                info.mode = 0o644
+                with _openDecompressed(
+                    os.path.join(args.bundle, *layer["file"].split("/")), method
+                ) as f:
+                    archive.addfile(info, f)
+            for name, target in index["links"].items():
+                info = tarfile.TarInfo(name)
+                info.type = tarfile.SYMTYPE
+                info.linkname = target
+                archive.addfile(info)
+    finally:
+        process.stdin.close()
+    if process.wait() != 0:
+        logger.error("Error: failed to load the images.", False)
+        sys.exit(1)
+
+    logger.action(
+        "Loaded {} in {}".format(
+            ", ".join([", ".join(image["tags"]) for image in index["images"]]),
+            humanfriendly.format_timespan(time.time() - startTime),
+        )
+    )
+
+
+def _inventory(args, logger):
+    # Write the chain IDs of the layers on this host, so that bundles created for this host can leave them out
+    chainIds = sorted(_localChainIds())
+    contents = json.dumps({"chainIds": chainIds}, indent=4)
+    if args.output is not None:
+        FilesystemUtils.writeFile(args.output, contents)
+        logger.action("Wrote {} layers to {}".format(len(chainIds), args.output), False)
+    else:
+        print(contents)
+
+
+def bundle():
+    # Create our logger to generate coloured output on stderr
+    logger = Logger(prefix="[{} bundle] ".format(sys.argv[0]))
+
+    # Our supported command-line arguments
+    parser = argparse.ArgumentParser(
+        prog="{} bundle".format(sys.argv[0]),
+        description="Creates and loads portable bundles of built images, which only include the layers that the destination host does not already have.",
+    )
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    createParser = subparsers.add_parser(
+        "create",
+        help="Saves images to a bundle",
+        description="Saves images to a bundle. Each image may be specified as a tag for the ue4-full image or as a full image reference (e.g. ue4-minimal:5.4.1).",
+    )
+    createParser.add_argument("bundle", help="The directory to write the bundle to")
+    createParser.add_argument("images", nargs="+", help="The images to save")
+    createParser.add_argument(
+        "--exclude-layers",
+        default=None,
+        metavar="FILE",
+        help="Leave out the layers listed in the specified inventory file, as generated by `bundle inventory` on the destination host",
+    )
+    createParser.add_argument(
+        "--compression",
+        default="zstd" if zstandard is not None else "gzip",
+        choices=EXTENSIONS.keys(),
+        help="The compression method for layers (default is zstd if the zstandard package is installed, otherwise gzip)",
+    )
+    createParser.add_argument(
+        "--level",
+        default=None,
+        type=int,
+        help="The compression level (default is 9 for zstd and 6 for gzip)",
+    )
+
+    loadParser = subparsers.add_parser(
+        "load",
+        help="Loads the images in a bundle",
+        description="Verifies the layers in a bundle and loads its images into the Docker daemon.",
+    )
+    loadParser.add_argument("bundle", help="The directory containing the bundle")
+    loadParser.add_argument(
+        "-j",
+        "--jobs",
+        default=os.cpu_count(),
+        type=int,
+        help="The number of layers to verify in parallel (default is the number of CPU cores)",
+    )
+    loadParser.add_argument(
+        "--no-verify",
+        action="store_true",
+        help="Skip verifying the layers before loading them (docker load still verifies the layers it imports)",
+    )
+
+    inventoryParser = subparsers.add_parser(
+        "inventory",
+        help="Lists the layers on this host",
+        description="Lists the layers stored by the Docker daemon on this host, for use with `bundle create --exclude-layers`.",
+    )
+    inventoryParser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        metavar="FILE",
+        help="Write the inventory to the specified file rather than standard output",
+    )
+
+    # Parse the supplied command-line arguments and perform the requested action
+    args = parser.parse_args()
+    {"create": _create, "load": _load, "inventory": _inventory}[args.action](
+        args, logger
+    )
@@ -0,0 +1,232 @@
+import argparse, humanfriendly, json, sys
+from .infrastructure import *
+
+
+def _formatDelta(size):
+    return "{}{}".format(
+        "+" if size >= 0 else "-", humanfriendly.format_size(abs(size), binary=True)
+    )
+
+
+def _loadManifest(image, forceArchive, logger):
+    # Use the embedded file manifest if the image has one, since this avoids reading the Installed Build entirely
+    if forceArchive == False and InstalledBuildManifest.hasManifest(image) == True:
+        logger.info('Reading embedded file manifest from "{}"...'.format(image), False)
+        return InstalledBuildManifest.fromImage(image), "manifest"
+
+    # Fall back to streaming the Installed Build out of the image and hashing its files
+    logger.info(
+        'Hashing files in "{}" (this may take some time for large images)...'.format(
+            image
+        ),
+        False,
+    )
+    return InstalledBuildManifest.fromArchive(image), "archive"
+
+
+def _compare(oldManifest, newManifest):
+    old = oldManifest.byPath()
+    new = newManifest.byPath()
+    added = sorted([path for path in new if path not in old])
+    removed = sorted([path for path in old if path not in new])
+    changed = []
+    modeChanged = []
+    for path in sorted([path for path in new if path in old]):
+        if (
+            old[path]["sha256"] != new[path]["sha256"]
+            or old[path]["size"] != new[path]["size"]
+        ):
+            changed.append(path)
+        elif old[path]["mode"] != new[path]["mode"]:
+            modeChanged.append(path)
+
+    # Accumulate the number of bytes added, removed and changed in each component
+    components = {}
+
+    def _accumulate(entry, key, size):
+        details = components.setdefault(
+            entry["component"],
+            {"added": 0, "removed": 0, "changed": 0, "old": 0, "new": 0},
+        )
+        details[key] += size
+
+    for entry in old.values():
+        _accumulate(entry, "old", entry["size"])
+    for entry in new.values():
+        _accumulate(entry, "new", entry["size"])
+    for path in added:
+        _accumulate(new[path], "added", new[path]["size"])
+    for path in removed:
+        _accumulate(old[path], "removed", old[path]["size"])
+    for path in changed:
+        _accumulate(new[path], "changed", new[path]["size"])
+
+    return {
+        "added": [new[path] for path in added],
+        "removed": [old[path] for path in removed],
+        "changed": [
+            {
+                "path": path,
+                "old": old[path],
+                "new": new[path],
+            }
+            for path in changed
+        ],
+        "modeChanged": [
+            {
+                "path": path,
+                "oldMode": old[path]["mode"],
+                "newMode": new[path]["mode"],
+            }
+            for path in modeChanged
+        ],
+        "components": components,
+    }
+
+
+def diff():
+    # Create our logger to generate coloured output on stderr
+    logger = Logger(prefix="[{} diff] ".format(sys.argv[0]))
+
+    # Our supported command-line arguments
+    parser = argparse.ArgumentParser(
+        prog="{} diff".format(sys.argv[0]),
+        description="Compares the files in the Installed Builds of two built engine images. "
+        + "Each image may be specified as a tag for the ue4-minimal image or as a full image reference (e.g. ue4-full:4.27.0).",
+    )
+    parser.add_argument("old", help="The image to compare from")
+    parser.add_argument("new", help="The image to compare to")
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="List each added, removed and changed file",
+    )
+    parser.add_argument(
+        "--json",
+        default=None,
+        metavar="PATH",
+        help="Write the full comparison to the specified file as JSON",
+    )
+    parser.add_argument(
+        "--no-manifest",
+        action="store_true",
+        help="Always hash the files in each image, even if the image contains an embedded file manifest",
+    )
+
+    # Parse the supplied command-line arguments
+    args = parser.parse_args()
+
+    # Determine if the user specified an image and a tag or just a tag
+    images = [
+        GlobalConfiguration.resolveTag(
+            "ue4-minimal:{}".format(tag) if ":" not in tag else tag
+        )
+        for tag in [args.old, args.new]
+    ]
+
+    # Verify that both images exist
+    for image in images:
+        if DockerUtils.exists(image) == False:
+            logger.error(
+                'Error: the specified container image "{}" does not exist.'.format(
+                    image
+                ),
+                False,
+            )
+            sys.exit(1)
+
+    # Read or generate the file manifest for each image
+    try:
+        (oldManifest, oldSource), (newManifest, newSource) = [
+            _loadManifest(image, args.no_manifest, logger) for image in images
+        ]
+    except RuntimeError as e:
+        logger.error("Error: {}.".format(e), False)
+        sys.exit(1)
+
+    # Compare the two manifests
+    result = _compare(oldManifest, newManifest)
+
+    # List the individual files if requested
+    if args.list == True:
+        for entry in result["added"]:
+            print(
+                "+ {} ({})".format(
+                    entry["path"], humanfriendly.format_size(entry["size"], binary=True)
+                )
+            )
+        for entry in result["removed"]:
+            print(
+                "- {} ({})".format(
+                    entry["path"], humanfriendly.format_size(entry["size"], binary=True)
+                )
+            )
+        for entry in result["changed"]:
+            print(
+                "M {} ({})".format(
+                    entry["path"],
+                    _formatDelta(entry["new"]["size"] - entry["old"]["size"]),
+                )
+            )
+        for entry in result["modeChanged"]:
+            print(
+                "P {} ({:o} -> {:o})".format(
+                    entry["path"], entry["oldMode"], entry["newMode"]
+                )
+            )
+        print()
+
+    # Summarise the differences in each component
+    print("{} -> {}".format(images[0], images[1]))
+    print(
+        "{} added, {} removed, {} changed, {} with changed permissions".format(
+            len(result["added"]),
+            len(result["removed"]),
+            len(result["changed"]),
+            len(result["modeChanged"]),
+        )
+    )
+    print()
+    print(
+        "{:<20} {:>12} {:>12} {:>12} {:>12}".format(
+            "Component", "Added", "Removed", "Changed", "Size change"
+        )
+    )
+    totals = {"added": 0, "removed": 0, "changed": 0, "old": 0, "new": 0}
+    for component, details in sorted(result["components"].items()):
+        for key in totals:
+            totals[key] += details[key]
+        print(
+            "{:<20} {:>12} {:>12} {:>12} {:>12}".format(
+                component,
+                humanfriendly.format_size(details["added"], binary=True),
+                humanfriendly.format_size(details["removed"], binary=True),
+                humanfriendly.format_size(details["changed"], binary=True),
+                _formatDelta(details["new"] - details["old"]),
+            )
+        )
+    print(
+        "{:<20} {:>12} {:>12} {:>12} {:>12}".format(
+            "Total",
+            humanfriendly.format_size(totals["added"], binary=True),
+            humanfriendly.format_size(totals["removed"], binary=True),
+            humanfriendly.format_size(totals["changed"], binary=True),
+            _formatDelta(totals["new"] - totals["old"]),
+        )
+    )
+
+    # Estimate the amount of data that would need to be transferred to update from the old image to the new image
+    # (This assumes file-level deltas, so only the new contents of added and changed files need to be sent)
+    print()
+    print(
+        "Estimated transfer for a file-level update: {}".format(
+            humanfriendly.format_size(totals["added"] + totals["changed"], binary=True)
+        )
+    )
+
+    # Write the full comparison to a JSON file if requested
+    if args.json is not None:
+        result["old"] = {"image": images[0], "source": oldSource}
+        result["new"] = {"image": images[1], "source": newSource}
+        FilesystemUtils.writeFile(args.json, json.dumps(result, indent=2))
+        print("Wrote comparison to {}".format(args.json))
@@ -0,0 +1,369 @@
+import argparse, concurrent.futures, humanfriendly, os, re, subprocess, sys, threading, time
+from .infrastructure import *
+from os.path import join
+
+# The image used to measure the free disk space under each host's Docker data directory
+DISK_PROBE_IMAGE = "busybox:latest"
+
+# The environment variables that select the Docker host, which we replace with those for the host that each build runs on
+HOST_ENVIRONMENT_VARS = [
+    "DOCKER_CERT_PATH",
+    "DOCKER_CONTEXT",
+    "DOCKER_HOST",
+    "DOCKER_TLS",
+    "DOCKER_TLS_VERIFY",
+]
+
+# The default minimum free disk space that a host must have to be assigned a build (see the host configuration requirements in the docs)
+DEFAULT_MIN_DISK = "800GB"
+
+
+def _probeHost(host, warn):
+    # Retrieve the number of CPU cores and total memory of the host, along with the free disk space under its Docker data directory
+    client = DockerUtils.connect(host)
+    info = client.info()
+    details = {
+        "os": info["OSType"],
+        "cores": info["NCPU"],
+        "memory": info["MemTotal"],
+        "disk": None,
+    }
+
+    # The Docker API does not report free disk space, so we measure it from inside a container that mounts the data directory
+    # (This works even when the data directory is inside a VM, such as under Docker Desktop)
+    # (Rootless and remote daemons may not permit bind mounts, so we then fall back to measuring the container's root filesystem,
+    # which is normally stored under the data directory, and leave the free disk space unknown if that fails too)
+    if details["os"] == "linux":
+        attempts = [
+            (
+                "/docker-root",
+                {info["DockerRootDir"]: {"bind": "/docker-root", "mode": "ro"}},
+            ),
+            ("/", {}),
+        ]
+        errors = []
+        for path, volumes in attempts:
+            try:
+                output = client.containers.run(
+                    DISK_PROBE_IMAGE,
+                    ["df", "-Pk", path],
+                    volumes=volumes,
+                    remove=True,
+                ).decode("utf-8")
+                details["disk"] = int(output.strip().splitlines()[-1].split()[3]) * 1024
+                break
+            except Exception as e:
+                errors.append(str(e))
+        if details["disk"] is None:
+            warn(
+                "Warning: unable to measure the free disk space of {}, so it will be treated as unknown: {}".format(
+                    host, errors[-1]
+                )
+            )
+
+    return details
+
+
+def _selectHost(candidates, capacity):
+    # Choose the host with the most free capacity, weighting cores, memory and disk space equally relative to the best host for each
+    def _fraction(host, key):
+        best = max([capacity[other][key] or 0 for other in candidates])
+        return (capacity[host][key] or 0) / best if best > 0 else 0
+
+    return max(
+        candidates,
+        key=lambda host: sum(
+            [_fraction(host, key) for key in ["cores", "memory", "disk"]]
+        ),
+    )
+
+
+def _runJob(release, host, command, logFile, log):
+    # Run the build for the release against the specified host, writing its output to the log file
+    # (Contexts are resolved to their endpoint and TLS settings, since the Docker SDK used by the build does not understand `DOCKER_CONTEXT`)
+    log("Building {} on {} (logging to {})...".format(release, host, logFile))
+    startTime = time.time()
+    try:
+        env = {
+            key: value
+            for key, value in os.environ.items()
+            if key not in HOST_ENVIRONMENT_VARS
+        }
+        env.update(DockerUtils.hostEnvironment(host))
+        with open(logFile, "wb") as f:
+            returncode = subprocess.run(
+                command, env=env, stdin=subprocess.DEVNULL, stdout=f, stderr=f
+            ).returncode
+    except (OSError, RuntimeError) as e:
+        log("Failed to start the build for {} on {}: {}".format(release, host, e))
+        returncode = 1
+    return {
+        "release": release,
+        "host": host,
+        "success": returncode == 0,
+        "elapsed": time.time() - startTime,
+    }
+
+
+def _finishJob(future, host, capacity, logger, log):
+    # Retrieve the result of a finished build and measure its host again, since the build will have consumed disk space
+    result = future.result()
+    log(
+        "{} {} on {} in {}".format(
+            "Built" if result["success"] else "Failed to build",
+            result["release"],
+            host,
+            humanfriendly.format_timespan(result["elapsed"]),
+        )
+    )
+    try:
+        capacity[host] = _probeHost(
+            host, lambda message: logger.warning(message, False)
+        )
+    except Exception as e:
+        logger.warning("Warning: unable to measure {}: {}".format(host, e), False)
+    return result
+
+
+def distribute():
+    # Create our logger to generate coloured output on stderr
+    logger = Logger(prefix="[{} distribute] ".format(sys.argv[0]))
+
+    # Any arguments after `--` are passed to `ue4-docker build` for every release
+    buildArgs = []
+    if "--" in sys.argv:
+        separator = sys.argv.index("--")
+        buildArgs = sys.argv[separator + 1 :]
+        sys.argv = sys.argv[:separator]
+
+    # Our supported command-line arguments
+    parser = argparse.ArgumentParser(
+        prog="{} distribute".format(sys.argv[0]),
+        description="Builds images for multiple Unreal Engine releases across multiple Docker hosts, "
+        + "assigning each build to the available host with the most free capacity. "
+        + "Each host may be specified as a Docker endpoint URL (e.g. ssh://builder01) or as the name of a Docker context. "
+        + "Any arguments after `--` are passed to `ue4-docker build` for every release.",
+    )
+    parser.add_argument("releases", nargs="+", help="The releases to build")
+    parser.add_argument(
+        "--hosts", nargs="*", default=[], help="The Docker hosts to build on"
+    )
+    parser.add_argument(
+        "--hosts-file",
+        default=None,
+        metavar="FILE",
+        help="Read the list of Docker hosts from the specified file (one per line)",
+    )
+    parser.add_argument(
+        "--jobs-per-host",
+        default=1,
+        type=int,
+        metavar="N",
+        help="The maximum number of builds to run on each host at once (default is 1)",
+    )
+    parser.add_argument(
+        "--min-disk",
+        default=DEFAULT_MIN_DISK,
+        metavar="SIZE",
+        help="The minimum free disk space a host must have to start a build (default is {})".format(
+            DEFAULT_MIN_DISK
+        ),
+    )
+    parser.add_argument(
+        "--cache-registry",
+        default=None,
+        metavar="REPOSITORY",
+        help="Share the build cache between hosts using the specified registry repository",
+    )
+    parser.add_argument(
+        "--logs",
+        default="ue4-docker-logs",
+        metavar="DIR",
+        help="The directory to write the output of each build to (default is ue4-docker-logs)",
+    )
+
+    # Parse the supplied command-line arguments
+    args = parser.parse_args()
+    hosts = list(args.hosts)
+    if args.hosts_file is not None:
+        hosts.extend(DockerUtils.readHostsFile(args.hosts_file))
+    hosts = list(dict.fromkeys(hosts))
+    if len(hosts) == 0:
+        logger.error("Error: no Docker hosts were specified.", False)
+        sys.exit(1)
+    try:
+        minDisk = humanfriendly.parse_size(args.min_disk)
+    except humanfriendly.InvalidSize as e:
+        logger.error("Error: {}".format(e), False)
+        sys.exit(1)
+
+    # Verify that we can reach each host before we start any builds
+    capacity = {}
+    for host in hosts:
+        try:
+            capacity[host] = _probeHost(
+                host, lambda message: logger.warning(message, False)
+            )
+        except Exception as e:
+            logger.error("Error: unable to connect to {}: {}".format(host, e), False)
+            sys.exit(1)
+        logger.info(
+            "{}: {} cores, {} memory, {} free disk space".format(
+                host,
+                capacity[host]["cores"],
+                humanfriendly.format_size(capacity[host]["memory"], binary=True),
+                (
+                    humanfriendly.format_size(capacity[host]["disk"], binary=True)
+                    if capacity[host]["disk"] is not None
+                    else "unknown"
+                ),
+            ),
+            False,
+        )
+
+    # Builds run in the background, so credentials cannot be prompted for and must be supplied up front
+    if "-password" not in buildArgs and "UE4DOCKER_PASSWORD" not in os.environ:
+        logger.warning(
+            "Warning: builds cannot prompt for git credentials, so they must be supplied via the "
+            + "UE4DOCKER_USERNAME and UE4DOCKER_PASSWORD environment variables if they are required.",
+            False,
+        )
+
+    # Each build runs in a separate process with its output logged to its own file
+    cacheArgs = (
+        ["--cache-registry", args.cache_registry]
+        if args.cache_registry is not None
+        else []
+    )
+    os.makedirs(args.logs, exist_ok=True)
+
+    def _command(release):
+        return (
+            [sys.executable, "-m", "ue4docker", "build", release]
+            + cacheArgs
+            + buildArgs
+        )
+
+    def _logFile(release, host):
+        return join(
+            args.logs,
+            "{}-{}.log".format(release, re.sub(r"[^A-Za-z0-9._-]+", "_", host)),
+        )
+
+    # Serialise output from our worker threads so that lines are not interleaved
+    lock = threading.Lock()
+
+    def _log(message):
+        with lock:
+            logger.action(message, False)
+
+    # Assign each release to the available host with the most free capacity, waiting for a build to finish when no host is available
+    startTime = time.time()
+    pending = list(args.releases)
+    running = {}
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=len(hosts) * args.jobs_per_host
+    ) as executor:
+        while len(pending) > 0:
+            # Determine the free capacity of each host with a free build slot and enough disk space for a build
+            # (Builds that are already running on a host are assumed to use an equal share of its cores and memory)
+            available = {}
+            for host in hosts:
+                busy = list(running.values()).count(host)
+                if busy >= args.jobs_per_host:
+                    continue
+                if capacity[host]["disk"] is None or capacity[host]["disk"] >= minDisk:
+                    share = 1 - (busy / args.jobs_per_host)
+                    available[host] = {
+                        "cores": capacity[host]["cores"] * share,
+                        "memory": capacity[host]["memory"] * share,
+                        "disk": capacity[host]["disk"],
+                    }
+
+            # Start a build on the best available host
+            if len(available) > 0:
+                host = _selectHost(list(available.keys()), available)
+                release = pending.pop(0)
+                future = executor.submit(
+                    _runJob,
+                    release,
+                    host,
+                    _command(release),
+                    _logFile(release, host),
+                    _log,
+                )
+                running[future] = host
+                continue
+
+            # If no builds are running and no host can accept one, then the remaining releases cannot be built
+            if len(running) == 0:
+                for release in pending:
+                    logger.error(
+                        "Error: no host has enough free disk space to build {}.".format(
+                            release
+                        ),
+                        False,
+                    )
+                    results.append(
+                        {
+                            "release": release,
+                            "host": None,
+                            "success": False,
+                            "elapsed": 0,
+                        }
+                    )
+                break
+
+            # Wait for a running build to finish, then measure its host again since the build will have consumed disk space
+            done, _ = concurrent.futures.wait(
+                running.keys(), return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                results.append(
+                    _finishJob(future, running.pop(future), capacity, logger, _log)
+                )
+
+        # Wait for the remaining builds to finish
+        for future in concurrent.futures.as_completed(list(running.keys())):
+            results.append(
+                _finishJob(future, running.pop(future), capacity, logger, _log)
+            )
+
+    # Report the utilisation of each host, which is the proportion of the total time that its build slots were in use
+    elapsed = time.time() - startTime
+    logger.action(
+        "Built {} of {} releases in {}".format(
+            len([result for result in results if result["success"]]),
+            len(args.releases),
+            humanfriendly.format_timespan(elapsed),
+        )
+    )
+    for host in hosts:
+        hostResults = [result for result in results if result["host"] == host]
+        busy = sum([result["elapsed"] for result in hostResults])
+        logger.info(
+            "  {}: {} builds ({}), busy for {} ({:.0f}% utilisation)".format(
+                host,
+                len(hostResults),
+                (
+                    ", ".join(
+                        [
+                            "{} {}".format(
+                                result["release"],
+                                "ok" if result["success"] else "failed",
+                            )
+                            for result in hostResults
+                        ]
+                    )
+                    if len(hostResults) > 0
+                    else "idle"
+                ),
+                humanfriendly.format_timespan(busy),
+                (busy / (elapsed * args.jobs_per_host)) * 100 if elapsed > 0 else 0,
+            ),
+            False,
+        )
+
+    if any([result["success"] == False for result in results]):
+        sys.exit(1)
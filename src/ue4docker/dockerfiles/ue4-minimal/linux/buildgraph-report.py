@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import os, re, subprocess, sys, time
+from os.path import join, relpath
+from script_helpers import formatSize, log
+
+# The pattern that matches the line BuildGraph prints when it starts executing each node
+NODE_PATTERN = re.compile(r"\*{6} \[(\d+)/(\d+)\] (.+?)\s*$")
+
+# The target names and keywords that identify which optional part of the Installed Build a node or file belongs to, in order of precedence
+# (This attribution is approximate, since nodes and files that do not mention a target name are counted with the editor and tools)
+CATEGORIES = [
+    ("Client game targets", ["UnrealClient", "UE4Client"]),
+    ("Dedicated server game targets", ["UnrealServer", "UE4Server"]),
+    ("Game targets", ["UnrealGame", "UE4Game"]),
+    ("Derived Data Cache (DDC)", ["DDC", "DerivedDataCache"]),
+    ("Editor", ["UnrealEditor", "UE4Editor"]),
+]
+
+# The game target configurations, which we use to break down the size of the game target binaries
+CONFIGURATIONS = ["DebugGame", "Debug", "Development", "Shipping", "Test"]
+
+
+# Formats a duration in seconds as a human-readable string
+def formatDuration(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return "{}h {:02d}m {:02d}s".format(hours, minutes, seconds)
+
+
+# Determines which category a BuildGraph node name or file path belongs to
+def categorise(name, default):
+    for category, keywords in CATEGORIES:
+        if any([keyword in name for keyword in keywords]):
+            return category
+    return default
+
+
+# Runs BuildGraph and reports how long each node (and each category of nodes) took to execute
+def timeNodes(command):
+    durations = []
+    current = None
+    started = time.time()
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+        errors="replace",
+    )
+    for line in process.stdout:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+        match = NODE_PATTERN.search(line)
+        if match is not None:
+            now = time.time()
+            if current is not None:
+                durations.append((current, now - started))
+            current = match.group(3)
+            started = now
+    code = process.wait()
+    if current is not None:
+        durations.append((current, time.time() - started))
+
+    # Report the time taken by each node, and the total for each category
+    log("\nBuildGraph node timings:")
+    for node, duration in durations:
+        log("- {}: {}".format(node, formatDuration(duration)))
+    totals = {}
+    for node, duration in durations:
+        category = categorise(node, "Tools and other nodes")
+        totals[category] = totals.get(category, 0) + duration
+    log("\nBuildGraph time by category (approximate):")
+    for category, duration in sorted(totals.items(), key=lambda i: i[1], reverse=True):
+        log("- {}: {}".format(category, formatDuration(duration)))
+
+    return code
+
+
+# Reports how much of the Installed Build's size is attributable to each optional part of the build
+def reportSizes(rootDir):
+    totals = {}
+    configurations = {}
+    for root, _, files in os.walk(rootDir):
+        for file in files:
+            path = join(root, file)
+            try:
+                size = os.lstat(path).st_size
+            except OSError:
+                continue
+            relative = relpath(path, rootDir)
+            category = categorise(relative, "Editor, tools and shared files")
+            totals[category] = totals.get(category, 0) + size
+
+            # Break down the size of game target files by configuration
+            if category not in ["Editor, tools and shared files", "Editor"]:
+                for configuration in CONFIGURATIONS:
+                    if configuration in relative:
+                        configurations[configuration] = (
+                            configurations.get(configuration, 0) + size
+                        )
+                        break
+
+    log("\nInstalled Build size by category (approximate):")
+    for category, size in sorted(totals.items(), key=lambda i: i[1], reverse=True):
+        log("- {}: {}".format(category, formatSize(size)))
+    log("- Total: {}".format(formatSize(sum(totals.values()))))
+    if len(configurations) > 0:
+        log("\nGame target size by configuration:")
+        for configuration, size in sorted(
+            configurations.items(), key=lambda i: i[1], reverse=True
+        ):
+            log("- {}: {}".format(configuration, formatSize(size)))
+
+
+# Parse our command-line arguments
+if len(sys.argv) < 3 or sys.argv[1] not in ["time", "sizes"]:
+    log("Usage: {} time COMMAND [ARGS...] | sizes INSTALLED_BUILD".format(sys.argv[0]))
+    sys.exit(1)
+
+if sys.argv[1] == "time":
+    sys.exit(timeNodes(sys.argv[2:]))
+else:
+    reportSizes(sys.argv[2])
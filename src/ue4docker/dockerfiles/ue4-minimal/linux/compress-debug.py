@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import json, multiprocessing, os, shutil, subprocess, sys
+from os.path import dirname, join
+from script_helpers import formatSize, log
+
+
+# Determines whether objcopy supports the specified compression method for debug sections
+def isSupported(method):
+    output = subprocess.run(
+        ["objcopy", "--help"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    ).stdout.decode("utf-8", errors="replace")
+    for line in output.splitlines():
+        if "--compress-debug-sections" in line:
+            return method in line
+    return False
+
+
+# Determines whether the specified file is an ELF file
+def isElf(path):
+    with open(path, "rb") as f:
+        return f.read(4) == b"\x7fELF"
+
+
+# Compresses the debug sections of a single ELF file in place, returning its size before and after compression
+def compressFile(args):
+    path, method = args
+    before = os.path.getsize(path)
+    temporary = path + ".compressed"
+    result = subprocess.run(
+        ["objcopy", "--compress-debug-sections={}".format(method), path, temporary],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+
+    # If objcopy failed then we leave the original file as-is
+    if result.returncode != 0:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        return path, before, before, result.stdout.decode("utf-8", errors="replace")
+
+    shutil.copymode(path, temporary)
+    os.replace(temporary, path)
+    return path, before, os.path.getsize(path), None
+
+
+# Parse our command-line arguments
+if len(sys.argv) != 4:
+    log("Usage: {} DIRECTORY zlib|zstd REPORT".format(sys.argv[0]))
+    sys.exit(1)
+rootDir = sys.argv[1]
+requested = sys.argv[2]
+reportFile = sys.argv[3]
+
+# Fall back to zlib if the installed version of objcopy does not support zstd (zstd requires binutils 2.40 or newer)
+method = requested
+if not isSupported(method):
+    log(
+        "Warning: objcopy does not support {} compression for debug sections, falling back to zlib".format(
+            method
+        )
+    )
+    method = "zlib"
+
+# Identify the separate debug info files (Unreal's own .sym files are not ELF files, so we leave them untouched)
+paths = []
+for root, dirs, files in os.walk(rootDir):
+    for name in files:
+        path = join(root, name)
+        if name.endswith(".debug") and not os.path.islink(path) and isElf(path):
+            paths.append(path)
+
+# Compress the files in parallel
+log("Compressing the debug sections of {} files using {}...".format(len(paths), method))
+with multiprocessing.Pool() as pool:
+    results = pool.map(compressFile, [(path, method) for path in sorted(paths)])
+
+for path, _, _, error in results:
+    if error is not None:
+        log("Warning: failed to compress {}: {}".format(path, error.strip()))
+
+# Report the sizes before and after compression
+before = sum([result[1] for result in results])
+after = sum([result[2] for result in results])
+failed = len([result for result in results if result[3] is not None])
+log(
+    "Compressed debug symbols from {} to {} ({:.1f}% of the original size)".format(
+        formatSize(before),
+        formatSize(after),
+        (after / before) * 100 if before > 0 else 100,
+    )
+)
+
+# Write the report so it can be displayed in the build summary
+os.makedirs(dirname(reportFile), exist_ok=True)
+with open(reportFile, "w") as f:
+    json.dump(
+        {
+            "requested": requested,
+            "method": method,
+            "files": len(results),
+            "failed": failed,
+            "before": before,
+            "after": after,
+        },
+        f,
+    )
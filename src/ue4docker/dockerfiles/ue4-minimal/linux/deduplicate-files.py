@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import hashlib, multiprocessing, os, stat, sys
+from os.path import basename, join
+from script_helpers import formatSize, log
+
+# Files smaller than this are not worth replacing with hardlinks, since each file in a layer tarball carries a 512 byte header regardless
+MINIMUM_SIZE = 4096
+
+
+# Computes the SHA-256 hash of the contents of a file
+def hashFile(path):
+    hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash.update(chunk)
+    return path, hash.hexdigest()
+
+
+# Replaces files with identical contents and metadata in the specified directory with hardlinks to a single copy
+def deduplicate(pool, directory):
+    # Group the regular files by size and mode, skipping any that are already hardlinked to an earlier file
+    candidates = {}
+    seen = set()
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            path = join(root, name)
+            details = os.lstat(path)
+            if not stat.S_ISREG(details.st_mode) or details.st_size < MINIMUM_SIZE:
+                continue
+            if (details.st_dev, details.st_ino) in seen:
+                continue
+            seen.add((details.st_dev, details.st_ino))
+            key = (details.st_size, details.st_mode, details.st_uid, details.st_gid)
+            candidates.setdefault(key, []).append(path)
+
+    # Only files whose size matches at least one other file can be duplicates, so we only hash those
+    paths = sorted(
+        [path for group in candidates.values() if len(group) > 1 for path in group]
+    )
+    hashes = dict(pool.map(hashFile, paths, chunksize=16))
+
+    # Link each duplicate to the first file with the same contents and metadata
+    originals = {}
+    linked = 0
+    saved = 0
+    for key, group in candidates.items():
+        if len(group) < 2:
+            continue
+        for path in sorted(group):
+            identity = key + (hashes[path],)
+            original = originals.setdefault(identity, path)
+            if original != path:
+                temporary = join(os.path.dirname(path), ".dedup-" + basename(path))
+                os.link(original, temporary)
+                os.replace(temporary, path)
+                linked += 1
+                saved += key[0]
+
+    return linked, saved
+
+
+# Parse our command-line arguments
+if len(sys.argv) < 2:
+    log("Usage: {} DIRECTORY [DIRECTORY...]".format(sys.argv[0]))
+    sys.exit(1)
+
+# Deduplicate each directory separately, since each one is copied into its own filesystem layer
+# and hardlinks can only be preserved between files that are stored in the same layer
+totalLinked = 0
+totalSaved = 0
+with multiprocessing.Pool() as pool:
+    for directory in sys.argv[1:]:
+        if not os.path.isdir(directory):
+            log("Skipping non-existent directory: {}".format(directory))
+            continue
+        linked, saved = deduplicate(pool, directory)
+        log(
+            "Deduplicated {}: replaced {} files with hardlinks, saving {}".format(
+                directory, linked, formatSize(saved)
+            )
+        )
+        totalLinked += linked
+        totalSaved += saved
+
+log(
+    "Replaced {} duplicate files with hardlinks, saving {} in total".format(
+        totalLinked, formatSize(totalSaved)
+    )
+)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+import gzip, hashlib, json, multiprocessing, os, stat, sys
+from os.path import dirname, join, relpath
+from installed_build_components import identifyComponent
+from script_helpers import formatSize, log
+
+# The version of the manifest format, which is incremented whenever the format changes in an incompatible way
+MANIFEST_VERSION = 1
+
+# The fields recorded for each file in the manifest
+FIELDS = ["path", "size", "mode", "sha256", "component"]
+
+
+# Computes the manifest entry for a single file
+def describeFile(args):
+    rootDir, path = args
+    relative = relpath(path, rootDir).replace(os.sep, "/")
+    details = os.lstat(path)
+
+    # Symbolic links are hashed using their target rather than the contents of the file they point to
+    hash = hashlib.sha256()
+    if stat.S_ISLNK(details.st_mode):
+        hash.update(os.readlink(path).encode("utf-8"))
+    else:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hash.update(chunk)
+
+    return [
+        relative,
+        details.st_size,
+        details.st_mode,
+        hash.hexdigest(),
+        identifyComponent(relative),
+    ]
+
+
+# Reads the entries from an existing manifest, keyed by path, along with the time at which it was written
+# (Returns an empty dictionary if the manifest does not exist or uses a different format)
+def readBaseManifest(manifestFile):
+    if not os.path.exists(manifestFile):
+        log("No existing manifest found at {}, hashing every file".format(manifestFile))
+        return {}, 0
+    with gzip.open(manifestFile, "rt", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("fields") != FIELDS:
+        log(
+            "Ignoring existing manifest with a different format: {}".format(
+                manifestFile
+            )
+        )
+        return {}, 0
+    return {entry[0]: entry for entry in manifest["files"]}, os.stat(
+        manifestFile
+    ).st_mtime_ns
+
+
+# Parse our command-line arguments
+if len(sys.argv) < 3:
+    log("Usage: {} INSTALLED_BUILD OUTPUT [BASE_MANIFEST]".format(sys.argv[0]))
+    sys.exit(1)
+rootDir = sys.argv[1]
+outputFile = sys.argv[2]
+baseFile = sys.argv[3] if len(sys.argv) > 3 else None
+
+# If we were given the manifest generated in the builder stage, then we only need to hash the files that were
+# added or modified afterwards (e.g. by first-run setup), which we identify using their size and modification time
+base, baseTime = readBaseManifest(baseFile) if baseFile is not None else ({}, 0)
+
+# Identify every file in the Installed Build, reusing the existing entries for any files that are unchanged
+paths = []
+reused = {}
+for root, dirs, files in os.walk(rootDir):
+    for name in files + [d for d in dirs if os.path.islink(join(root, d))]:
+        path = join(root, name)
+        relative = relpath(path, rootDir).replace(os.sep, "/")
+        existing = base.get(relative)
+        if existing is not None:
+            details = os.lstat(path)
+            if details.st_size == existing[1] and details.st_mtime_ns <= baseTime:
+                reused[path] = [
+                    relative,
+                    details.st_size,
+                    details.st_mode,
+                    existing[3],
+                    identifyComponent(relative),
+                ]
+                continue
+        paths.append(path)
+
+# Hash the remaining files in parallel
+with multiprocessing.Pool() as pool:
+    hashed = pool.map(describeFile, [(rootDir, path) for path in paths], chunksize=64)
+entries = [
+    entry
+    for path, entry in sorted(
+        list(reused.items()) + list(zip(paths, hashed)), key=lambda item: item[0]
+    )
+]
+if baseFile is not None:
+    log("Reused {} entries from {}".format(len(reused), baseFile))
+
+# Write the compressed manifest
+os.makedirs(dirname(outputFile), exist_ok=True)
+with gzip.open(outputFile, "wt", encoding="utf-8") as f:
+    json.dump(
+        {"version": MANIFEST_VERSION, "fields": FIELDS, "files": entries},
+        f,
+        separators=(",", ":"),
+    )
+
+log(
+    "Wrote manifest for {} files ({}, {} hashed) to {} ({} compressed)".format(
+        len(entries),
+        formatSize(sum([entry[1] for entry in entries])),
+        len(paths),
+        outputFile,
+        formatSize(os.path.getsize(outputFile)),
+    )
+)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+from fnmatch import fnmatchcase
+
+# The rules that identify which component of an Installed Build each file belongs to
+# (This module is imported by split-components.py and generate-manifest.py inside the container and loaded by InstalledBuildManifest on the host,
+# so all three use the same rules, and the Windows version of split-components.py uses the same patterns for the files it splits out)
+
+# The subdirectories of the Engine directory that are split into separate components
+ENGINE_SUBDIRS = ["Binaries", "Content", "Extras", "Intermediate", "Plugins", "Source"]
+
+# The root subdirectories that contain template projects and samples
+TEMPLATE_SUBDIRS = ["FeaturePacks", "Samples", "Templates"]
+
+# The filename patterns for debug symbols (the `.pdb` pattern matches the Editor symbols that are split out under Windows)
+DEBUG_SYMBOL_PATTERNS = ["*.debug", "*.sym", "*U*Editor*.pdb"]
+
+
+# Determines which component of the Installed Build a file belongs to, given its path relative to the root of the Installed Build
+def identifyComponent(path):
+    parts = path.split("/")
+    if path == "Engine/DerivedDataCache/Compressed.ddp":
+        return "DDC"
+    if any([fnmatchcase(parts[-1], pattern) for pattern in DEBUG_SYMBOL_PATTERNS]):
+        return "DebugSymbols"
+    if parts[0] in TEMPLATE_SUBDIRS:
+        return "TemplatesAndSamples"
+    if len(parts) > 2 and parts[0] == "Engine" and parts[1] in ENGINE_SUBDIRS:
+        return parts[1]
+    return "InstalledBuild"
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+import json, os, shutil, subprocess, sys
+from os.path import dirname, exists, join
+from script_helpers import log
+
+# The file (committed to the image filesystem) that holds the exported BuildGraph graph, so every step sees the same node list
+GRAPH_FILE = "/home/ue4/.buildgraph/graph.json"
+
+# The directory (in a BuildKit cache mount) that BuildGraph uses to share node outputs between steps
+STORAGE_DIR = "/home/ue4/BuildGraphStorage"
+
+# The relative cost of nodes that compile code, which we use to spread the compilation work evenly across steps
+COMPILE_WEIGHT = 10
+
+
+# Runs a command and exits if it fails
+def run(command):
+    log("[run-buildgraph-step] {}".format(command))
+    code = subprocess.run(command, check=False).returncode
+    if code != 0:
+        sys.exit(code)
+
+
+# Retrieves the ordered list of nodes required to build the BuildGraph target
+def listNodes(graphFile):
+    with open(graphFile, "r") as f:
+        graph = json.load(f)
+    return [node["Name"] for group in graph["Groups"] for node in group["Nodes"]]
+
+
+# Splits the ordered list of nodes into contiguous groups of roughly equal cost
+def partition(nodes, count):
+    weights = [COMPILE_WEIGHT if n.startswith("Compile") else 1 for n in nodes]
+    total = sum(weights)
+    groups = [[] for _ in range(count)]
+    cumulative = 0
+    for node, weight in zip(nodes, weights):
+        index = min(count - 1, int((cumulative + weight / 2) * count / total))
+        groups[index].append(node)
+        cumulative += weight
+    return groups
+
+
+# Parse our command-line arguments
+if len(sys.argv) < 4:
+    log("Usage: {} STEP COUNT BUILDGRAPH_COMMAND [ARGS...]".format(sys.argv[0]))
+    sys.exit(1)
+step = int(sys.argv[1])
+count = int(sys.argv[2])
+command = sys.argv[3:]
+
+# The first step discards any state left over from previous builds and exports the graph
+if step == 1:
+    shutil.rmtree(dirname(GRAPH_FILE), ignore_errors=True)
+    os.makedirs(dirname(GRAPH_FILE))
+    for item in os.listdir(STORAGE_DIR) if exists(STORAGE_DIR) else []:
+        path = join(STORAGE_DIR, item)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.unlink(path)
+    run(command + ["-Export={}".format(GRAPH_FILE)])
+
+# Determine which nodes this step is responsible for
+nodes = listNodes(GRAPH_FILE)
+groups = partition(nodes, count)
+log(
+    "BuildGraph step {} of {} will execute {} of {} nodes".format(
+        step, count, len(groups[step - 1]), len(nodes)
+    )
+)
+
+# Execute each of the nodes in turn, sharing their outputs with subsequent steps
+for node in groups[step - 1]:
+    run(command + ["-SingleNode={}".format(node), "-SharedStorageDir=" + STORAGE_DIR])
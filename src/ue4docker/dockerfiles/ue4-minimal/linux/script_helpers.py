@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+import sys
+
+# The helper functions shared by the Python scripts that run inside the ue4-minimal build stages
+# (This module is copied into /tmp alongside the scripts, which import it from there)
+
+
+# Logs a message to stderr
+def log(message):
+    print(message, file=sys.stderr)
+    sys.stderr.flush()
+
+
+# Formats a size in bytes as a human-readable string, using the same binary units as ue4-docker on the host
+def formatSize(size):
+    for unit in ["bytes", "KiB", "MiB", "GiB"]:
+        if size < 1024 or unit == "GiB":
+            break
+        size /= 1024
+    return "{:.2f} {}".format(size, unit) if unit != "bytes" else f"{size} bytes"
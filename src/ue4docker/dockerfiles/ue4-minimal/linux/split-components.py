@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
-import glob, os, shutil, sys
-from os.path import basename, dirname, exists, join
-
-
-# Logs a message to stderr
-def log(message):
-    print(message, file=sys.stderr)
-    sys.stderr.flush()
+import os, shutil, sys
+from os.path import basename, dirname, exists, join, relpath
+from installed_build_components import (
+    ENGINE_SUBDIRS,
+    TEMPLATE_SUBDIRS,
+    identifyComponent,
+)
+from script_helpers import log
 
 
 # Extracts the files and directories for the specified component and moves them to a separate output directory
@@ -36,6 +36,17 @@ def extractComponent(inputDir, outputDir, component, description, items):
         shutil.move(item, join(parent, basename(item)))
 
 
+# Groups the individual files in the Installed Build by the component that each one belongs to
+def identifyFiles(rootDir):
+    components = {}
+    for root, dirs, files in os.walk(rootDir):
+        for name in files:
+            path = join(root, name)
+            component = identifyComponent(relpath(path, rootDir).replace(os.sep, "/"))
+            components.setdefault(component, []).append(path)
+    return components
+
+
 # Retrieve the path to the root directory of the Installed Build
 rootDir = sys.argv[1]
 
@@ -43,24 +54,21 @@ rootDir = sys.argv[1]
 outputDir = sys.argv[2]
 os.makedirs(outputDir, exist_ok=True)
 
-# Extract the DDC
-ddc = [join(rootDir, "Engine", "DerivedDataCache", "Compressed.ddp")]
+# Extract the DDC and debug symbols, using the same rules as the file manifest (see installed_build_components.py)
+files = identifyFiles(rootDir)
+ddc = sorted(files.get("DDC", []))
 extractComponent(rootDir, outputDir, "DDC", "Derived Data Cache (DDC)", ddc)
-
-# Extract debug symbols
-symbolFiles = glob.glob(join(rootDir, "**", "*.debug"), recursive=True) + glob.glob(
-    join(rootDir, "**", "*.sym"), recursive=True
-)
+symbolFiles = sorted(files.get("DebugSymbols", []))
 extractComponent(rootDir, outputDir, "DebugSymbols", "debug symbols", symbolFiles)
 
 # Extract template projects and samples
-subdirs = [join(rootDir, subdir) for subdir in ["FeaturePacks", "Samples", "Templates"]]
+subdirs = [join(rootDir, subdir) for subdir in TEMPLATE_SUBDIRS]
 extractComponent(
     rootDir, outputDir, "TemplatesAndSamples", "template projects and samples", subdirs
 )
 
 # Extract the larger non-optional subdirectories of the Engine directory
-for subdir in ["Binaries", "Content", "Extras", "Intermediate", "Plugins", "Source"]:
+for subdir in ENGINE_SUBDIRS:
     extractComponent(
         rootDir,
         outputDir,
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+import glob, re, sys
+from os.path import join
+from script_helpers import log
+
+# The log files written by UBT when it is invoked by BuildGraph (one per invocation, unlike the AutomationTool log which repeats their output)
+LOG_PATTERN = join(
+    "Engine", "Programs", "AutomationTool", "Saved", "Logs", "**", "UBT-*.txt"
+)
+
+# The header line of the cache statistics block that UBA prints in its session summary
+# (e.g. "  ------- Cache client stats summary -------")
+SUMMARY_HEADER = re.compile(r"^\s*-+\s*Cache\s.*summary\s*-+\s*$", re.IGNORECASE)
+
+# The rows of the statistics block, each of which is a name followed by a count (and optionally a duration)
+# (e.g. "  Fetch hits                 1234" or "  Fetch misses               56    1.2s")
+SUMMARY_ROW = re.compile(r"^\s*([A-Za-z][A-Za-z ]*?)\s{2,}(\d+)(?:\s+\S+)?\s*$")
+
+
+# Parses the last cache statistics block in a log file, returning the hit and miss counts (or None if the log contains no block)
+# (Only the last block is used, since a session that prints its summary more than once reports cumulative totals)
+def parseSummary(contents):
+    summary = None
+    lines = contents.splitlines()
+    for index, line in enumerate(lines):
+        if not SUMMARY_HEADER.match(line):
+            continue
+        stats = {}
+        for row in lines[index + 1 :]:
+            match = SUMMARY_ROW.match(row)
+            if match is None:
+                break
+            stats[match.group(1).strip().lower()] = int(match.group(2))
+        hits = [v for k, v in stats.items() if k.split()[-1] in ["hit", "hits"]]
+        misses = [v for k, v in stats.items() if k.split()[-1] in ["miss", "misses"]]
+        if len(hits) == 1 and len(misses) == 1:
+            summary = (hits[0], misses[0])
+    return summary
+
+
+# Sums the cache statistics reported by each UBT session
+engineRoot = sys.argv[1]
+hits = 0
+misses = 0
+sessions = 0
+for logFile in glob.glob(join(engineRoot, LOG_PATTERN), recursive=True):
+    with open(logFile, "r", errors="replace") as f:
+        summary = parseSummary(f.read())
+    if summary is not None:
+        sessions += 1
+        hits += summary[0]
+        misses += summary[1]
+
+# Report the overall hit rate
+log("\nUBA cache report:")
+if sessions == 0 or hits + misses == 0:
+    log("- No data (no UBA cache statistics were found in the UBT logs)")
+else:
+    log("- UBT sessions using the cache: {}".format(sessions))
+    log("- Cache hits: {}".format(hits))
+    log("- Cache misses: {}".format(misses))
+    log("- Hit rate: {:.1f}%".format(100.0 * hits / (hits + misses)))
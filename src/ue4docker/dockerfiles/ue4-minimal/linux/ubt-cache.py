@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+import glob, hashlib, json, os, re, shutil, sys
+from concurrent.futures import ThreadPoolExecutor
+from os.path import exists, isdir, islink, join, relpath
+from script_helpers import formatSize, log
+
+# The directories (relative to the Engine root) whose files are inputs to UBT actions
+INPUT_DIRS = [
+    "Engine/Build",
+    "Engine/Config",
+    "Engine/Plugins",
+    "Engine/Shaders",
+    "Engine/Source",
+]
+
+# The directory names that contain build outputs or content rather than inputs, which we don't descend into
+SKIPPED_DIR_NAMES = ["Binaries", "Content", "Intermediate", "Saved"]
+
+# The paths (relative to the cached Intermediate directory) of the files we use to track state across builds,
+# and of the directory that holds the Intermediate directory for each plugin
+STATE_DIR = "ue4-docker"
+MANIFEST_FILE = join(STATE_DIR, "source-state.json")
+ACTIONS_FILE = join(STATE_DIR, "action-counts.json")
+PLUGINS_DIR = join(STATE_DIR, "plugins")
+
+# The log files written by UBT when it is invoked by BuildGraph (one per invocation)
+UBT_LOG_PATTERN = join(
+    "Engine", "Programs", "AutomationTool", "Saved", "Logs", "**", "UBT-*.txt"
+)
+
+# The line that UBT prints when it executes the actions that are out of date for a target
+# (e.g. "Building 1234 actions with 16 processes..." or "Building 1234 actions with 16 parallel processes...")
+ACTIONS_PATTERN = re.compile(r"^\s*Building (\d+) actions? with", re.MULTILINE)
+
+# The suffix that UBT appends to the name of its log file when the same target is built more than once (e.g. "UBT-UnrealGame-Linux-Shipping_2.txt")
+LOG_SUFFIX_PATTERN = re.compile(r"_\d+$")
+
+
+# Computes the SHA-256 hash of a file's contents
+def hashFile(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Lists the input files under the Engine root that UBT compares against its outputs
+def listInputs(engineRoot):
+    inputs = []
+    for inputDir in INPUT_DIRS:
+        for root, dirs, files in os.walk(join(engineRoot, inputDir)):
+            dirs[:] = [d for d in dirs if d not in SKIPPED_DIR_NAMES]
+            inputs.extend([join(root, f) for f in files])
+    return inputs
+
+
+# Lists the root directory of each plugin under the Engine root (relative to the Engine root)
+def listPlugins(engineRoot):
+    plugins = []
+    for root, dirs, files in os.walk(join(engineRoot, "Engine", "Plugins")):
+        if any([f.endswith(".uplugin") for f in files]):
+            plugins.append(relpath(root, engineRoot))
+            dirs[:] = []
+        else:
+            dirs[:] = [d for d in dirs if d not in SKIPPED_DIR_NAMES]
+    return plugins
+
+
+# Redirects the Intermediate directory of each plugin into the cache mount, since only Engine/Intermediate is mounted
+# (Each plugin is stored under a flattened name, so that the cached paths do not resemble the Engine's own directory structure)
+def linkPlugins(engineRoot):
+    intermediateDir = join(os.path.abspath(engineRoot), "Engine", "Intermediate")
+    plugins = listPlugins(engineRoot)
+    for plugin in plugins:
+        target = join(intermediateDir, PLUGINS_DIR, plugin.replace(os.sep, "+"))
+        link = join(engineRoot, plugin, "Intermediate")
+        os.makedirs(target, exist_ok=True)
+        if islink(link):
+            os.unlink(link)
+        elif isdir(link):
+            shutil.rmtree(link)
+        os.symlink(target, link)
+    log("Redirected the Intermediate directories of {} plugins".format(len(plugins)))
+
+
+# Removes the links to the cached plugin Intermediate directories, which would otherwise dangle once the cache is unmounted
+def unlinkPlugins(engineRoot):
+    for plugin in listPlugins(engineRoot):
+        link = join(engineRoot, plugin, "Intermediate")
+        if islink(link):
+            os.unlink(link)
+
+
+# Restores the modification times of unchanged input files so UBT's incremental build can reuse the cached outputs
+def restore(engineRoot):
+    intermediateDir = join(engineRoot, "Engine", "Intermediate")
+    manifestPath = join(intermediateDir, MANIFEST_FILE)
+    linkPlugins(engineRoot)
+
+    # Remove the UBT logs from any previous build, so that our report only counts the actions executed by this build
+    for logFile in glob.glob(join(engineRoot, UBT_LOG_PATTERN), recursive=True):
+        os.unlink(logFile)
+
+    # Load the state of the input files from the previous build, if any
+    previous = {}
+    if exists(manifestPath):
+        with open(manifestPath, "r") as f:
+            previous = json.load(f)
+    else:
+        log("UBT cache is empty, the Engine will be built from scratch")
+
+    # Files whose size and modification time match the previous build are unchanged (e.g. when the source tree itself persists between builds),
+    # so we only need to hash the files whose modification times were reset (e.g. by a fresh clone) to determine whether their contents changed
+    current = {}
+    candidates = []
+    for path in listInputs(engineRoot):
+        relative = relpath(path, engineRoot)
+        details = os.stat(path)
+        stored = previous.get(relative)
+        if (
+            stored is not None
+            and stored["size"] == details.st_size
+            and stored["mtime"] == details.st_mtime_ns
+        ):
+            current[relative] = stored
+        else:
+            candidates.append((path, relative, details))
+
+    log("Hashing {} input files...".format(len(candidates)))
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        hashes = list(executor.map(hashFile, [c[0] for c in candidates]))
+
+    # Restore the previous timestamp of each file whose contents are unchanged
+    unchanged = len(current)
+    restored = 0
+    changed = 0
+    for (path, relative, details), digest in zip(candidates, hashes):
+        stored = previous.get(relative)
+        mtime = details.st_mtime_ns
+        if stored is not None and stored["hash"] == digest:
+            os.utime(path, ns=(stored["mtime"], stored["mtime"]))
+            mtime = stored["mtime"]
+            restored += 1
+        elif stored is not None:
+            changed += 1
+        current[relative] = {"hash": digest, "size": details.st_size, "mtime": mtime}
+
+    # Save the state of the input files for the next build
+    os.makedirs(join(intermediateDir, STATE_DIR), exist_ok=True)
+    with open(manifestPath, "w") as f:
+        json.dump(current, f)
+
+    log(
+        "Restored timestamps for {} unchanged files ({} already up to date, {} changed, {} added, {} removed)".format(
+            restored,
+            unchanged,
+            changed,
+            len(current) - unchanged - restored - changed,
+            len(set(previous.keys()) - set(current.keys())),
+        )
+    )
+
+
+# Reports the size of the cache and the UBT action hit rate, then removes the links to the cached plugin directories
+def finish(engineRoot):
+    intermediateDir = join(engineRoot, "Engine", "Intermediate")
+    size = 0
+    for root, _, files in os.walk(intermediateDir):
+        for file in files:
+            try:
+                size += os.lstat(join(root, file)).st_size
+            except OSError:
+                pass
+
+    # The number of actions executed for each target is read from UBT's own output, since UBT only executes the actions whose outputs are out of date
+    # (A target that is entirely up to date executes no actions, so its log contains no count)
+    executed = {}
+    for logFile in glob.glob(join(engineRoot, UBT_LOG_PATTERN), recursive=True):
+        with open(logFile, "r", errors="replace") as f:
+            counts = [int(m) for m in ACTIONS_PATTERN.findall(f.read())]
+        target = LOG_SUFFIX_PATTERN.sub(
+            "", os.path.splitext(os.path.basename(logFile))[0]
+        )
+        executed[target] = executed.get(target, 0) + sum(counts)
+
+    # UBT does not report how many of a target's actions were already up to date, so we take the total number of actions for each target
+    # to be the largest number that has ever been executed for it (i.e. by the build that populated the cache), and count the rest as hits
+    actionsPath = join(intermediateDir, ACTIONS_FILE)
+    totals = {}
+    if exists(actionsPath):
+        with open(actionsPath, "r") as f:
+            totals = json.load(f)
+    for target, count in executed.items():
+        totals[target] = max(totals.get(target, 0), count)
+    os.makedirs(join(intermediateDir, STATE_DIR), exist_ok=True)
+    with open(actionsPath, "w") as f:
+        json.dump(totals, f)
+
+    log("\nUBT cache report:")
+    log("- Cache size: {}".format(formatSize(size)))
+    total = sum([totals[target] for target in executed])
+    if len(executed) == 0 or total == 0:
+        log("- Hit rate: no data (no UBT actions were found in the UBT logs)")
+    else:
+        hits = total - sum(executed.values())
+        log(
+            "- Actions executed: {} (across {} targets)".format(
+                total - hits, len(executed)
+            )
+        )
+        log("- Actions reused from the cache: {} of {}".format(hits, total))
+        log("- Hit rate: {:.1f}%".format(100.0 * hits / total))
+
+    unlinkPlugins(engineRoot)
+
+
+# Parse our command-line arguments
+if len(sys.argv) != 3 or sys.argv[1] not in ["restore", "finish"]:
+    log("Usage: {} restore|finish ENGINE_ROOT".format(sys.argv[0]))
+    sys.exit(1)
+
+if sys.argv[1] == "restore":
+    restore(sys.argv[2])
+else:
+    finish(sys.argv[2])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import json, os, sys
+from os.path import dirname, expanduser, join
+from xml.sax.saxutils import escape
+from script_helpers import log
+
+# The location of the per-user BuildConfiguration.xml file that UBT reads under Linux
+CONFIG_FILE = join(
+    expanduser("~"),
+    ".config",
+    "Unreal Engine",
+    "UnrealBuildTool",
+    "BuildConfiguration.xml",
+)
+
+# The location of the file that records the version of the Engine being built (relative to the Engine root, which is the working directory)
+BUILD_VERSION_FILE = join("Engine", "Build", "Build.version")
+
+# The settings that are only recognised by newer versions of UBT, which reject unknown settings, and the Engine version that introduced each one
+MINIMUM_VERSIONS = {("ParallelExecutor", "MemoryPerActionBytes"): (5, 0)}
+
+
+# Formats a setting value using the representation that UBT's XML config parser expects
+def formatValue(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return escape(os.path.expandvars(str(value)))
+
+
+# Retrieve the settings to write, grouped by category
+# (Values may reference environment variables, which allows build secrets to be injected at build time)
+settings = json.loads(sys.argv[1])
+
+# Remove any settings that are not supported by the version of the Engine being built
+with open(BUILD_VERSION_FILE, "r") as f:
+    details = json.load(f)
+version = (details["MajorVersion"], details["MinorVersion"])
+for (category, key), minimum in MINIMUM_VERSIONS.items():
+    if version < minimum and key in settings.get(category, {}):
+        log(
+            "Omitting {}.{} since it requires Unreal Engine {}.{} or newer".format(
+                category, key, *minimum
+            )
+        )
+        del settings[category][key]
+
+# Generate the XML for each category
+lines = [
+    '<?xml version="1.0" encoding="utf-8" ?>',
+    '<Configuration xmlns="https://www.unrealengine.com/BuildConfiguration">',
+]
+for category, values in settings.items():
+    lines.append("\t<{}>".format(category))
+    for key, value in values.items():
+        lines.append("\t\t<{}>{}</{}>".format(key, formatValue(value), key))
+    lines.append("\t</{}>".format(category))
+lines.append("</Configuration>")
+
+# Write the configuration file
+os.makedirs(dirname(CONFIG_FILE), exist_ok=True)
+with open(CONFIG_FILE, "w") as f:
+    f.write("\n".join(lines) + "\n")
+
+log("Wrote UBT configuration settings to {}:".format(CONFIG_FILE))
+for category, values in settings.items():
+    for key in values.keys():
+        log("- {}.{}".format(category, key))
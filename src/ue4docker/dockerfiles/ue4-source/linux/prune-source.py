@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+import argparse, os, re, subprocess, sys
+from os.path import exists, join, relpath
+
+# The platforms whose third-party dependencies are not needed when building for a Linux host
+EXCLUDED_PLATFORMS = [
+    "Android",
+    "HoloLens",
+    "IOS",
+    "Mac",
+    "TVOS",
+    "VisionOS",
+    "Win32",
+    "Win64",
+    "Windows",
+]
+
+# The directories (relative to the Engine root) that contain per-platform third-party dependencies
+THIRD_PARTY_ROOTS = [
+    "Engine/Binaries/ThirdParty",
+    "Engine/Source/ThirdParty",
+    "Engine/Plugins/**/ThirdParty",
+]
+
+# The binary payloads that we drop from the per-platform third-party directories
+# (Everything else is kept, since the module rules for Linux modules may reference the rules and headers for other platforms)
+BINARY_PAYLOADS = ["lib/**", "Lib/**", "bin/**", "Bin/**", "*.lib", "*.dll", "*.a"]
+
+# The directories (relative to the Engine root) containing documentation
+DOCUMENTATION_DIRS = ["Engine/Documentation"]
+
+# The directories (relative to the Engine root) containing samples, which are only pruned when template projects and samples are excluded
+SAMPLE_DIRS = ["Samples"]
+
+# The files that are always kept, since UnrealBuildTool compiles every module and target rules file when it builds its rules assembly
+KEPT_FILES = ["**/*.Build.cs", "**/*.Target.cs"]
+
+
+# Logs a message to stderr
+def log(message):
+    print(message, file=sys.stderr)
+    sys.stderr.flush()
+
+
+# Generates the ordered list of gitignore-style patterns (relative to the Engine root) for the files that we drop and keep,
+# where later patterns take precedence over earlier ones (this list is used for both the sparse checkout and the prune)
+def prunePatterns(samples):
+    patterns = []
+    for root in THIRD_PARTY_ROOTS:
+        for platform in EXCLUDED_PLATFORMS:
+            patterns.extend(
+                [
+                    ("{}/**/{}/**/{}".format(root, platform, payload), True)
+                    for payload in BINARY_PAYLOADS
+                ]
+            )
+    patterns.extend([("{}/**".format(d), True) for d in DOCUMENTATION_DIRS])
+    if samples:
+        patterns.extend([("{}/**".format(d), True) for d in SAMPLE_DIRS])
+    patterns.extend([(p, False) for p in KEPT_FILES])
+    return patterns
+
+
+# Compiles a gitignore-style pattern into a regular expression, using the same semantics as git's non-cone sparse checkout
+# (`*` and `?` do not match `/`, a `**` component matches zero or more directories, and a trailing `/**` matches everything inside)
+def compilePattern(pattern):
+    segments = pattern.split("/")
+    regex = ""
+    for index, segment in enumerate(segments):
+        last = index == len(segments) - 1
+        if segment == "**":
+            regex += ".+" if last else "(?:[^/]+/)*"
+            continue
+        for c in segment:
+            regex += "[^/]*" if c == "*" else "[^/]" if c == "?" else re.escape(c)
+        if not last:
+            regex += "/"
+    return re.compile(regex)
+
+
+# Determines whether a file (relative to the Engine root, using `/` separators) is dropped by our patterns
+def isExcluded(path, compiled):
+    excluded = False
+    for regex, exclude in compiled:
+        if regex.fullmatch(path):
+            excluded = exclude
+    return excluded
+
+
+# Writes the sparse-checkout patterns for a freshly-initialised git repository
+def writeSparseCheckout(engineRoot, samples):
+    infoDir = join(engineRoot, ".git", "info")
+    os.makedirs(infoDir, exist_ok=True)
+    lines = ["/*"] + [
+        "{}/{}".format("!" if exclude else "", pattern)
+        for pattern, exclude in prunePatterns(samples)
+    ]
+    with open(join(infoDir, "sparse-checkout"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    log("Configured sparse checkout with {} patterns".format(len(lines) - 1))
+
+
+# Computes the number of tracked files (and their size) that were skipped by the sparse checkout
+def sparseCheckoutSavings(engineRoot):
+    if not exists(join(engineRoot, ".git")):
+        return None
+
+    run = lambda args: subprocess.run(
+        ["git"] + args,
+        cwd=engineRoot,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+    ).stdout.splitlines()
+
+    # Files marked with the skip-worktree bit are listed with an "S" tag
+    skipped = set(
+        [line[2:] for line in run(["ls-files", "-v"]) if line.startswith("S ")]
+    )
+    if len(skipped) == 0:
+        return None
+
+    # Retrieve the blob sizes for each tracked file from the tree object
+    size = 0
+    for line in run(["ls-tree", "-r", "-l", "HEAD"]):
+        details, path = line.split("\t", 1)
+        if path in skipped:
+            blobSize = details.split()[3]
+            size += int(blobSize) if blobSize.isdigit() else 0
+
+    return len(skipped), size
+
+
+# Identifies the category of a pruned file for our size report
+def categorise(path):
+    components = path.split("/")
+    for platform in EXCLUDED_PLATFORMS:
+        if platform in components:
+            return "{} third-party binaries".format(platform)
+    if any([path.startswith(d + "/") for d in SAMPLE_DIRS]):
+        return "samples"
+    return "documentation"
+
+
+# Removes all files matching our patterns after Setup.sh has downloaded the dependency data
+def prune(engineRoot, samples):
+    compiled = [(compilePattern(p), exclude) for p, exclude in prunePatterns(samples)]
+    removed = {}
+    count = 0
+
+    for root, dirs, files in os.walk(engineRoot):
+        # Don't bother descending into the git repository metadata
+        if root == engineRoot and ".git" in dirs:
+            dirs.remove(".git")
+
+        for file in files:
+            path = join(root, file)
+            relative = relpath(path, engineRoot).replace(os.sep, "/")
+            if isExcluded(relative, compiled):
+                category = categorise(relative)
+                removed[category] = removed.get(category, 0) + os.lstat(path).st_size
+                os.unlink(path)
+                count += 1
+
+    # Report what was saved in GiB (we only measure the files we removed, since measuring the whole source tree is slow)
+    gib = lambda size: "{:.2f} GiB".format(size / (1024 * 1024 * 1024))
+    log("\nSource tree size report:")
+    sparse = sparseCheckoutSavings(engineRoot)
+    if sparse is not None:
+        log(
+            "- Skipped by sparse checkout: {} ({} files)".format(
+                gib(sparse[1]), sparse[0]
+            )
+        )
+    for category, size in sorted(removed.items(), key=lambda i: i[1], reverse=True):
+        log("- Pruned {}: {}".format(category, gib(size)))
+    log("- Total pruned: {} ({} files)".format(gib(sum(removed.values())), count))
+
+
+# Parse our command-line arguments
+parser = argparse.ArgumentParser()
+parser.add_argument("mode", choices=["checkout", "prune"])
+parser.add_argument("root", help="The Engine root directory")
+parser.add_argument(
+    "--samples", action="store_true", help="Also drop samples from the source tree"
+)
+args = parser.parse_args()
+
+if args.mode == "checkout":
+    writeSparseCheckout(args.root, args.samples)
+else:
+    prune(args.root, args.samples)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import os, shutil, sys, uuid
+from os.path import exists, isdir, islink, join
+
+# The file (outside of the cache mount) that records which copy of the source tree an image expects to find
+IMAGE_MARKER = "/home/ue4/.volatile-source-id"
+
+# The name of the file (inside the cache mount) that records which copy of the source tree it holds
+CACHE_MARKER = ".volatile-source-id"
+
+
+# Logs a message to stderr
+def log(message):
+    print(message, file=sys.stderr)
+    sys.stderr.flush()
+
+
+# Reads the contents of a marker file, returning None if it does not exist
+def readMarker(path):
+    if not exists(path):
+        return None
+    with open(path, "r") as f:
+        return f.read().strip()
+
+
+# Empties the cache mount and writes a fresh pair of marker files that tie it to the image being built
+def initialise(engineRoot):
+    # Remove any stale source tree left behind by a previous build
+    for item in os.listdir(engineRoot):
+        path = join(engineRoot, item)
+        if isdir(path) and not islink(path):
+            shutil.rmtree(path)
+        else:
+            os.unlink(path)
+
+    # Generate a unique identifier for the new source tree
+    identifier = str(uuid.uuid4())
+    for marker in [IMAGE_MARKER, join(engineRoot, CACHE_MARKER)]:
+        with open(marker, "w") as f:
+            f.write(identifier + "\n")
+
+    log(
+        "Initialised volatile Engine source tree {} in {}".format(
+            identifier, engineRoot
+        )
+    )
+
+
+# Verifies that the cache mount holds the source tree that was populated when the ue4-source image was built
+def verify(engineRoot):
+    expected = readMarker(IMAGE_MARKER)
+    actual = readMarker(join(engineRoot, CACHE_MARKER))
+    if expected is None or expected != actual:
+        log(
+            "Error: the Engine source tree in the BuildKit cache mount at {} is missing or does not match this image.".format(
+                engineRoot
+            )
+        )
+        log(
+            "The cache may have been pruned or overwritten by another build, rebuild the ue4-source image (e.g. with the `--no-cache` flag) to repopulate it."
+        )
+        sys.exit(1)
+
+
+# Parse our command-line arguments
+if len(sys.argv) != 3 or sys.argv[1] not in ["init", "verify"]:
+    log("Usage: {} init|verify ENGINE_ROOT".format(sys.argv[0]))
+    sys.exit(1)
+
+if sys.argv[1] == "init":
+    initialise(sys.argv[2])
+else:
+    verify(sys.argv[2])
@@ -26,7 +26,15 @@ def export():
             "function": exportInstalledBuild,
             "description": "Exports an Installed Build of the Engine",
             "image": GlobalConfiguration.resolveTag("ue4-full"),
-            "help": "Copies the Installed Build from a container to the host system.\nOnly supported under Linux for UE 4.21.0 and newer.",
+            "help": "Copies the Installed Build from a container to the host system.\nOnly supported under Linux for UE 4.21.0 and newer.\n\n"
+            + "The destination can be a directory on the host system, or a named Docker\nvolume specified as volume:NAME, which is populated once and can then be\nmounted read-only into many containers created from the\nue4-build-prerequisites image.\n\n"
+            + "The destination can also be a compressed read-only filesystem image,\nspecified as squashfs:FILE or erofs:FILE, which requires sqfstar or\nmkfs.erofs respectively. Any additional arguments are passed to the tool.",
+        },
+        "manifest": {
+            "function": exportManifest,
+            "description": "Exports the file manifest of an Installed Build",
+            "image": GlobalConfiguration.resolveTag("ue4-minimal"),
+            "help": "Reads the file manifest embedded in the image without starting a container\nand writes the path, size, mode, content hash and component of each file\nin the Installed Build to the destination file as JSON.\nOnly supported for Linux images.",
         },
         "packages": {
             "function": exportPackages,
@@ -35,6 +43,13 @@ def export():
             "help": "Runs a temporary conan server inside a container and uses it to export the\ngenerated conan-ue4cli wrapper packages.\n\n"
             + 'Currently the only supported destination value is "cache", which exports\nthe packages to the Conan local cache on the host system.',
         },
+        "symbols": {
+            "function": exportSymbols,
+            "description": "Overlays debug symbols onto an Installed Build",
+            "image": GlobalConfiguration.resolveTag("ue4-minimal-symbols"),
+            "help": "Copies the debug symbols from an image built with the --symbols-image flag\ninto an Installed Build, merging them with its existing files.\n\n"
+            + "The destination can be a directory containing an Installed Build that was\nexported from the ue4-minimal image, or a running container created from\nthe ue4-minimal image, specified as container:NAME.\nOnly supported for Linux images.",
+        },
     }
 
     # Parse the supplied command-line arguments
@@ -1,2 +1,4 @@
 from .export_installed import exportInstalledBuild
+from .export_manifest import exportManifest
 from .export_packages import exportPackages
+from .export_symbols import exportSymbols
@@ -3,10 +3,38 @@ import tempfile
 from docker.models.containers import Container
 
 from ..infrastructure import DockerUtils, SubprocessUtils
-import json, os, platform, shutil, subprocess, sys
+from ..infrastructure.DockerUtils import ENGINE_ROOT_LABEL
+import docker, json, os, platform, posixpath, shutil, subprocess, sys
+
+# The prefix used to specify a named Docker volume as the export destination
+VOLUME_PREFIX = "volume:"
+
+# The prefixes used to specify a compressed read-only filesystem image as the export destination, and the command that builds each type of image from a tar archive on stdin
+# (Both tools compress the filesystem using all available CPU cores, and read the archive as a stream without extracting it to disk)
+FILESYSTEM_IMAGE_TOOLS = {
+    "squashfs:": {"command": ["sqfstar"], "defaults": {"-comp": ["-comp", "zstd"]}},
+    "erofs:": {"command": ["mkfs.erofs", "--tar=f"], "defaults": {"-z": ["-zlz4hc"]}},
+}
+
+# The labels that record the source of the Installed Build in a volume
+SOURCE_IMAGE_LABEL = "com.adamrehn.ue4-docker.source-image"
+SOURCE_DIGEST_LABEL = "com.adamrehn.ue4-docker.source-digest"
 
 
 def exportInstalledBuild(image, destination, extraArgs):
+    # Determine whether we are populating a Docker volume rather than a directory on the host system
+    if destination.startswith(VOLUME_PREFIX):
+        sys.exit(exportInstalledBuildToVolume(image, destination[len(VOLUME_PREFIX) :]))
+
+    # Determine whether we are writing a compressed filesystem image rather than a directory on the host system
+    for prefix in FILESYSTEM_IMAGE_TOOLS:
+        if destination.startswith(prefix):
+            sys.exit(
+                exportInstalledBuildToFilesystemImage(
+                    image, prefix, destination[len(prefix) :], extraArgs
+                )
+            )
+
     # Verify that the destination directory does not already exist
     if os.path.exists(destination) == True:
         print("Error: the destination directory already exists.", file=sys.stderr)
@@ -63,3 +91,208 @@ def doExportInstalledBuild(container: Container, destination: str, extraArgs) ->
     subprocess.run(
         ["docker", "cp", f"{container.name}:{engineRoot}", destination], check=True
     )
+
+
+def _isSupportedVersion(image, engineRoot):
+    # Verify that the Installed Build in the specified image is at least 4.21.0
+    try:
+        version = json.loads(
+            DockerUtils.readFile(image, engineRoot + "/Engine/Build/Build.version")
+        )
+        if version["MajorVersion"] == 4 and version["MinorVersion"] < 21:
+            raise Exception()
+    except:
+        print(
+            "Error: Installed Builds can only be exported for Unreal Engine 4.21.0 and newer.",
+            file=sys.stderr,
+        )
+        return False
+    return True
+
+
+def exportInstalledBuildToVolume(image, volumeName) -> int:
+    client = DockerUtils.connect()
+    details = client.images.get(image)
+    if details.attrs.get("Os") != "linux":
+        print(
+            "Error: Installed Builds can only be exported to volumes from Linux images.",
+            file=sys.stderr,
+        )
+        return 1
+    engineRoot = DockerUtils.getEngineRoot(details)
+
+    # If the volume already exists then it can only be reused if it was populated from the same image
+    # (Volumes cannot be modified while containers are using them, so we never overwrite an existing volume)
+    try:
+        volume = client.volumes.get(volumeName)
+        labels = volume.attrs.get("Labels", None) or {}
+        if labels.get(SOURCE_DIGEST_LABEL) == details.id:
+            print(
+                'The volume "{}" already contains the Installed Build from {}.'.format(
+                    volumeName, details.id
+                )
+            )
+            _printMountUsage(volumeName)
+            return 0
+
+        print(
+            'Error: the volume "{}" already exists and was not populated from "{}". Remove it with `docker volume rm {}` to export again.'.format(
+                volumeName, image, volumeName
+            ),
+            file=sys.stderr,
+        )
+        return 1
+    except docker.errors.NotFound:
+        pass
+
+    if not _isSupportedVersion(image, engineRoot):
+        return 1
+
+    # Create the volume, recording the image it was populated from (volume labels cannot be changed after creation)
+    volume = client.volumes.create(
+        volumeName,
+        labels={
+            SOURCE_IMAGE_LABEL: image,
+            SOURCE_DIGEST_LABEL: details.id,
+            ENGINE_ROOT_LABEL: engineRoot,
+        },
+    )
+
+    # Create a container from which we will copy files, and a second container with the empty volume mounted at the location of the Installed Build
+    # (The volume is mounted without copying the existing contents of the mount point from the image, since we copy those ourselves)
+    source = DockerUtils.create(image)
+    target = None
+    success = False
+    try:
+        target = DockerUtils.create(
+            image,
+            mounts=[
+                docker.types.Mount(engineRoot, volumeName, type="volume", no_copy=True)
+            ],
+        )
+
+        # Stream the Installed Build directly from one container to the other, without storing it on the host
+        print('Exporting to volume "{}"...'.format(volumeName))
+        stream, _ = source.get_archive(engineRoot)
+        success = target.put_archive(posixpath.dirname(engineRoot), stream)
+        if not success:
+            print(
+                "Error: failed to copy the Installed Build into the volume.",
+                file=sys.stderr,
+            )
+            return 1
+    except Exception as e:
+        print("Error: failed to export Installed Build.", file=sys.stderr)
+        raise e
+    finally:
+        # Remove the containers, and the volume if it was not fully populated
+        source.remove()
+        if target is not None:
+            target.remove()
+        if not success:
+            volume.remove()
+
+    _printMountUsage(volumeName)
+    return 0
+
+
+def _printMountUsage(volumeName):
+    # Print the `docker run` flags equivalent to the arguments that DockerUtils.engineVolumeMount() generates for the volume
+    details = DockerUtils.engineVolumeMount(volumeName)
+    flags = [
+        "--mount type={},source={},target={}{}".format(
+            mount["Type"],
+            mount["Source"],
+            mount["Target"],
+            ",readonly" if mount.get("ReadOnly", False) == True else "",
+        )
+        for mount in details["mounts"]
+    ] + ["--env {}={}".format(k, v) for k, v in details["environment"].items()]
+    print("Mount the volume read-only into containers with:\n  " + " ".join(flags))
+
+
+def exportInstalledBuildToFilesystemImage(image, prefix, destination, extraArgs) -> int:
+    # Verify that the destination file does not already exist and that the tool for building the image is installed
+    tool = FILESYSTEM_IMAGE_TOOLS[prefix]
+    if os.path.exists(destination) == True:
+        print("Error: the destination file already exists.", file=sys.stderr)
+        return 1
+    if shutil.which(tool["command"][0]) is None:
+        print(
+            "Error: {} must be installed to export {} images.".format(
+                tool["command"][0], prefix.rstrip(":")
+            ),
+            file=sys.stderr,
+        )
+        return 1
+
+    client = DockerUtils.connect()
+    details = client.images.get(image)
+    if details.attrs.get("Os") != "linux":
+        print(
+            "Error: Installed Builds can only be exported to filesystem images from Linux images.",
+            file=sys.stderr,
+        )
+        return 1
+    engineRoot = DockerUtils.getEngineRoot(details)
+    if not _isSupportedVersion(image, engineRoot):
+        return 1
+
+    # Any additional arguments are passed to the tool, and replace our default for any option they specify
+    options = []
+    for option, default in tool["defaults"].items():
+        if not any([arg.startswith(option) for arg in extraArgs]):
+            options.extend(default)
+
+    # The image is written to a temporary file and moved into place once it is complete, so an existing image can be replaced while it is mounted
+    # (sqfstar takes the output image as its only positional argument, whereas mkfs.erofs reads the archive from stdin when no source is specified)
+    temporary = destination + ".tmp"
+    command = tool["command"] + options + extraArgs + [temporary]
+
+    # Create a container from which we will copy files
+    container = DockerUtils.create(image)
+    success = False
+    try:
+        # Stream the contents of the engine directory directly into the tool, without extracting it to disk
+        # (Requesting the path with a trailing `/.` places the contents of the directory at the root of the archive, as with `docker cp`)
+        print("Exporting to {}...".format(destination))
+        stream, _ = container.get_archive(engineRoot + "/.")
+        process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        try:
+            for chunk in stream:
+                process.stdin.write(chunk)
+        except BrokenPipeError:
+            pass
+        finally:
+            process.stdin.close()
+        if process.wait() != 0:
+            print(
+                "Error: {} failed with exit code {}.".format(
+                    tool["command"][0], process.returncode
+                ),
+                file=sys.stderr,
+            )
+            return 1
+
+        os.replace(temporary, destination)
+        success = True
+    except Exception as e:
+        print("Error: failed to export Installed Build.", file=sys.stderr)
+        raise e
+    finally:
+        # Remove the container and any partially written image, irrespective of whether or not the export succeeded
+        container.remove()
+        if not success and os.path.exists(temporary):
+            os.unlink(temporary)
+
+    print(
+        "Mount the image read-only at {} with:\n  {}".format(
+            engineRoot,
+            (
+                "mount -t squashfs -o loop,ro {0} {1}  (or: squashfuse {0} {1})"
+                if prefix == "squashfs:"
+                else "mount -t erofs -o loop,ro {0} {1}  (or: erofsfuse {0} {1})"
+            ).format(destination, engineRoot),
+        )
+    )
+    return 0
@@ -0,0 +1,34 @@
+from ..infrastructure import FilesystemUtils, InstalledBuildManifest
+import humanfriendly, os, sys
+
+
+def exportManifest(image, destination, extraArgs):
+    # Verify that the destination file does not already exist
+    if os.path.exists(destination) == True:
+        print("Error: the destination file already exists.", file=sys.stderr)
+        sys.exit(1)
+
+    # Read the manifest from the image
+    try:
+        manifest = InstalledBuildManifest.fromImage(image)
+    except RuntimeError as e:
+        print("Error: {}.".format(e), file=sys.stderr)
+        sys.exit(1)
+
+    # Write the manifest entries to the destination file as JSON
+    print("Exporting to {}...".format(destination))
+    FilesystemUtils.writeFile(destination, manifest.toJson(indent=2))
+
+    # Summarise the contents of the Installed Build
+    print(
+        "Manifest lists {} files totalling {}.".format(
+            len(manifest.files),
+            humanfriendly.format_size(manifest.totalSize(), binary=True),
+        )
+    )
+    for component, size in sorted(
+        manifest.componentSizes().items(), key=lambda c: c[1], reverse=True
+    ):
+        print(
+            "- {}: {}".format(component, humanfriendly.format_size(size, binary=True))
+        )
@@ -0,0 +1,72 @@
+from ..infrastructure import DockerUtils
+import docker, os, posixpath, subprocess, sys
+
+# The location of the debug symbols inside the ue4-minimal-symbols image
+SYMBOLS_ROOT = "/home/ue4/UnrealEngine"
+
+# The prefix used to specify a running container as the export destination
+CONTAINER_PREFIX = "container:"
+
+
+def exportSymbols(image, destination, extraArgs):
+    # Determine whether we are overlaying the symbols onto a running container or onto an exported Installed Build
+    target = None
+    if destination.startswith(CONTAINER_PREFIX):
+        try:
+            client = DockerUtils.connect()
+            target = client.containers.get(destination[len(CONTAINER_PREFIX) :])
+        except docker.errors.NotFound:
+            print(
+                'Error: the container "{}" does not exist.'.format(
+                    destination[len(CONTAINER_PREFIX) :]
+                ),
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+        # The archive of the symbols contains a single root directory, so it must have the same name as the engine directory in the container
+        engineRoot = DockerUtils.getEngineRoot(target, SYMBOLS_ROOT)
+        if posixpath.basename(engineRoot) != posixpath.basename(SYMBOLS_ROOT):
+            print(
+                "Error: the Installed Build in the container is located at {}, which is not supported.".format(
+                    engineRoot
+                ),
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+    # Verify that the destination directory contains an Installed Build
+    elif not os.path.isdir(os.path.join(destination, "Engine")):
+        print(
+            "Error: the destination directory does not contain an exported Installed Build.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    # Create a container from which we will copy files (the image has no command, so we supply a placeholder since the container is never started)
+    container = DockerUtils.create(image, command="symbols")
+    try:
+        if target is not None:
+            # Stream the symbols directly from one container to the other, without storing them on the host
+            print("Overlaying debug symbols onto container {}...".format(target.name))
+            stream, _ = container.get_archive(SYMBOLS_ROOT)
+            if not target.put_archive(posixpath.dirname(engineRoot), stream):
+                print(
+                    "Error: failed to copy the debug symbols into the container.",
+                    file=sys.stderr,
+                )
+                sys.exit(1)
+        else:
+            # Merge the symbols into the existing directory structure of the Installed Build
+            print("Overlaying debug symbols onto {}...".format(destination))
+            subprocess.run(
+                [
+                    "docker",
+                    "cp",
+                    "{}:{}/.".format(container.name, SYMBOLS_ROOT),
+                    destination,
+                ],
+                check=True,
+            )
+    finally:
+        container.remove()
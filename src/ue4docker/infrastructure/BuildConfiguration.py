@@ -1,4 +1,5 @@
 import json
+import os
 import platform
 import random
 from typing import Optional
@@ -7,6 +8,7 @@ import humanfriendly
 from packaging.version import Version, InvalidVersion
 
 from .DockerUtils import DockerUtils
+from .ImageAnalyzer import COMPONENTS
 from .WindowsUtils import WindowsUtils
 
 # The default Unreal Engine git repository
@@ -18,6 +20,9 @@ LINUX_BASE_IMAGES = {
     "cuda": "nvidia/cuda:{cuda}-devel-{ubuntu}",
 }
 
+# The maximum compression level supported by BuildKit for each layer compression method
+COMPRESSION_LEVELS = {"gzip": 9, "zstd": 22}
+
 # The default ubuntu base to use
 DEFAULT_LINUX_VERSION = "ubuntu22.04"
 
@@ -27,6 +32,25 @@ DEFAULT_CUDA_VERSION = "12.2.0"
 # The default memory limit (in GB) under Windows
 DEFAULT_MEMORY_LIMIT = 10.0
 
+# The game target configurations that can be included in an Installed Build, for each Unreal Engine release onwards
+# (UnrealBuildTool refuses to build projects in the Debug configuration against an Installed Build, so it is never included,
+# and prior to Unreal Engine 5.0 the client and dedicated server targets do not support the Test configuration)
+GAME_CONFIGURATIONS = {
+    "4.27.0": {
+        "game": ["DebugGame", "Development", "Test", "Shipping"],
+        "client": ["DebugGame", "Development", "Shipping"],
+        "server": ["DebugGame", "Development", "Shipping"],
+    },
+    "5.0.0": {
+        "game": ["DebugGame", "Development", "Test", "Shipping"],
+        "client": ["DebugGame", "Development", "Test", "Shipping"],
+        "server": ["DebugGame", "Development", "Test", "Shipping"],
+    },
+}
+
+# The default amount of memory (in GB) to reserve for each parallel compile action under Linux
+DEFAULT_GB_PER_ACTION = 2.0
+
 # The Perforce changelist numbers for each supported .0 release of the Unreal Engine
 UNREAL_ENGINE_RELEASE_CHANGELISTS = {
     "4.27.0": 17155196,
@@ -102,6 +126,12 @@ class ExcludedComponent(object):
     # Template projects and samples
     Templates = "templates"
 
+    # Client game targets
+    Client = "client"
+
+    # Dedicated server game targets
+    Server = "server"
+
     @staticmethod
     def description(component):
         """
@@ -111,6 +141,8 @@ class ExcludedComponent(object):
             ExcludedComponent.DDC: "Derived Data Cache (DDC)",
             ExcludedComponent.Debug: "Debug symbols",
             ExcludedComponent.Templates: "Template projects and samples",
+            ExcludedComponent.Client: "Client game targets",
+            ExcludedComponent.Server: "Dedicated server game targets",
         }.get(component, "[Unknown component]")
 
 
@@ -140,6 +172,16 @@ class BuildConfiguration(object):
             action="store_true",
             help="Rebuild images even if they already exist",
         )
+        parser.add_argument(
+            "--rebase",
+            action="store_true",
+            help="Rebuild the build prerequisites image and copy the Engine from the existing ue4-minimal image on top of it, rather than building the Engine again (Linux containers only)",
+        )
+        parser.add_argument(
+            "--derive-variants",
+            action="store_true",
+            help="Build the Engine once for the OpenGL variant of the Linux images and derive the CUDA variant from it, rather than building the Engine for each (requires --cuda)",
+        )
         parser.add_argument(
             "--dry-run",
             action="store_true",
@@ -182,9 +224,22 @@ class BuildConfiguration(object):
                 ExcludedComponent.DDC,
                 ExcludedComponent.Debug,
                 ExcludedComponent.Templates,
+                ExcludedComponent.Client,
+                ExcludedComponent.Server,
             ],
             help="Exclude the specified component (can be specified multiple times to exclude multiple components)",
         )
+        parser.add_argument(
+            "--compress-debug",
+            default=None,
+            choices=["zlib", "zstd"],
+            help="Compress the debug sections of the debug symbols rather than including them uncompressed (Linux containers only)",
+        )
+        parser.add_argument(
+            "--symbols-image",
+            action="store_true",
+            help="Publish the debug symbols in a separate ue4-minimal-symbols image rather than in the ue4-minimal image (Linux containers only)",
+        )
         parser.add_argument(
             "--opt",
             action="append",
@@ -223,6 +278,11 @@ class BuildConfiguration(object):
             default=None,
             help='Set the custom branch/tag to clone when "custom" is specified as the release value',
         )
+        parser.add_argument(
+            "-source-dir",
+            default=None,
+            help="Copy the Engine source code from the specified host directory instead of cloning a git repository (implies `--opt source_mode=copy`)",
+        )
         parser.add_argument(
             "-isolation",
             default=None,
@@ -262,6 +322,72 @@ class BuildConfiguration(object):
             action="store_true",
             help="Combine generated Dockerfiles into a single multi-stage build Dockerfile",
         )
+        parser.add_argument(
+            "--size-budget",
+            action="append",
+            default=[],
+            metavar="[TARGET=]SIZE",
+            help="Fail the build if a built image exceeds the specified size, where the optional target is an image name (e.g. ue4-minimal) or an Installed Build component (e.g. DebugSymbols) (can be specified multiple times)",
+        )
+        parser.add_argument(
+            "--warn-size-budget",
+            action="store_true",
+            help="Print a warning rather than failing the build when a size budget is exceeded",
+        )
+        parser.add_argument(
+            "--layer-compression",
+            default=None,
+            choices=["gzip", "zstd", "uncompressed"],
+            help="Compress the filesystem layers of built images using the specified method (Linux containers only)",
+        )
+        parser.add_argument(
+            "--compression-level",
+            default=None,
+            type=int,
+            metavar="LEVEL",
+            help="Set the compression level for the method specified by --layer-compression",
+        )
+        parser.add_argument(
+            "--force-compression",
+            action="store_true",
+            help="Recompress existing layers (including those of base images) that use a different compression method",
+        )
+        parser.add_argument(
+            "--compression-report",
+            action="store_true",
+            help="Report the compressed size, compression ratio and decompression time of each layer after each build",
+        )
+        parser.add_argument(
+            "--output-oci",
+            default=None,
+            metavar="PATH",
+            help="Write the final image (ue4-full, or ue4-minimal if ue4-full is not being built) to an OCI image layout directory "
+            + "rather than loading it into the Docker daemon, or to an OCI tarball if the path ends in .tar (Linux containers only)",
+        )
+        parser.add_argument(
+            "--oci-push",
+            default=None,
+            metavar="REFERENCE",
+            help="Push the image written by --output-oci to the specified registry reference using skopeo",
+        )
+        parser.add_argument(
+            "--cache-registry",
+            default=None,
+            metavar="REPOSITORY",
+            help="Import and export the build cache for each image using the specified registry repository, so it can be shared between hosts (Linux containers only)",
+        )
+        parser.add_argument(
+            "--push",
+            action="store_true",
+            help="Push the built images to their registries once all images have been built",
+        )
+        parser.add_argument(
+            "--push-jobs",
+            default=4,
+            type=int,
+            metavar="N",
+            help="The maximum number of images to push concurrently when using --push (default is 4)",
+        )
         parser.add_argument(
             "--monitor",
             action="store_true",
@@ -308,6 +434,33 @@ class BuildConfiguration(object):
         self.args = parser.parse_args(argv)
         self.changelist = self.args.changelist
 
+        # Process any specified advanced configuration options (which we use directly as context values for the Jinja templating system)
+        self.opts = {}
+        for o in self.args.opt:
+            if "=" in o:
+                key, value = o.split("=", 1)
+                self.opts[key.replace("-", "_")] = self._processTemplateValue(value)
+            else:
+                self.opts[o.replace("-", "_")] = True
+
+        # If the user specified a host directory containing the Engine source code then copy it rather than cloning a git repository
+        self.sourceDir = (
+            os.path.abspath(self.args.source_dir)
+            if self.args.source_dir is not None
+            else None
+        )
+        if self.sourceDir is not None:
+            if self.opts.setdefault("source_mode", "copy") != "copy":
+                raise RuntimeError(
+                    "the `-source-dir` flag can only be used when the `source_mode` option is set to `copy`"
+                )
+            if not os.path.isdir(self.sourceDir):
+                raise RuntimeError(
+                    'the specified source directory "{}" does not exist'.format(
+                        self.sourceDir
+                    )
+                )
+
         # Figure out what targets we have; this is needed to find out if we need --ue-version.
         using_target_specifier_old = self.args.no_minimal or self.args.no_full
         using_target_specifier_new = self.args.target is not None
@@ -412,8 +565,10 @@ class BuildConfiguration(object):
             # Determine if we are building a custom version of UE4 rather than an official release
             self.args.release = self.args.release.lower()
             if self.args.release == "custom" or self.args.release.startswith("custom:"):
-                # Both a custom repository and a custom branch/tag must be specified
-                if self.args.repo is None or self.args.branch is None:
+                # Both a custom repository and a custom branch/tag must be specified, unless we are copying the source code from the host
+                if self.sourceDir is None and (
+                    self.args.repo is None or self.args.branch is None
+                ):
                     raise RuntimeError(
                         "both a repository and branch/tag must be specified when building a custom version of the Engine"
                     )
@@ -473,31 +628,90 @@ class BuildConfiguration(object):
         )
         self.dryRun = self.args.dry_run
         self.rebuild = self.args.rebuild
+        self.rebase = self.args.rebase
         self.suffix = self.args.suffix
         self.platformArgs = ["--no-cache"] if self.args.no_cache == True else []
         self.excludedComponents = set(self.args.exclude)
+        self.compressDebug = self.args.compress_debug
+        self.symbolsImage = self.args.symbols_image
+        self.push = self.args.push
+        self.cacheRegistry = self.args.cache_registry
+        self.pushJobs = self.args.push_jobs
         self.baseImage = None
+        self.derivedVariants = []
         self.prereqsTag = None
         self.ignoreBlacklist = self.args.ignore_blacklist
         self.verbose = self.args.verbose
         self.layoutDir = self.args.layout
         self.combine = self.args.combine
 
+        # Parse any size budgets for the built images
+        self.sizeBudgets = {}
+        self.warnSizeBudget = self.args.warn_size_budget
+        validTargets = [
+            "ue4-build-prerequisites",
+            "ue4-source",
+            "ue4-minimal",
+            "ue4-minimal-symbols",
+            "ue4-full",
+        ]
+        validTargets += [component for component, _ in COMPONENTS]
+        for budget in self.args.size_budget:
+            target, size = budget.split("=", 1) if "=" in budget else ("total", budget)
+            if target != "total" and target not in validTargets:
+                raise RuntimeError(
+                    'invalid size budget target "{}", valid targets are {}'.format(
+                        target, validTargets
+                    )
+                )
+            try:
+                self.sizeBudgets[target] = humanfriendly.parse_size(size, binary=True)
+            except humanfriendly.InvalidSize:
+                raise RuntimeError(
+                    "invalid size specified for size budget: {}".format(budget)
+                )
+
+        # Determine the BuildKit image output options for the compression of built layers
+        self.layerCompression = self.args.layer_compression
+        self.compressionReport = self.args.compression_report
+        self.outputOptions = {}
+        if self.layerCompression is not None:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `--layer-compression` flag is only supported when building Linux containers"
+                )
+            self.outputOptions["compression"] = self.layerCompression
+            if self.args.compression_level is not None:
+                maxLevel = COMPRESSION_LEVELS.get(self.layerCompression)
+                if maxLevel is None:
+                    raise RuntimeError(
+                        "the `--compression-level` flag cannot be used with uncompressed layers"
+                    )
+                if (
+                    self.args.compression_level < 0
+                    or self.args.compression_level > maxLevel
+                ):
+                    raise RuntimeError(
+                        "the compression level for {} must be between 0 and {}".format(
+                            self.layerCompression, maxLevel
+                        )
+                    )
+                self.outputOptions["compression-level"] = str(
+                    self.args.compression_level
+                )
+            if self.args.force_compression == True:
+                self.outputOptions["force-compression"] = "true"
+        elif self.args.compression_level is not None or self.args.force_compression:
+            raise RuntimeError(
+                "the `--compression-level` and `--force-compression` flags require the `--layer-compression` flag"
+            )
+
         # If the user specified custom version strings for ue4cli and/or conan-ue4cli, process them
         self.ue4cliVersion = self._processPackageVersion("ue4cli", self.args.ue4cli)
         self.conanUe4cliVersion = self._processPackageVersion(
             "conan-ue4cli", self.args.conan_ue4cli
         )
 
-        # Process any specified advanced configuration options (which we use directly as context values for the Jinja templating system)
-        self.opts = {}
-        for o in self.args.opt:
-            if "=" in o:
-                key, value = o.split("=", 1)
-                self.opts[key.replace("-", "_")] = self._processTemplateValue(value)
-            else:
-                self.opts[o.replace("-", "_")] = True
-
         # If we are generating Dockerfiles then generate them for all images that have not been explicitly excluded
         if self.layoutDir is not None:
             self.rebuild = True
@@ -507,15 +721,47 @@ class BuildConfiguration(object):
             self.opts["combine"] = True
 
         # If the user requested an option that is only compatible with generated Dockerfiles then ensure `-layout` was specified
+        # (The exception is copying the source code from a host directory, which we pass to BuildKit as a named build context)
         if self.layoutDir is None and self.opts.get("source_mode", "git") != "git":
-            raise RuntimeError(
-                "the `-layout` flag must be used when specifying a non-default value for the `source_mode` option"
-            )
+            if self.containerPlatform != "linux" or self.sourceDir is None:
+                raise RuntimeError(
+                    "the `-layout` flag must be used when specifying a non-default value for the `source_mode` option, unless building Linux containers with the `-source-dir` flag"
+                )
+            self.opts["source_build_context"] = True
         if self.layoutDir is None and self.combine == True:
             raise RuntimeError(
                 "the `-layout` flag must be used when specifying the `--combine` flag"
             )
 
+        # If the user requested a rebase then verify that it is supported and rebuild the images that depend on the build prerequisites
+        # (The ue4-source image is not rebuilt, since the Engine is copied from the existing ue4-minimal image instead)
+        if self.rebase == True:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `--rebase` flag is only supported when building Linux containers"
+                )
+            if self.layoutDir is not None:
+                raise RuntimeError(
+                    "the `--rebase` flag cannot be used when generating Dockerfiles with the `-layout` flag"
+                )
+            if not self.buildTargets["minimal"]:
+                raise RuntimeError(
+                    "the `--rebase` flag requires building the ue4-minimal image"
+                )
+            self.rebuild = True
+            self.opts["rebase"] = True
+
+        # Deriving image variants is only supported under Linux, since the variants differ only in their Linux base image
+        if self.args.derive_variants == True:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `--derive-variants` flag is only supported when building Linux containers"
+                )
+            if not self.buildTargets["minimal"]:
+                raise RuntimeError(
+                    "the `--derive-variants` flag requires building the ue4-minimal image"
+                )
+
         # We care about source_mode and credential_mode only if we're building source
         if self.buildTargets["source"]:
             # Verify that the value for `source_mode` is valid if specified
@@ -546,13 +792,73 @@ class BuildConfiguration(object):
                     )
                 )
 
+        # If the user requested a separate image for the debug symbols then verify that it is supported and exclude them from the ue4-minimal image
+        if self.symbolsImage == True:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `--symbols-image` flag is only supported when building Linux containers"
+                )
+            if ExcludedComponent.Debug in self.excludedComponents:
+                raise RuntimeError(
+                    "the `--symbols-image` flag cannot be used when excluding debug symbols"
+                )
+            if not self.buildTargets["minimal"]:
+                raise RuntimeError(
+                    "the `--symbols-image` flag requires building the ue4-minimal image"
+                )
+            self.excludedComponents.add(ExcludedComponent.Debug)
+            self.opts["symbols_image"] = True
+
         # Generate Jinja context values for keeping or excluding components
         self.opts["excluded_components"] = {
             "ddc": ExcludedComponent.DDC in self.excludedComponents,
             "debug": ExcludedComponent.Debug in self.excludedComponents,
             "templates": ExcludedComponent.Templates in self.excludedComponents,
+            "client": ExcludedComponent.Client in self.excludedComponents,
+            "server": ExcludedComponent.Server in self.excludedComponents,
         }
 
+        # If the user requested compressed debug symbols then verify that they are supported and are not being excluded
+        if self.compressDebug is not None:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `--compress-debug` flag is only supported when building Linux containers"
+                )
+            if ExcludedComponent.Debug in self.args.exclude:
+                raise RuntimeError(
+                    "the `--compress-debug` flag cannot be used when excluding debug symbols"
+                )
+            self.opts["compress_debug"] = self.compressDebug
+
+        # If the user specified which game target configurations to build then verify that they are valid for the Engine version
+        # (The version of a custom Engine build is not known, so we validate against the latest release in that case)
+        if "game_configurations" in self.opts:
+            configurations = self.opts["game_configurations"]
+            if isinstance(configurations, str):
+                configurations = [c.strip() for c in configurations.split(";")]
+            supported = self._supportedGameConfigurations()
+            if (
+                not isinstance(configurations, list)
+                or len(configurations) == 0
+                or not all([c in supported["game"] for c in configurations])
+            ):
+                raise RuntimeError(
+                    "the `game_configurations` option must specify one or more of {}".format(
+                        supported["game"]
+                    )
+                )
+            for target in ["client", "server"]:
+                if self.opts["excluded_components"][target] == True:
+                    continue
+                unsupported = [c for c in configurations if c not in supported[target]]
+                if len(unsupported) > 0:
+                    raise RuntimeError(
+                        "the {} game target configurations are not supported for {} targets in this Engine version, exclude the `{}` component or remove them from the `game_configurations` option".format(
+                            unsupported, target, target
+                        )
+                    )
+            self.opts["game_configurations"] = ";".join(configurations)
+
         if "gitdependencies_args" not in self.opts:
             self.opts["gitdependencies_args"] = (
                 "--exclude=Android --exclude=Mac --exclude=Linux"
@@ -594,6 +900,161 @@ class BuildConfiguration(object):
         # If the user-specified suffix passed validation, prefix it with a dash
         self.suffix = "-{}".format(self.suffix) if self.suffix != "" else ""
 
+        # If the user requested a shared build cache then verify that it is supported
+        if self.cacheRegistry is not None and self.containerPlatform != "linux":
+            raise RuntimeError(
+                "the `--cache-registry` flag is only supported when building Linux containers"
+            )
+
+        # If the user requested an OCI image layout for the final image then verify that it is supported and determine which image it applies to
+        self.ociOutput = self.args.output_oci
+        self.ociPush = self.args.oci_push
+        self.ociTarget = None
+        if self.ociOutput is not None:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `--output-oci` flag is only supported when building Linux containers"
+                )
+            if self.buildTargets["full"]:
+                self.ociTarget = "ue4-full"
+            elif self.buildTargets["minimal"]:
+                self.ociTarget = "ue4-minimal"
+            else:
+                raise RuntimeError(
+                    "the `--output-oci` flag requires building the ue4-minimal or ue4-full image"
+                )
+
+            # Derived variants copy the Installed Build from the ue4-minimal image, so it must be loaded into the Docker daemon
+            if self.ociTarget == "ue4-minimal" and len(self.derivedVariants) > 0:
+                raise RuntimeError(
+                    "the `--output-oci` flag cannot be used with the `--derive-variants` flag unless the ue4-full image is being built"
+                )
+            self.ociOutput = os.path.abspath(self.ociOutput.rstrip("/\\"))
+        elif self.ociPush is not None:
+            raise RuntimeError("the `--oci-push` flag requires the `--output-oci` flag")
+
+        # If the user requested a volatile builder then verify that it is supported and identify the cache mount for the source tree
+        if self.opts.get("volatile_builder", False) == True:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `volatile_builder` option is only supported when building Linux containers"
+                )
+            if (
+                self.opts.get("source_mode", "git") != "git"
+                and self.opts.get("source_build_context", False) == False
+            ):
+                raise RuntimeError(
+                    "the `volatile_builder` option can only copy the Engine source code from the host when using the `-source-dir` flag"
+                )
+
+            # The cache mount is keyed by the same tag that will be applied to the ue4-source image
+            if self.release is not None:
+                self.opts["volatile_cache_id"] = "ue4-docker-engine-{}{}-{}".format(
+                    self.release, self.suffix, self.prereqsTag
+                )
+
+        # If the user requested a persistent UBT cache then verify that it is supported and identify the cache mount for the intermediate files
+        if self.opts.get("ubt_cache", False) == True:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `ubt_cache` option is only supported when building Linux containers"
+                )
+
+            # The cache mount is shared by all releases with the same major and minor version number
+            # (Custom builds of the Engine are keyed by their custom name)
+            if self.release is not None:
+                version = (
+                    self.release
+                    if self.custom
+                    else "{}.{}".format(
+                        Version(self.release).major, Version(self.release).minor
+                    )
+                )
+                self.opts["ubt_cache_id"] = "ue4-docker-ubt-{}-{}".format(
+                    version, self.prereqsTag
+                )
+
+        # If the user requested deduplication of the Installed Build files then verify that it is supported
+        if self.opts.get("deduplicate_files", False) == True:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `deduplicate_files` option is only supported when building Linux containers"
+                )
+
+        # If the user requested that BuildGraph be run over multiple steps then verify that it is supported and identify the cache mount for sharing node outputs
+        if "buildgraph_steps" in self.opts:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `buildgraph_steps` option is only supported when building Linux containers"
+                )
+            try:
+                self.opts["buildgraph_steps"] = int(self.opts["buildgraph_steps"])
+            except ValueError:
+                raise RuntimeError(
+                    "the `buildgraph_steps` option must be an integer value"
+                )
+            if self.opts["buildgraph_steps"] < 1:
+                raise RuntimeError("the `buildgraph_steps` option must be at least 1")
+
+            # A single step is equivalent to the default behaviour of running BuildGraph once
+            if self.opts["buildgraph_steps"] == 1:
+                del self.opts["buildgraph_steps"]
+            elif self.release is not None:
+                self.opts["buildgraph_storage_id"] = (
+                    "ue4-docker-buildgraph-{}{}-{}".format(
+                        self.release, self.suffix, self.prereqsTag
+                    )
+                )
+
+        # Verify that any user-specified UBT configuration settings are grouped by category
+        ubtConfiguration = self.opts.get("ubt_configuration", {})
+        if not isinstance(ubtConfiguration, dict) or not all(
+            [isinstance(values, dict) for values in ubtConfiguration.values()]
+        ):
+            raise RuntimeError(
+                "the `ubt_configuration` option must be a JSON object mapping each category name to an object of settings"
+            )
+
+        # If the user specified an Unreal Build Accelerator cache server then verify that it is supported and enable it
+        if self.opts.get("uba_cache", None) is not None:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `uba_cache` option is only supported when building Linux containers"
+                )
+            if not isinstance(self.opts["uba_cache"], str):
+                raise RuntimeError(
+                    "the `uba_cache` option must specify the address of the UBA cache server"
+                )
+            if (
+                self.release is not None
+                and not self.custom
+                and Version(self.release) < Version("5.4.0")
+            ):
+                raise RuntimeError(
+                    "the `uba_cache` option requires Unreal Engine 5.4 or newer"
+                )
+
+            # Explicitly-specified UBT configuration settings take precedence over the ones we generate
+            ubtConfiguration.setdefault("BuildConfiguration", {}).setdefault(
+                "bAllowUBAExecutor", True
+            )
+            uba = ubtConfiguration.setdefault("UnrealBuildAccelerator", {})
+            uba.setdefault("Cache", self.opts["uba_cache"])
+            uba.setdefault("WriteCache", self.opts.get("uba_write_cache", False))
+
+        # If the user requested a UBT parallelism profile then compute it for the available CPU cores and memory
+        # (This is opt-in, since the profile is part of the BuildGraph step and so the host's resources become part of its cache key)
+        self.parallelismProfile = None
+        if self.opts.get("parallelism_profile", False) == True:
+            if self.containerPlatform != "linux":
+                raise RuntimeError(
+                    "the `parallelism_profile` option is only supported when building Linux containers"
+                )
+            self._generateParallelismProfile(ubtConfiguration)
+
+        if len(ubtConfiguration) > 0:
+            self.opts["ubt_configuration"] = ubtConfiguration
+
     def describeExcludedComponents(self):
         """
         Returns a list of strings describing the components that will be excluded (if any.)
@@ -707,7 +1168,31 @@ class BuildConfiguration(object):
 
         # Determine if we are building CUDA-enabled container images
         self.cuda = None
-        if self.args.cuda is not None:
+        if self.args.derive_variants == True:
+            if self.args.cuda is None:
+                raise RuntimeError(
+                    "the `--derive-variants` flag requires the `--cuda` flag"
+                )
+            if self.layoutDir is not None:
+                raise RuntimeError(
+                    "the `--derive-variants` flag cannot be used when generating Dockerfiles with the `-layout` flag"
+                )
+
+            # Build the Engine for the OpenGL variant and derive the CUDA variant from it
+            self.cuda = self.args.cuda if self.args.cuda != "" else DEFAULT_CUDA_VERSION
+            self.baseImage = LINUX_BASE_IMAGES["opengl"]
+            self.prereqsTag = "opengl-{ubuntu}"
+            self.derivedVariants.append(
+                (
+                    LINUX_BASE_IMAGES["cuda"].format(
+                        cuda=self.cuda, ubuntu=self.args.basetag
+                    ),
+                    "cuda{cuda}-{ubuntu}".format(
+                        cuda=self.cuda, ubuntu=self.args.basetag
+                    ),
+                )
+            )
+        elif self.args.cuda is not None:
             # Verify that the specified CUDA version is valid
             self.cuda = self.args.cuda if self.args.cuda != "" else DEFAULT_CUDA_VERSION
             # Use the appropriate base image for the specified CUDA version
@@ -724,6 +1209,75 @@ class BuildConfiguration(object):
             cuda=self.args.cuda, ubuntu=self.args.basetag
         )
 
+    def _supportedGameConfigurations(self):
+        # Use the entry for the newest release that is not newer than the Engine version being built
+        releases = sorted(GAME_CONFIGURATIONS.keys(), key=Version)
+        if self.release is None or self.custom:
+            return GAME_CONFIGURATIONS[releases[-1]]
+        applicable = [r for r in releases if Version(r) <= Version(self.release)]
+        return GAME_CONFIGURATIONS[
+            applicable[-1] if len(applicable) > 0 else releases[0]
+        ]
+
+    def _generateParallelismProfile(self, ubtConfiguration):
+        # Don't generate a profile if we are exporting Dockerfiles without explicitly specifying the target system
+        if self.layoutDir is not None and (
+            "build_cores" not in self.opts or "build_memory" not in self.opts
+        ):
+            return
+
+        # Determine the number of CPU cores and the amount of memory available for the build, unless the user has specified them
+        # (Note that Linux containers have access to all of the resources of the Docker host by default)
+        try:
+            info = (
+                DockerUtils.info()
+                if "build_cores" not in self.opts or "build_memory" not in self.opts
+                else {}
+            )
+            cores = int(self.opts.get("build_cores", info.get("NCPU", 0)))
+            memory = (
+                humanfriendly.parse_size(str(self.opts["build_memory"]), binary=True)
+                if "build_memory" in self.opts
+                else info.get("MemTotal", 0)
+            )
+            gbPerAction = float(self.opts.get("gb_per_action", DEFAULT_GB_PER_ACTION))
+            multiplier = float(self.opts.get("processor_count_multiplier", 1.0))
+        except (ValueError, humanfriendly.InvalidSize) as e:
+            raise RuntimeError("invalid parallelism profile option: {}".format(e))
+        if cores < 1 or memory < 1 or gbPerAction <= 0 or multiplier <= 0:
+            raise RuntimeError(
+                "the `build_cores`, `build_memory`, `gb_per_action` and `processor_count_multiplier` options must be positive values"
+            )
+
+        # Limit the number of parallel actions by both the available cores and the available memory, unless the user has specified the limit
+        memoryGB = memory / (1024 * 1024 * 1024)
+        maxActions = int(
+            self.opts.get(
+                "max_parallel_actions",
+                max(1, min(int(cores * multiplier), int(memoryGB / gbPerAction))),
+            )
+        )
+
+        self.parallelismProfile = {
+            "cores": cores,
+            "memory_gb": round(memoryGB, 2),
+            "gb_per_action": gbPerAction,
+            "processor_count_multiplier": multiplier,
+            "max_parallel_actions": maxActions,
+        }
+        self.opts["parallelism_profile"] = self.parallelismProfile
+
+        # Generate the corresponding UBT configuration settings, unless the user has specified them explicitly
+        # (The per-action memory setting was introduced in Unreal Engine 5.0 and older versions reject unknown settings, so it is
+        # removed at build time if the Engine version in the source tree is older, since the version of a custom build is not known here)
+        executor = ubtConfiguration.setdefault("ParallelExecutor", {})
+        executor.setdefault("MaxProcessorCount", maxActions)
+        executor.setdefault("ProcessorCountMultiplier", multiplier)
+        if self.release is None or self.custom or Version(self.release).major >= 5:
+            executor.setdefault(
+                "MemoryPerActionBytes", int(gbPerAction * 1024 * 1024 * 1024)
+            )
+
     def _processPackageVersion(self, package, version):
         # Leave the version value unmodified if a blank version was specified or a fully-qualified version was specified
         # (e.g. package==X.X.X, package>=X.X.X, git+https://url/for/package/repo.git, etc.)
@@ -0,0 +1,25 @@
+import io
+
+
+class ChunkStream(io.RawIOBase):
+    """
+    Wraps the chunked data returned by the Docker archive API in a file-like object, so it can be read as a stream
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self.buffer) == 0:
+            try:
+                self.buffer = next(self.chunks)
+            except StopIteration:
+                return 0
+        count = min(len(b), len(self.buffer))
+        b[:count] = self.buffer[:count]
+        self.buffer = self.buffer[count:]
+        return count
@@ -1,9 +1,15 @@
-import docker, fnmatch, humanfriendly, itertools, json, logging, os, platform, re, sys
+import docker, fnmatch, humanfriendly, io, itertools, json, logging, os, platform, re, sys, tarfile
 from docker.models.containers import Container
 from packaging.version import Version
 
 from .FilesystemUtils import FilesystemUtils
 
+# The label that records the location of the Installed Build in a volume populated by `ue4-docker export installed`
+ENGINE_ROOT_LABEL = "com.adamrehn.ue4-docker.engine-root"
+
+# The default location of the Installed Build inside Linux images and containers
+DEFAULT_ENGINE_ROOT = "/home/ue4/UnrealEngine"
+
 
 class DockerUtils(object):
     @staticmethod
@@ -22,17 +28,97 @@ class DockerUtils(object):
         """
         Retrieves the version information for the Docker daemon
         """
-        client = docker.from_env()
+        client = DockerUtils.connect()
         return client.version()
 
+    @staticmethod
+    def connect(host=None, **kwargs):
+        """
+        Returns a client for the specified Docker host, which can be either an endpoint URL (e.g. `tcp://builder:2375`) or the name of a Docker context
+        (If no host is specified then the client is configured from the environment, in the same manner as the Docker CLI)
+        """
+        if host is None:
+            # Older versions of the Docker SDK ignore the `DOCKER_CONTEXT` environment variable, so we resolve it ourselves,
+            # and we use the system's SSH client for `ssh://` endpoints so that we do not require paramiko
+            host = os.environ.get("DOCKER_HOST", os.environ.get("DOCKER_CONTEXT"))
+            if host is None or "://" in host:
+                return docker.from_env(
+                    use_ssh_client=(host or "").startswith("ssh://"), **kwargs
+                )
+        if "://" not in host:
+            context = DockerUtils._getContext(host)
+            return docker.DockerClient(
+                base_url=context.Host,
+                tls=context.TLSConfig,
+                use_ssh_client=context.Host.startswith("ssh://"),
+                **kwargs,
+            )
+        return docker.DockerClient(
+            base_url=host, use_ssh_client=host.startswith("ssh://"), **kwargs
+        )
+
+    @staticmethod
+    def hostEnvironment(host):
+        """
+        Returns the environment variables that direct both the Docker CLI and the Docker SDK to the specified Docker host,
+        which can be either an endpoint URL or the name of a Docker context (contexts are resolved to their endpoint and TLS settings)
+        """
+        if "://" in host:
+            return {"DOCKER_HOST": host}
+        context = DockerUtils._getContext(host)
+
+        # The Docker SDK reports TCP endpoints with an `http://` or `https://` scheme, which the Docker CLI does not accept
+        environment = {"DOCKER_HOST": re.sub(r"^https?://", "tcp://", context.Host)}
+        tls = context.TLSConfig
+        if tls is not None:
+            # The TLS files for a context are stored with the filenames that `DOCKER_CERT_PATH` expects
+            files = [tls.ca_cert] + (list(tls.cert) if tls.cert is not None else [])
+            files = [file for file in files if file is not None]
+            if len(files) > 0:
+                environment["DOCKER_CERT_PATH"] = os.path.abspath(
+                    os.path.dirname(files[0])
+                )
+            environment["DOCKER_TLS_VERIFY" if tls.verify else "DOCKER_TLS"] = "1"
+        return environment
+
+    @staticmethod
+    def _getContext(name):
+        """
+        Retrieves the Docker context with the specified name
+        """
+        context = docker.context.ContextAPI.get_context(name)
+        if context is None or context.Host is None:
+            raise RuntimeError('the Docker context "{}" does not exist'.format(name))
+        return context
+
+    @staticmethod
+    def readHostsFile(path):
+        """
+        Reads a list of Docker hosts from the specified file, which contains one host per line and may include blank lines and `#` comments
+        """
+        with open(path, "r") as f:
+            lines = [line.split("#", 1)[0].strip() for line in f]
+        return [line for line in lines if len(line) > 0]
+
     @staticmethod
     def info():
         """
         Retrieves the system information as produced by `docker info`
         """
-        client = docker.from_env()
+        client = DockerUtils.connect()
         return client.info()
 
+    @staticmethod
+    def usesContainerdImageStore():
+        """
+        Determines whether the Docker daemon stores images using the containerd image store,
+        which preserves the compression of image layers rather than storing them uncompressed
+        """
+        for key, value in DockerUtils.info().get("DriverStatus", None) or []:
+            if key == "driver-type" and value.startswith("io.containerd.snapshotter"):
+                return True
+        return False
+
     @staticmethod
     def minimumVersionForIPV6():
         """
@@ -71,13 +157,22 @@ class DockerUtils(object):
         """
         Determines if the specified image exists
         """
-        client = docker.from_env()
+        client = DockerUtils.connect()
         try:
             image = client.images.get(name)
             return True
         except:
             return False
 
+    @staticmethod
+    def getLabels(name):
+        """
+        Retrieves the labels of the specified image
+        """
+        client = DockerUtils.connect()
+        labels = client.images.get(name).labels
+        return labels if labels is not None else {}
+
     @staticmethod
     def build(tags: [str], context: str, args: [str]) -> [str]:
         """
@@ -118,7 +213,7 @@ class DockerUtils(object):
         """
         Starts a container in a detached state and returns the container handle
         """
-        client = docker.from_env()
+        client = DockerUtils.connect()
         return client.containers.run(image, command, detach=True, **kwargs)
 
     @staticmethod
@@ -126,9 +221,57 @@ class DockerUtils(object):
         """
         Creates a stopped container for specified image name and returns the container handle
         """
-        client = docker.from_env()
+        client = DockerUtils.connect()
         return client.containers.create(image, **kwargs)
 
+    @staticmethod
+    def readFile(image: str, path: str) -> bytes:
+        """
+        Reads the contents of a small file from the specified image, without starting a container
+        """
+        container = DockerUtils.create(image)
+        try:
+            stream, _ = container.get_archive(path)
+            with tarfile.open(fileobj=io.BytesIO(b"".join(stream))) as archive:
+                member = archive.getmembers()[0]
+                return archive.extractfile(member).read()
+        finally:
+            container.remove()
+
+    @staticmethod
+    def getEngineRoot(obj, default: str = DEFAULT_ENGINE_ROOT) -> str:
+        """
+        Determines the location of the Installed Build inside the specified image or container object,
+        using the value of its `UNREAL_ENGINE_ROOT` environment variable
+        """
+        for variable in obj.attrs.get("Config", {}).get("Env", None) or []:
+            if variable.startswith("UNREAL_ENGINE_ROOT="):
+                return variable.split("=", 1)[1]
+        return default
+
+    @staticmethod
+    def engineVolumeMount(volume: str) -> dict:
+        """
+        Returns the arguments for `containers.create()` or `containers.run()` that mount a volume populated by
+        `ue4-docker export installed IMAGE volume:NAME` read-only at the location of the Installed Build in its source image
+        (This allows many containers created from the small ue4-build-prerequisites image to share a single copy of the Engine)
+        """
+        client = DockerUtils.connect()
+        labels = client.volumes.get(volume).attrs.get("Labels", None) or {}
+        engineRoot = labels.get(ENGINE_ROOT_LABEL)
+        if engineRoot is None:
+            raise RuntimeError(
+                'the volume "{}" does not contain an exported Installed Build'.format(
+                    volume
+                )
+            )
+        return {
+            "mounts": [
+                docker.types.Mount(engineRoot, volume, type="volume", read_only=True)
+            ],
+            "environment": {"UNREAL_ENGINE_ROOT": engineRoot},
+        }
+
     @staticmethod
     def configFilePath():
         """
@@ -186,7 +329,7 @@ class DockerUtils(object):
         """
 
         # Retrieve the list of images matching the specified filters
-        client = docker.from_env()
+        client = DockerUtils.connect()
         images = client.images.list(filters=filters, all=all)
 
         # Apply our tag filter if one was specified
@@ -1,3 +1,7 @@
+from docker.utils.build import PatternMatcher
+import os, stat
+
+
 class FilesystemUtils(object):
     @staticmethod
     def readFile(filename):
@@ -14,3 +18,47 @@ class FilesystemUtils(object):
         """
         with open(filename, "wb") as f:
             f.write(data.encode("utf-8"))
+
+    @staticmethod
+    def directorySize(directory, excludedNames=None, excludedRootNames=None):
+        """
+        Computes the number of files and total size in bytes of a directory tree, skipping any
+        subdirectories with the specified names (or with the specified names at the root level only)
+        """
+        files = 0
+        size = 0
+        for root, dirs, filenames in os.walk(directory):
+            excluded = set(excludedNames or [])
+            if root == directory:
+                excluded.update(excludedRootNames or [])
+            dirs[:] = [d for d in dirs if d not in excluded]
+            for filename in filenames:
+                try:
+                    size += os.lstat(os.path.join(root, filename)).st_size
+                    files += 1
+                except OSError:
+                    pass
+
+        return files, size
+
+    @staticmethod
+    def contextSize(directory, ignoreFile):
+        """
+        Computes the number of files and total size in bytes of a directory tree that are sent as a Docker build context,
+        skipping any files that match the patterns in the specified .dockerignore file (using the same matching rules as Docker)
+        """
+        with open(ignoreFile, "r") as f:
+            patterns = [line.strip() for line in f.read().splitlines()]
+        matcher = PatternMatcher([p for p in patterns if p != "" and p[0] != "#"])
+        files = 0
+        size = 0
+        for path in matcher.walk(directory):
+            try:
+                details = os.lstat(os.path.join(directory, path))
+                if not stat.S_ISDIR(details.st_mode):
+                    size += details.st_size
+                    files += 1
+            except OSError:
+                pass
+
+        return files, size
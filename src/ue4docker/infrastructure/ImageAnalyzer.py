@@ -0,0 +1,435 @@
+from .ChunkStream import ChunkStream
+from .DockerUtils import DockerUtils
+from .FilesystemUtils import FilesystemUtils
+from .InstalledBuildManifest import HASH_CHUNK_SIZE
+import docker, humanfriendly, io, json, os, posixpath, re, tarfile, time, zlib
+
+# zstd decompression requires the optional zstandard package
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# The components of the Installed Build that are copied into separate filesystem layers, and the path names that identify them
+# (These are checked in order, so more specific components must be listed before the subdirectories that contain them)
+COMPONENTS = [
+    ("DebugSymbols", ["DebugSymbols"]),
+    ("DDC", ["DDC", "Compressed.ddp"]),
+    (
+        "TemplatesAndSamples",
+        ["TemplatesAndSamples", "FeaturePacks", "Samples", "Templates"],
+    ),
+    ("Binaries", ["Binaries"]),
+    ("Content", ["Content"]),
+    ("Extras", ["Extras"]),
+    ("Intermediate", ["Intermediate"]),
+    ("Plugins", ["Plugins"]),
+    ("Source", ["Source"]),
+    ("InstalledBuild", ["LocalBuilds", "InstalledBuild", "remainder"]),
+]
+
+# The category used for layers that do not contain an Installed Build component
+OTHER_LAYERS = "Other"
+
+# The category used for layers inherited from the base image of the final build stage
+BASE_LAYERS = "Base image"
+
+# The maximum length of the instruction text that we display for each layer
+MAX_INSTRUCTION_LENGTH = 100
+
+# The magic numbers that identify the compression method of a layer blob
+COMPRESSION_MAGIC = [("gzip", b"\x1f\x8b"), ("zstd", b"\x28\xb5\x2f\xfd")]
+
+# The media types of OCI image indexes, which BuildKit produces when attaching attestations to an image
+OCI_INDEX_MEDIA_TYPES = [
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+]
+
+
+class ImageAnalyzer(object):
+    def __init__(self, logger, budgets=None, warnOnly=False, compressionReport=False):
+        """
+        Creates an ImageAnalyzer that checks built images against the specified size budgets
+        (Budgets map an image name, a component name, or "total" for all images to a size in bytes)
+        """
+        self.logger = logger
+        self.budgets = budgets if budgets is not None else {}
+        self.warnOnly = warnOnly
+        self.compressionReport = compressionReport
+
+    def size(self, image):
+        """
+        Returns the total size of the specified image in bytes
+        """
+        client = DockerUtils.connect()
+        return client.images.get(image).attrs["Size"]
+
+    def analyze(self, image, dockerfile=None):
+        """
+        Returns the instruction, component and size of each filesystem layer in the specified image, oldest first
+        (If the Dockerfile for the image is provided then layers are mapped back to the instructions of its final stage)
+        """
+        client = DockerUtils.connect()
+        history = list(reversed(client.images.get(image).history()))
+        instructions = (
+            self._mapInstructions(history, dockerfile)
+            if dockerfile is not None
+            else None
+        )
+
+        layers = []
+        for index, entry in enumerate(history):
+            if instructions is not None:
+                instruction = instructions[index]
+            else:
+                instruction = self._cleanCreatedBy(entry.get("CreatedBy", ""))
+
+            component = (
+                BASE_LAYERS
+                if instruction is None
+                else self._identifyComponent(instruction)
+            )
+            layers.append(
+                (
+                    instruction if instruction is not None else entry.get("CreatedBy"),
+                    component,
+                    entry.get("Size", 0),
+                )
+            )
+
+        return layers
+
+    def report(self, image, name, dockerfile=None, previousSize=None):
+        """
+        Prints a size breakdown for the specified image and verifies that it does not exceed any of our size budgets
+        """
+        layers = self.analyze(image, dockerfile)
+        total = sum([size for _, _, size in layers])
+
+        # Print the size of each non-empty layer, largest first
+        self.logger.info('Size breakdown for image "{}":'.format(image), False)
+        for instruction, component, size in sorted(
+            layers, key=lambda l: l[2], reverse=True
+        ):
+            if size > 0:
+                self.logger.info(
+                    "  {:>10}  [{}] {}".format(
+                        humanfriendly.format_size(size, binary=True),
+                        component,
+                        self._truncate(instruction),
+                    ),
+                    False,
+                )
+
+        # Print the total size of each component
+        components = {}
+        for _, component, size in layers:
+            components[component] = components.get(component, 0) + size
+        self.logger.info("Size by component:", False)
+        for component, size in sorted(
+            components.items(), key=lambda c: c[1], reverse=True
+        ):
+            self.logger.info(
+                "  {:>10}  {}".format(
+                    humanfriendly.format_size(size, binary=True), component
+                ),
+                False,
+            )
+        self.logger.info(
+            "  {:>10}  Total".format(humanfriendly.format_size(total, binary=True)),
+            False,
+        )
+
+        # If the image replaced an existing image with the same tag then report how much its size changed
+        if previousSize is not None:
+            difference = total - previousSize
+            self.logger.info(
+                "Size change since the previous image: {}{}".format(
+                    "+" if difference >= 0 else "-",
+                    humanfriendly.format_size(abs(difference), binary=True),
+                ),
+                False,
+            )
+
+        # Verify that the image and its components are within budget
+        exceeded = []
+        for target, budget in sorted(self.budgets.items()):
+            if target == "total" or target == name:
+                size = total
+            elif target in components:
+                size = components[target]
+            else:
+                continue
+            if size > budget:
+                exceeded.append(
+                    "{} is {}, which exceeds its budget of {}".format(
+                        "image" if target in ["total", name] else target,
+                        humanfriendly.format_size(size, binary=True),
+                        humanfriendly.format_size(budget, binary=True),
+                    )
+                )
+
+        if len(exceeded) > 0:
+            if self.warnOnly == True:
+                for message in exceeded:
+                    self.logger.warning(
+                        'Warning: size budget exceeded for image "{}": {}'.format(
+                            image, message
+                        ),
+                        False,
+                    )
+            else:
+                raise RuntimeError(
+                    'size budget exceeded for image "{}": {}'.format(
+                        image, "; ".join(exceeded)
+                    )
+                )
+
+    def compression(self, image):
+        """
+        Returns the compression method, compressed size, uncompressed size and decompression time of each layer in the specified image
+        (The image is streamed from the Docker daemon in the form that it is stored, so this reflects the layers that will be pushed)
+        """
+        client = DockerUtils.connect()
+        reader = io.BufferedReader(
+            ChunkStream(client.images.get(image).save(chunk_size=HASH_CHUNK_SIZE)),
+            HASH_CHUNK_SIZE,
+        )
+
+        layers = []
+        with tarfile.open(fileobj=reader, mode="r|") as archive:
+            for member in archive:
+                # Layer blobs are stored under `blobs/` in OCI layouts and as `layer.tar` files in the legacy format
+                if not member.isfile() or not (
+                    member.name.startswith("blobs/")
+                    or member.name.endswith("/layer.tar")
+                ):
+                    continue
+
+                # Identify the compression method using the magic number at the start of the blob
+                data = archive.extractfile(member)
+                header = data.read(4)
+                method = next(
+                    (m for m, magic in COMPRESSION_MAGIC if header.startswith(magic)),
+                    None,
+                )
+                if method is None:
+                    # Skip JSON blobs (manifests, indexes and configs), since these are not layers
+                    if header.lstrip().startswith(b"{"):
+                        continue
+                    layers.append(
+                        (member.name, "uncompressed", member.size, member.size, 0.0)
+                    )
+                    continue
+
+                # Decompress the layer as it is streamed, timing only the decompression itself
+                if method == "gzip":
+                    decompressor = zlib.decompressobj(wbits=31)
+                elif zstandard is not None:
+                    decompressor = zstandard.ZstdDecompressor().decompressobj()
+                else:
+                    layers.append((member.name, method, member.size, None, None))
+                    continue
+
+                uncompressed = 0
+                elapsed = 0.0
+                chunk = header
+                while len(chunk) > 0:
+                    startTime = time.perf_counter()
+                    uncompressed += len(decompressor.decompress(chunk))
+                    elapsed += time.perf_counter() - startTime
+                    chunk = data.read(HASH_CHUNK_SIZE)
+                layers.append((member.name, method, member.size, uncompressed, elapsed))
+
+        return layers
+
+    def reportCompression(self, image):
+        """
+        Prints the compression ratio and decompression time of each layer in the specified image, if compression reporting is enabled
+        """
+        if self.compressionReport == False:
+            return
+
+        layers = [layer for layer in self.compression(image) if layer[2] > 0]
+        self.logger.info('Layer compression for image "{}":'.format(image), False)
+        for name, method, compressed, uncompressed, elapsed in sorted(
+            layers, key=lambda l: l[2], reverse=True
+        ):
+            self.logger.info(
+                "  {:>10}  {}".format(
+                    humanfriendly.format_size(compressed, binary=True),
+                    (
+                        "{} ({}, {:.2f}x, decompressed in {})".format(
+                            self._truncate(name),
+                            method,
+                            uncompressed / compressed,
+                            humanfriendly.format_timespan(elapsed),
+                        )
+                        if uncompressed is not None
+                        else "{} ({}, install the zstandard package to measure decompression)".format(
+                            self._truncate(name), method
+                        )
+                    ),
+                ),
+                False,
+            )
+
+        # Report the totals for the layers that we were able to decompress
+        measured = [layer for layer in layers if layer[3] is not None]
+        compressed = sum([layer[2] for layer in measured])
+        uncompressed = sum([layer[3] for layer in measured])
+        elapsed = sum([layer[4] for layer in measured])
+        if compressed > 0:
+            self.logger.info(
+                "  {:>10}  Total ({} uncompressed, {:.2f}x, decompressed in {}{})".format(
+                    humanfriendly.format_size(compressed, binary=True),
+                    humanfriendly.format_size(uncompressed, binary=True),
+                    uncompressed / compressed,
+                    humanfriendly.format_timespan(elapsed),
+                    (
+                        " at {}/s".format(
+                            humanfriendly.format_size(
+                                int(uncompressed / elapsed), binary=True
+                            )
+                        )
+                        if elapsed > 0
+                        else ""
+                    ),
+                ),
+                False,
+            )
+
+    def ociLayout(self, path):
+        """
+        Returns the digest, size and layer count of the image stored in the specified OCI image layout directory or tarball
+        (The size is the total size of the compressed layers and configuration, which is the amount of data that a push transfers)
+        """
+        archive = tarfile.open(path, "r:") if not os.path.isdir(path) else None
+
+        def _read(name):
+            if archive is None:
+                with open(os.path.join(path, *name.split("/")), "rb") as f:
+                    return json.load(f)
+            return json.load(archive.extractfile(name))
+
+        def _blob(digest):
+            algorithm, encoded = digest.split(":", 1)
+            return _read(posixpath.join("blobs", algorithm, encoded))
+
+        try:
+            # The layout's index refers to the image, which may itself be an index that includes attestation manifests
+            descriptor = _read("index.json")["manifests"][0]
+            manifest = _blob(descriptor["digest"])
+            if descriptor.get("mediaType") in OCI_INDEX_MEDIA_TYPES:
+                images = [
+                    entry
+                    for entry in manifest["manifests"]
+                    if entry.get("platform", {}).get("os") != "unknown"
+                ]
+                manifest = _blob(images[0]["digest"])
+        finally:
+            if archive is not None:
+                archive.close()
+
+        return {
+            "digest": descriptor["digest"],
+            "mediaType": descriptor.get("mediaType"),
+            "size": manifest["config"]["size"]
+            + sum([layer["size"] for layer in manifest["layers"]]),
+            "layers": len(manifest["layers"]),
+        }
+
+    def reportOci(self, image, path):
+        """
+        Prints the digest and size of an image written to an OCI image layout and records them in a JSON file alongside it
+        """
+        details = self.ociLayout(path)
+        self.logger.info(
+            'Wrote image "{}" to {} ({} in {} layers, digest {})'.format(
+                image,
+                path,
+                humanfriendly.format_size(details["size"], binary=True),
+                details["layers"],
+                details["digest"],
+            ),
+            False,
+        )
+        details.update({"image": image, "path": path})
+        FilesystemUtils.writeFile(path + ".json", json.dumps(details, indent=4))
+        return details
+
+    def _cleanCreatedBy(self, createdBy):
+        """
+        Strips the shell prefix and builder suffix from the command that created a layer
+        """
+        createdBy = re.sub(r"^/bin/sh -c (#\(nop\)\s*)?", "", createdBy)
+        createdBy = re.sub(r"\s*# buildkit$", "", createdBy)
+        return createdBy.strip()
+
+    def _identifyComponent(self, instruction):
+        """
+        Determines which Installed Build component (if any) is copied by the specified instruction
+        """
+        if instruction.split(" ", 1)[0].upper() not in ["COPY", "ADD"]:
+            return OTHER_LAYERS
+        for component, names in COMPONENTS:
+            for name in names:
+                if re.search(r"[/\\=]{}\b".format(re.escape(name)), instruction):
+                    return component
+        return OTHER_LAYERS
+
+    def _mapInstructions(self, history, dockerfile):
+        """
+        Maps the most recent history entries to the instructions of the final stage of the supplied Dockerfile
+        (Returns None if the history does not match the instructions, and None for each layer inherited from the base image)
+        """
+
+        # Determine the escape character for the Dockerfile and join any lines that it continues
+        contents = FilesystemUtils.readFile(dockerfile).replace("\r\n", "\n")
+        escapeMatch = re.search("#[\\s]*escape[\\s]*=[\\s]*([^\n])\n", contents)
+        escape = escapeMatch[1] if escapeMatch is not None else "\\"
+        contents = re.sub("{}[ \t]*\n".format(re.escape(escape)), " ", contents)
+
+        # Identify the instructions of the final stage, ignoring build arguments since these do not always produce history entries
+        instructions = []
+        for line in contents.split("\n"):
+            line = line.strip()
+            if len(line) == 0 or line.startswith("#"):
+                continue
+            keyword = line.split(" ", 1)[0].upper()
+            if keyword == "FROM":
+                instructions = []
+            elif keyword != "ARG":
+                instructions.append(re.sub(r"\s+", " ", line))
+
+        if len(instructions) > len(history):
+            return None
+
+        # Verify that each instruction matches the type of command recorded in its history entry
+        offset = len(history) - len(instructions)
+        for instruction, entry in zip(instructions, history[offset:]):
+            keyword = instruction.split(" ", 1)[0].upper()
+            createdBy = entry.get("CreatedBy", "")
+            if keyword == "RUN":
+                if not any(
+                    [
+                        shell in createdBy
+                        for shell in ["RUN", "/bin/sh -c", "cmd /S /C", "powershell"]
+                    ]
+                ):
+                    return None
+            elif keyword not in createdBy.upper():
+                return None
+
+        return [None] * offset + instructions
+
+    def _truncate(self, instruction):
+        """
+        Truncates the specified instruction text for display
+        """
+        return (
+            instruction
+            if len(instruction) <= MAX_INSTRUCTION_LENGTH
+            else instruction[: MAX_INSTRUCTION_LENGTH - 3] + "..."
+        )
@@ -10,11 +10,16 @@ from jinja2 import Environment
 
 class ImageBuildParams(object):
     def __init__(
-        self, dockerfile: str, context_dir: str, env: Optional[Dict[str, str]] = None
+        self,
+        dockerfile: str,
+        context_dir: str,
+        env: Optional[Dict[str, str]] = None,
+        oci_output: Optional[str] = None,
     ):
         self.dockerfile = dockerfile
         self.context_dir = context_dir
         self.env = env
+        self.oci_output = oci_output
 
 
 class ImageBuilder(object):
@@ -28,9 +33,14 @@ class ImageBuilder(object):
         layoutDir: str = None,
         templateContext: Dict[str, str] = None,
         combine: bool = False,
+        analyzer=None,
+        outputOptions: Dict[str, str] = None,
+        cacheRegistry: str = None,
     ):
         """
         Creates an ImageBuilder for the specified build parameters
+        (Output options are passed to the BuildKit image exporter when building Linux images, e.g. to control layer compression)
+        (If a cache registry is specified then the build cache for each Linux image is imported from and exported to that repository)
         """
         self.tempDir = tempDir
         self.platform = platform
@@ -40,6 +50,9 @@ class ImageBuilder(object):
         self.layoutDir = layoutDir
         self.templateContext = templateContext if templateContext is not None else {}
         self.combine = combine
+        self.analyzer = analyzer
+        self.outputOptions = outputOptions if outputOptions is not None else {}
+        self.cacheRegistry = cacheRegistry
 
     def get_built_image_context(self, name):
         """
@@ -62,12 +75,23 @@ class ImageBuilder(object):
         args: [str],
         builtin_name: str = None,
         secrets: Dict[str, str] = None,
+        build_contexts: Dict[str, str] = None,
+        context_overrides: Dict[str, str] = None,
+        oci_output: str = None,
     ):
         context_dir = self.get_built_image_context(
             name if builtin_name is None else builtin_name
         )
         return self.build(
-            name, tags, args, join(context_dir, "Dockerfile"), context_dir, secrets
+            name,
+            tags,
+            args,
+            join(context_dir, "Dockerfile"),
+            context_dir,
+            secrets,
+            build_contexts,
+            context_overrides,
+            oci_output,
         )
 
     def build(
@@ -78,9 +102,14 @@ class ImageBuilder(object):
         dockerfile_template: str,
         context_dir: str,
         secrets: Dict[str, str] = None,
+        build_contexts: Dict[str, str] = None,
+        context_overrides: Dict[str, str] = None,
+        oci_output: str = None,
     ):
         """
         Builds the specified image if it doesn't exist or if we're forcing a rebuild
+        (Any context overrides are merged into our template context for this image only)
+        (If an OCI output path is specified then the image is written to an OCI image layout rather than loaded into the Docker daemon)
         """
 
         workdir = join(self.tempDir, basename(name), self.platform)
@@ -95,7 +124,10 @@ class ImageBuilder(object):
         templateInstance = environment.from_string(
             FilesystemUtils.readFile(dockerfile_template)
         )
-        rendered = templateInstance.render(self.templateContext)
+        templateContext = dict(self.templateContext)
+        if context_overrides is not None:
+            templateContext.update(context_overrides)
+        rendered = templateInstance.render(templateContext)
 
         # Compress excess whitespace introduced during Jinja rendering and save the contents back to disk
         # (Ensure that we still have a single trailing newline at the end of the Dockerfile)
@@ -120,11 +152,59 @@ class ImageBuilder(object):
         # When building Linux images, explicitly specify the target CPU architecture
         archFlags = ["--platform", "linux/amd64"] if self.platform == "linux" else []
 
+        # Pass any image output options to the BuildKit image exporter, or to the OCI exporter if we are writing an OCI image layout
+        # (The OCI exporter writes a tarball by default, so we ask it for a directory unless the path looks like a tarball)
+        imageTags = self._formatTags(name, tags)
+        outputFlags = []
+        if self.platform == "linux" and oci_output is not None:
+            outputFlags = [
+                "--output",
+                ",".join(
+                    [
+                        "type=oci",
+                        "dest={}".format(oci_output),
+                        "name={}".format(imageTags[0]),
+                    ]
+                    + (["tar=false"] if not oci_output.endswith(".tar") else [])
+                    + [
+                        "{}={}".format(option, value)
+                        for option, value in self.outputOptions.items()
+                    ]
+                ),
+            ]
+        elif self.platform == "linux" and len(self.outputOptions) > 0:
+            outputFlags = [
+                "--output",
+                ",".join(
+                    ["type=image"]
+                    + [
+                        "{}={}".format(option, value)
+                        for option, value in self.outputOptions.items()
+                    ]
+                ),
+            ]
+
+        # Share the build cache for the image through the cache registry, so other hosts can reuse the layers we build
+        # (Each image and tag has its own cache reference, since exporting the cache replaces any previous cache at that reference)
+        cacheFlags = []
+        if self.platform == "linux" and self.cacheRegistry is not None:
+            cacheRef = "{}:{}-{}".format(self.cacheRegistry, basename(name), tags[0])
+            cacheFlags = [
+                "--cache-from",
+                "type=registry,ref={}".format(cacheRef),
+                "--cache-to",
+                "type=registry,ref={},mode=min".format(cacheRef),
+            ]
+
+        # Pass any additional named build contexts to BuildKit
+        contextFlags = []
+        if build_contexts is not None:
+            for context, path in build_contexts.items():
+                contextFlags += ["--build-context", "{}={}".format(context, path)]
+
         # Create a temporary directory to hold any files needed for the build
         with tempfile.TemporaryDirectory() as tempDir:
             # Determine whether we are building using `docker buildx` with build secrets
-            imageTags = self._formatTags(name, tags)
-
             if self.platform == "linux" and secrets is not None and len(secrets) > 0:
                 # Create temporary files to store the contents of each of our secrets
                 secretFlags = []
@@ -135,10 +215,17 @@ class ImageBuilder(object):
 
                 # Generate the `docker buildx` command to use our build secrets
                 command = DockerUtils.buildx(
-                    imageTags, context_dir, archFlags + args, secretFlags
+                    imageTags,
+                    context_dir,
+                    archFlags + contextFlags + outputFlags + cacheFlags + args,
+                    secretFlags,
                 )
             else:
-                command = DockerUtils.build(imageTags, context_dir, archFlags + args)
+                command = DockerUtils.build(
+                    imageTags,
+                    context_dir,
+                    archFlags + contextFlags + outputFlags + cacheFlags + args,
+                )
 
             command += ["--file", dockerfile]
 
@@ -153,7 +240,7 @@ class ImageBuilder(object):
                 command,
                 "build",
                 "built",
-                ImageBuildParams(dockerfile, context_dir, env),
+                ImageBuildParams(dockerfile, context_dir, env, oci_output),
             )
 
     def pull(self, image: str) -> None:
@@ -177,10 +264,13 @@ class ImageBuilder(object):
             "{}:{}".format(GlobalConfiguration.resolveTag(name), tag) for tag in tags
         ]
 
-    def _willProcess(self, image: [str]) -> bool:
+    def _willProcess(self, image: [str], oci_output: str = None) -> bool:
         """
         Determines if we will build or pull the specified image, based on our build settings
+        (Images written to an OCI image layout are never loaded into the Docker daemon, so we check for the layout instead)
         """
+        if oci_output is not None:
+            return self.rebuild or not exists(oci_output)
         return self.rebuild or not DockerUtils.exists(image)
 
     def _processImage(
@@ -197,10 +287,11 @@ class ImageBuilder(object):
         """
 
         # Determine if we are processing the image
-        if not self._willProcess(image):
+        ociOutput = build_params.oci_output if build_params is not None else None
+        if not self._willProcess(image, ociOutput):
             self.logger.info(
                 'Image "{}" exists and rebuild not requested, skipping {}.'.format(
-                    image, actionPresentTense
+                    image if ociOutput is None else ociOutput, actionPresentTense
                 )
             )
             return
@@ -271,6 +362,16 @@ class ImageBuilder(object):
 
             return
 
+        # If we are replacing an existing image then record its size so we can report how much it changed
+        previousSize = None
+        if (
+            self.analyzer is not None
+            and build_params is not None
+            and ociOutput is None
+            and DockerUtils.exists(image)
+        ):
+            previousSize = self.analyzer.size(image)
+
         # Attempt to process the image using the supplied command
         startTime = time.time()
         exitCode = subprocess.call(
@@ -288,6 +389,16 @@ class ImageBuilder(object):
                 ),
                 newline=False,
             )
+
+            # Report the size of each filesystem layer in the built image and verify it is within budget
+            # (Images written to an OCI image layout are not in the Docker daemon, so we report their digest and size instead)
+            if self.analyzer is not None and ociOutput is not None:
+                self.analyzer.reportOci(image, ociOutput)
+            elif self.analyzer is not None and build_params is not None:
+                self.analyzer.report(
+                    image, basename(name), build_params.dockerfile, previousSize
+                )
+                self.analyzer.reportCompression(image)
         else:
             raise RuntimeError(
                 'failed to {} image "{}".'.format(actionPresentTense, image)
@@ -0,0 +1,257 @@
+import concurrent.futures, docker, humanfriendly, threading, time
+from .DockerUtils import DockerUtils
+
+# The number of concurrent pushes that we perform by default
+DEFAULT_JOBS = 4
+
+# The number of times we retry a failed push by default, and the delay in seconds before the first retry (which doubles after each attempt)
+DEFAULT_RETRIES = 5
+RETRY_DELAY = 5
+
+# The minimum interval in seconds between progress updates for each image
+PROGRESS_INTERVAL = 30
+
+# The push statuses reported by the Docker daemon for layers that did not need to be uploaded
+EXISTING_LAYER_STATUSES = ["Layer already exists", "Mounted from"]
+
+# The push status reported by the Docker daemon when it retries the upload of an individual layer
+LAYER_RETRY_STATUS = "Retrying in"
+
+
+class ImagePusher(object):
+    def __init__(
+        self, logger, jobs=DEFAULT_JOBS, retries=DEFAULT_RETRIES, dryRun=False
+    ):
+        """
+        Creates an ImagePusher that pushes images to their registries using the specified number of concurrent pushes
+        """
+        self.logger = logger
+        self.jobs = jobs
+        self.retries = retries
+        self.dryRun = dryRun
+        self._lock = threading.Lock()
+
+    def push(self, image):
+        """
+        Pushes the specified image, retrying with exponential backoff if the push fails
+        (The Docker daemon retries the upload of each individual layer itself, so we only retry the push once the daemon gives up,
+        and each retry skips the layers that finished uploading to the registry in earlier attempts)
+        """
+        repository, tag = docker.utils.parse_repository_tag(image)
+        startTime = time.time()
+        totals = {"uploaded": 0, "attempts": 0, "layers": {}, "layerRetries": 0}
+        while True:
+            totals["attempts"] += 1
+            try:
+                digest = self._pushOnce(image, repository, tag, totals)
+                break
+            except (RuntimeError, docker.errors.APIError) as e:
+                if totals["attempts"] > self.retries:
+                    raise RuntimeError(
+                        'failed to push image "{}" after {} attempts: {}'.format(
+                            image, totals["attempts"], e
+                        )
+                    )
+                delay = RETRY_DELAY * (2 ** (totals["attempts"] - 1))
+                self._log(
+                    self.logger.warning,
+                    'Warning: push of image "{}" failed ({}), retrying in {}...'.format(
+                        image, e, humanfriendly.format_timespan(delay)
+                    ),
+                )
+                time.sleep(delay)
+
+        # Layers that were uploaded by an earlier attempt are reported as existing by later attempts, so we count them as pushed
+        statuses = list(totals["layers"].values())
+        result = {
+            "image": image,
+            "digest": digest,
+            "elapsed": time.time() - startTime,
+            "attempts": totals["attempts"],
+            "uploaded": totals["uploaded"],
+            "pushed": statuses.count("pushed"),
+            "existing": statuses.count("existing"),
+            "layerRetries": totals["layerRetries"],
+        }
+        self._log(
+            self.logger.action,
+            'Pushed image "{}" in {} ({} layers uploaded, {} already present, {} layer upload retries, {})'.format(
+                image,
+                humanfriendly.format_timespan(result["elapsed"]),
+                result["pushed"],
+                result["existing"],
+                result["layerRetries"],
+                self._formatThroughput(result["uploaded"], result["elapsed"]),
+            ),
+        )
+        return result
+
+    def pushMultiple(self, images):
+        """
+        Pushes all of the supplied images concurrently and returns the result for each image
+        (Images that share a prefix of filesystem layers are pushed after the image they share layers with, so that each layer is only
+        uploaded once and later pushes can mount the existing layers rather than uploading them again, whereas unrelated images are pushed concurrently)
+        """
+        images = list(dict.fromkeys(images))
+        if self.dryRun == True:
+            for image in images:
+                print(["docker", "push", image])
+            return []
+
+        images, dependencies = self._scheduleImages(images)
+        startTime = time.time()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            # Images are submitted after their dependencies, so waiting on a dependency can never block a queued image that it depends on
+            futures = {}
+            for image in images:
+                futures[image] = executor.submit(
+                    self._pushAfter, image, futures.get(dependencies[image])
+                )
+            concurrent.futures.wait(futures.values())
+
+        # Report the results, raising the first failure (if any) once every push has finished
+        results = [
+            futures[image].result()
+            for image in images
+            if futures[image].exception() is None
+        ]
+        self.report(results, time.time() - startTime)
+        for image in images:
+            if futures[image].exception() is not None:
+                raise futures[image].exception()
+        return results
+
+    def report(self, results, elapsed):
+        """
+        Prints a summary of the supplied push results, including the total throughput
+        """
+        uploaded = sum([result["uploaded"] for result in results])
+        self.logger.action(
+            "Pushed {} images in {} ({} layers uploaded, {} already present, {} at {})".format(
+                len(results),
+                humanfriendly.format_timespan(elapsed),
+                sum([result["pushed"] for result in results]),
+                sum([result["existing"] for result in results]),
+                humanfriendly.format_size(uploaded, binary=True),
+                self._formatThroughput(uploaded, elapsed),
+            )
+        )
+        for result in results:
+            self.logger.info(
+                "  {} ({})".format(result["image"], result["digest"]), False
+            )
+
+    def _scheduleImages(self, images):
+        """
+        Determines which image (if any) each image should be pushed after, based on the prefix of filesystem layers they share
+        (Images are ordered by their number of layers so that base images are pushed before the images derived from them)
+        """
+        client = DockerUtils.connect()
+        details = {}
+        for image in images:
+            attrs = client.images.get(image).attrs
+            details[image] = (attrs["Id"], attrs.get("RootFS", {}).get("Layers", []))
+        images = sorted(images, key=lambda image: len(details[image][1]))
+
+        dependencies = {}
+        for index, image in enumerate(images):
+            imageId, layers = details[image]
+            best = None
+            bestShared = 0
+            for other in images[:index]:
+                otherId, otherLayers = details[other]
+
+                # Additional tags for an image we are already pushing only need their manifest uploaded
+                if otherId == imageId:
+                    best = other
+                    break
+
+                shared = 0
+                for ours, theirs in zip(layers, otherLayers):
+                    if ours != theirs:
+                        break
+                    shared += 1
+                if shared > bestShared:
+                    best = other
+                    bestShared = shared
+
+            # Images that share no layers with any earlier image have no dependency, so they are pushed immediately
+            dependencies[image] = best
+
+        return images, dependencies
+
+    def _pushAfter(self, image, dependency):
+        """
+        Pushes the specified image once the push of the image it depends on (if any) has finished
+        """
+        if dependency is not None:
+            concurrent.futures.wait([dependency])
+        return self.push(image)
+
+    def _pushOnce(self, image, repository, tag, totals):
+        """
+        Performs a single attempt to push the specified image, accumulating the layer statistics and returning the pushed digest
+        """
+        self._log(self.logger.action, 'Pushing image "{}"...'.format(image))
+        client = DockerUtils.connect(timeout=None)
+        uploaded = {}
+        retrying = set()
+        digest = None
+        lastUpdate = time.time()
+        try:
+            for event in client.api.push(repository, tag, stream=True, decode=True):
+                if "error" in event:
+                    raise RuntimeError(event["error"])
+
+                layer = event.get("id")
+                status = event.get("status", "")
+                if status == "Pushing" and layer is not None:
+                    retrying.discard(layer)
+                    uploaded[layer] = max(
+                        uploaded.get(layer, 0),
+                        event.get("progressDetail", {}).get("current", 0),
+                    )
+                elif status == "Pushed":
+                    totals["layers"][layer] = "pushed"
+                elif any([status.startswith(s) for s in EXISTING_LAYER_STATUSES]):
+                    totals["layers"].setdefault(layer, "existing")
+                elif status.startswith(LAYER_RETRY_STATUS) and layer is not None:
+                    # The daemon counts down to each retry of a layer upload, so we only count the first status of each countdown
+                    # (The upload of the layer restarts from the beginning, so we set aside the bytes from the failed upload)
+                    if layer not in retrying:
+                        retrying.add(layer)
+                        totals["layerRetries"] += 1
+                        totals["uploaded"] += uploaded.pop(layer, 0)
+                elif "aux" in event:
+                    digest = event["aux"].get("Digest")
+
+                # Periodically report the progress of long-running pushes
+                if time.time() - lastUpdate >= PROGRESS_INTERVAL:
+                    lastUpdate = time.time()
+                    self._log(
+                        self.logger.info,
+                        'Pushing image "{}": {} uploaded so far'.format(
+                            image,
+                            humanfriendly.format_size(
+                                totals["uploaded"] + sum(uploaded.values()),
+                                binary=True,
+                            ),
+                        ),
+                    )
+        finally:
+            # Bytes uploaded by failed attempts still count towards our throughput, since they were transferred
+            totals["uploaded"] += sum(uploaded.values())
+
+        return digest
+
+    def _formatThroughput(self, size, elapsed):
+        return "{}/s".format(
+            humanfriendly.format_size(
+                int(size / elapsed) if elapsed > 0 else 0, binary=True
+            )
+        )
+
+    def _log(self, method, message):
+        # Serialise output from our worker threads so that lines are not interleaved
+        with self._lock:
+            method(message, False)
@@ -0,0 +1,211 @@
+from .ChunkStream import ChunkStream
+from .DockerUtils import DEFAULT_ENGINE_ROOT, DockerUtils
+from os.path import abspath, dirname, join
+import docker, gzip, hashlib, importlib.util, io, json, stat, tarfile
+
+# The label that identifies the location of the file manifest inside an image
+MANIFEST_LABEL = "com.adamrehn.ue4-docker.manifest"
+
+# The version of the manifest format that we understand
+MANIFEST_VERSION = 1
+
+# The module in the ue4-minimal build context that defines the rules for identifying the component of each file,
+# which we load from there so that manifests generated on the host and inside the container always use the same rules
+COMPONENT_RULES_FILE = join(
+    dirname(dirname(abspath(__file__))),
+    "dockerfiles",
+    "ue4-minimal",
+    "linux",
+    "installed_build_components.py",
+)
+
+# The size of the chunks that we read when hashing files streamed from a container
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class InstalledBuildManifest(object):
+    """
+    Provides access to the file manifest embedded in a ue4-minimal image, which lists the path, size, mode,
+    content hash and component of each file in the Installed Build
+    """
+
+    # The component rules module, which is loaded on demand
+    _rules = None
+
+    def __init__(self, files):
+        """
+        Creates a manifest from a list of file entries, each of which is a dictionary of field values
+        """
+        self.files = files
+
+    @staticmethod
+    def fromData(data: bytes):
+        """
+        Parses a manifest from the compressed data stored in an image
+        """
+        manifest = json.loads(gzip.decompress(data).decode("utf-8"))
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise RuntimeError(
+                "unsupported file manifest version: {}".format(manifest.get("version"))
+            )
+        fields = manifest["fields"]
+        return InstalledBuildManifest(
+            [dict(zip(fields, entry)) for entry in manifest["files"]]
+        )
+
+    @staticmethod
+    def fromFile(path: str):
+        """
+        Reads a manifest from a compressed manifest file on the host system
+        """
+        with open(path, "rb") as f:
+            return InstalledBuildManifest.fromData(f.read())
+
+    @staticmethod
+    def fromImage(image: str):
+        """
+        Reads the manifest embedded in the specified image, without starting a container or exporting the Installed Build
+        """
+
+        # Determine where the manifest is stored inside the image
+        path = DockerUtils.getLabels(image).get(MANIFEST_LABEL)
+        if path is None:
+            raise RuntimeError(
+                'the image "{}" does not contain a file manifest'.format(image)
+            )
+
+        # Copy the manifest out of a stopped container
+        return InstalledBuildManifest.fromData(DockerUtils.readFile(image, path))
+
+    @staticmethod
+    def fromArchive(image: str, root: str = None):
+        """
+        Generates a manifest by streaming the Installed Build out of the specified image and hashing each file,
+        which only holds a single chunk of file data in memory at a time (this is much slower than reading an embedded manifest)
+        """
+
+        # Determine the location of the Installed Build inside the image
+        if root is None:
+            root = InstalledBuildManifest.engineRoot(image)
+
+        container = DockerUtils.create(image)
+        try:
+            stream, _ = container.get_archive(root)
+            reader = io.BufferedReader(ChunkStream(stream), HASH_CHUNK_SIZE)
+            files = []
+            known = {}
+            with tarfile.open(fileobj=reader, mode="r|") as archive:
+                for member in archive:
+                    # Strip the name of the root directory from the path
+                    parts = member.name.split("/", 1)
+                    if len(parts) < 2 or member.isdir():
+                        continue
+                    path = parts[1]
+
+                    # Hash the file contents, or the link target for symbolic links
+                    # (Hard links refer to a file that appeared earlier in the archive, so we reuse its hash and size)
+                    if member.islnk():
+                        digest, size = known.get(
+                            member.linkname.split("/", 1)[-1], (None, 0)
+                        )
+                        mode = stat.S_IFREG | member.mode
+                    else:
+                        hash = hashlib.sha256()
+                        if member.issym():
+                            hash.update(member.linkname.encode("utf-8"))
+                            mode = stat.S_IFLNK | member.mode
+                        else:
+                            data = archive.extractfile(member)
+                            for chunk in iter(lambda: data.read(HASH_CHUNK_SIZE), b""):
+                                hash.update(chunk)
+                            mode = stat.S_IFREG | member.mode
+                        digest = hash.hexdigest()
+
+                        # (Symbolic links use the length of their target as their size, to match `lstat()`)
+                        size = (
+                            len(member.linkname.encode("utf-8"))
+                            if member.issym()
+                            else member.size
+                        )
+
+                    known[path] = (digest, size)
+                    files.append(
+                        {
+                            "path": path,
+                            "size": size,
+                            "mode": mode,
+                            "sha256": digest,
+                            "component": InstalledBuildManifest.identifyComponent(path),
+                        }
+                    )
+        finally:
+            container.remove()
+
+        return InstalledBuildManifest(files)
+
+    @staticmethod
+    def engineRoot(image: str) -> str:
+        """
+        Determines the location of the Installed Build inside the specified image
+        """
+        details = DockerUtils.connect().images.get(image)
+        return DockerUtils.getEngineRoot(
+            details,
+            (
+                "C:/UnrealEngine"
+                if details.attrs.get("Os", "linux") == "windows"
+                else DEFAULT_ENGINE_ROOT
+            ),
+        )
+
+    @staticmethod
+    def identifyComponent(path: str) -> str:
+        """
+        Determines which component of the Installed Build a file belongs to, using the same rules as the ue4-minimal image build
+        """
+        return InstalledBuildManifest._componentRules().identifyComponent(path)
+
+    @staticmethod
+    def _componentRules():
+        # Load the component rules module from the ue4-minimal build context the first time it is needed
+        if InstalledBuildManifest._rules is None:
+            spec = importlib.util.spec_from_file_location(
+                "installed_build_components", COMPONENT_RULES_FILE
+            )
+            InstalledBuildManifest._rules = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(InstalledBuildManifest._rules)
+        return InstalledBuildManifest._rules
+
+    @staticmethod
+    def hasManifest(image: str) -> bool:
+        """
+        Determines whether the specified image contains a file manifest
+        """
+        return MANIFEST_LABEL in DockerUtils.getLabels(image)
+
+    def byPath(self):
+        """
+        Returns the file entries keyed by their path relative to the root of the Installed Build
+        """
+        return {entry["path"]: entry for entry in self.files}
+
+    def totalSize(self) -> int:
+        """
+        Returns the total size in bytes of the files in the Installed Build
+        """
+        return sum([entry["size"] for entry in self.files])
+
+    def componentSizes(self):
+        """
+        Returns the total size in bytes of the files in each component of the Installed Build
+        """
+        sizes = {}
+        for entry in self.files:
+            sizes[entry["component"]] = sizes.get(entry["component"], 0) + entry["size"]
+        return sizes
+
+    def toJson(self, indent=None) -> str:
+        """
+        Serialises the manifest entries as a JSON array
+        """
+        return json.dumps(self.files, indent=indent)
@@ -1,12 +1,16 @@
 from .BuildConfiguration import BuildConfiguration
+from .ChunkStream import ChunkStream
 from .ContainerUtils import ContainerUtils
 from .CredentialEndpoint import CredentialEndpoint
 from .DarwinUtils import DarwinUtils
 from .DockerUtils import DockerUtils
 from .FilesystemUtils import FilesystemUtils
 from .GlobalConfiguration import GlobalConfiguration
+from .ImageAnalyzer import ImageAnalyzer
 from .ImageBuilder import ImageBuilder
 from .ImageCleaner import ImageCleaner
+from .ImagePusher import ImagePusher
+from .InstalledBuildManifest import InstalledBuildManifest
 from .Logger import Logger
 from .NetworkUtils import NetworkUtils
 from .PrettyPrinting import PrettyPrinting
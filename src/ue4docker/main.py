@@ -6,10 +6,16 @@ from .infrastructure import (
     WindowsUtils,
 )
 from .build import build
+from .bundle import bundle
 from .clean import clean
 from .diagnostics_cmd import diagnostics
+from .diff import diff
+from .distribute import distribute
 from .export import export
 from .info import info
+from .optimize import optimize
+from .prefetch import prefetch
+from .push import push
 from .setup_cmd import setup
 from .test import test
 from .version_cmd import version
@@ -66,11 +72,23 @@ def main():
             "function": build,
             "description": "Builds container images for UE4",
         },
+        "bundle": {
+            "function": bundle,
+            "description": "Creates and loads portable bundles of built images",
+        },
         "clean": {"function": clean, "description": "Cleans built container images"},
         "diagnostics": {
             "function": diagnostics,
             "description": "Runs diagnostics to detect issues with the host system configuration",
         },
+        "diff": {
+            "function": diff,
+            "description": "Compares the files in two built engine images",
+        },
+        "distribute": {
+            "function": distribute,
+            "description": "Builds images for multiple releases across multiple Docker hosts",
+        },
         "export": {
             "function": export,
             "description": "Exports components from built container images to the host system",
@@ -79,6 +97,18 @@ def main():
             "function": info,
             "description": "Displays information about the host system and Docker daemon",
         },
+        "optimize": {
+            "function": optimize,
+            "description": "Converts a built image to a lazy-pulling format",
+        },
+        "prefetch": {
+            "function": prefetch,
+            "description": "Pulls an image onto multiple Docker hosts concurrently",
+        },
+        "push": {
+            "function": push,
+            "description": "Pushes built images to their registries",
+        },
         "setup": {
             "function": setup,
             "description": "Automatically configures the host system where possible",
@@ -0,0 +1,243 @@
+import argparse, io, json, os, posixpath, re, shlex, shutil, subprocess, sys, tarfile, tempfile
+from .infrastructure import *
+
+# The lazy-pulling formats that we can convert images to, and the nerdctl flags for each
+FORMATS = {
+    "estargz": ["--estargz", "--oci", "--estargz-record-in"],
+    "zstdchunked": ["--zstdchunked", "--oci", "--zstdchunked-record-in"],
+}
+
+# The containerd namespace used by the Docker daemon when the containerd image store is enabled
+DOCKER_CONTAINERD_NAMESPACE = "moby"
+
+# The location inside the container where the access trace is written
+TRACE_FILE = "/tmp/ue4-docker-trace/trace.log"
+
+# Matches the path argument of the file access system calls that we trace
+TRACE_PATTERN = re.compile(
+    r'\b(?:open|openat|openat2|execve)\((?:[^"]*?, )?"((?:[^"\\]|\\.)*)"(.*)$'
+)
+
+
+def _parseTrace(lines, engineRoot):
+    # Extract the paths of the files under the engine root in the order they were first accessed,
+    # ignoring directories since these are not stored as prioritised file contents
+    paths = []
+    seen = set()
+    for line in lines:
+        match = TRACE_PATTERN.search(line)
+        if match is None or "O_DIRECTORY" in match.group(2):
+            continue
+        path = posixpath.normpath(match.group(1))
+        if not path.startswith(engineRoot + "/") or path in seen:
+            continue
+        seen.add(path)
+        paths.append(path)
+    return paths
+
+
+def _recordTrace(client, image, command, logger):
+    # Determine the location of the Installed Build inside the image
+    engineRoot = InstalledBuildManifest.engineRoot(image)
+
+    # Start a container that we can trace the workload in (strace requires the ptrace capability)
+    logger.action('Starting a container using the "{}" image...'.format(image), False)
+    container = ContainerUtils.start_for_exec(
+        client, image, "linux", cap_add=["SYS_PTRACE"]
+    )
+    with ContainerUtils.automatically_stop(container):
+        # Install strace, which is not included in the build prerequisites image
+        ContainerUtils.exec(
+            container,
+            [
+                "bash",
+                "-c",
+                "apt-get update && apt-get install -y --no-install-recommends strace",
+            ],
+            user="root",
+        )
+
+        # Copy our test scripts into the container so the default workload can use them
+        workspaceDir = "/tmp/workspace"
+        ContainerUtils.exec(container, ["mkdir", "-p", workspaceDir])
+        testDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests")
+        ContainerUtils.copy_from_host(container, testDir, workspaceDir)
+
+        # Run the workload under strace, recording every successful file access by each process
+        logger.action("Recording file accesses for workload: {}".format(command), False)
+        ContainerUtils.exec(
+            container,
+            [
+                "bash",
+                "-c",
+                "mkdir -p {} && strace -f -qq -s 4096 -e trace=open,openat,openat2,execve -e status=successful -o {} bash -c {}".format(
+                    posixpath.dirname(TRACE_FILE), TRACE_FILE, shlex.quote(command)
+                ),
+            ],
+            workdir=workspaceDir,
+        )
+
+        # Stream the trace out of the container and parse it, without holding the whole trace in memory
+        stream, _ = container.get_archive(TRACE_FILE)
+        with tarfile.open(
+            fileobj=io.BufferedReader(ChunkStream(stream)), mode="r|"
+        ) as archive:
+            member = next(archive)
+            lines = io.TextIOWrapper(
+                archive.extractfile(member), encoding="utf-8", errors="replace"
+            )
+            return _parseTrace(lines, engineRoot)
+
+
+def optimize():
+    # Create our logger to generate coloured output on stderr
+    logger = Logger(prefix="[{} optimize] ".format(sys.argv[0]))
+
+    # Our supported command-line arguments
+    parser = argparse.ArgumentParser(
+        prog="{} optimize".format(sys.argv[0]),
+        description="Converts a built image to a lazy-pulling format (eStargz or zstd:chunked), "
+        + "prioritising the files accessed by a recorded workload so that containers can start before the image has been fully pulled. "
+        + "The image may be specified as a tag for the ue4-full image or as a full image reference (e.g. ue4-minimal:5.4.1).",
+    )
+    parser.add_argument("image", help="The image to convert")
+    parser.add_argument(
+        "--format",
+        default="estargz",
+        choices=FORMATS.keys(),
+        help="The lazy-pulling format to convert the image to (default is estargz)",
+    )
+    parser.add_argument(
+        "--suffix",
+        default=None,
+        help="The suffix to append to the tag of the converted image (default is the name of the format, e.g. -estargz)",
+    )
+    parser.add_argument(
+        "--record-in",
+        default=None,
+        metavar="FILE",
+        help="Use an existing access trace rather than recording a new one",
+    )
+    parser.add_argument(
+        "--record-out",
+        default=None,
+        metavar="FILE",
+        help="Save the recorded access trace to the specified file",
+    )
+    parser.add_argument(
+        "--record-only",
+        action="store_true",
+        help="Record the access trace without converting the image (requires --record-out)",
+    )
+    parser.add_argument(
+        "--trace-image",
+        default=None,
+        help="Record the access trace using a different image (e.g. the ue4-full image when converting the ue4-minimal image)",
+    )
+    parser.add_argument(
+        "--command",
+        default="python3 build-and-package.py",
+        help="The workload to record, which is run in the test scripts directory (default is the build-and-package test)",
+    )
+    parser.add_argument(
+        "--nerdctl",
+        default="nerdctl",
+        help="The command used to run nerdctl, which performs the conversion (e.g. `sudo nerdctl`)",
+    )
+
+    # Parse the supplied command-line arguments
+    args = parser.parse_args()
+    if args.record_only == True and args.record_out is None:
+        logger.error("Error: the `--record-only` flag requires `--record-out`.", False)
+        sys.exit(1)
+
+    # Determine if the user specified an image and a tag or just a tag
+    def _resolve(tag):
+        return GlobalConfiguration.resolveTag(
+            "ue4-full:{}".format(tag) if ":" not in tag else tag
+        )
+
+    image = _resolve(args.image)
+    traceImage = _resolve(args.trace_image) if args.trace_image is not None else image
+    for required in set([image, traceImage]):
+        if DockerUtils.exists(required) == False:
+            logger.error(
+                'Error: the specified container image "{}" does not exist.'.format(
+                    required
+                ),
+                False,
+            )
+            sys.exit(1)
+
+    # Verify that we can perform the conversion before we spend time recording a trace
+    nerdctl = shlex.split(args.nerdctl)
+    if args.record_only == False:
+        if shutil.which(nerdctl[0]) is None:
+            logger.error(
+                "Error: converting images requires nerdctl, which could not be found.",
+                False,
+            )
+            sys.exit(1)
+        if not DockerUtils.usesContainerdImageStore():
+            logger.error(
+                "Error: converting images requires the Docker daemon to use the containerd image store, "
+                + "so that nerdctl can access the images built by Docker.",
+                False,
+            )
+            sys.exit(1)
+
+    # Load or record the access trace
+    if args.record_in is not None:
+        with open(args.record_in, "r") as f:
+            paths = [json.loads(line)["path"] for line in f if len(line.strip()) > 0]
+    else:
+        client = DockerUtils.connect()
+        try:
+            paths = _recordTrace(client, traceImage, args.command, logger)
+        except RuntimeError as e:
+            logger.error(
+                "Error: failed to record the access trace: {}".format(e), False
+            )
+            sys.exit(1)
+    logger.info(
+        "Access trace contains {} files that will be prioritised.".format(len(paths)),
+        False,
+    )
+
+    # Write the access trace in the record format used by the stargz-snapshotter tools, which lists one path per line
+    recordFile = args.record_out
+    if recordFile is None:
+        handle, recordFile = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+    FilesystemUtils.writeFile(
+        recordFile,
+        "".join([json.dumps({"path": path.lstrip("/")}) + "\n" for path in paths]),
+    )
+    if args.record_out is not None:
+        logger.info("Wrote access trace to {}".format(args.record_out), False)
+    if args.record_only == True:
+        return
+
+    # Convert the image, prioritising the traced files
+    suffix = args.suffix if args.suffix is not None else "-" + args.format
+    destination = image + suffix
+    logger.action(
+        'Converting "{}" to {} as "{}"...'.format(image, args.format, destination),
+        False,
+    )
+    try:
+        subprocess.run(
+            nerdctl
+            + ["--namespace", DOCKER_CONTAINERD_NAMESPACE, "image", "convert"]
+            + FORMATS[args.format]
+            + [recordFile, image, destination],
+            check=True,
+        )
+    except subprocess.CalledProcessError:
+        logger.error("Error: failed to convert the image.", False)
+        sys.exit(1)
+    finally:
+        if args.record_out is None:
+            os.unlink(recordFile)
+
+    logger.action('Created image "{}".'.format(destination), False)
@@ -0,0 +1,185 @@
+import argparse, concurrent.futures, docker, humanfriendly, sys, threading, time
+from .infrastructure import *
+
+# The number of hosts that we pull to concurrently by default
+DEFAULT_JOBS = 4
+
+# The minimum interval in seconds between progress updates for each host
+PROGRESS_INTERVAL = 30
+
+
+def _hasDigest(client, image, digest):
+    # Determine whether the host already has the image with the specified digest
+    try:
+        repoDigests = client.images.get(image).attrs.get("RepoDigests", None) or []
+    except docker.errors.ImageNotFound:
+        return False
+    return any([entry.endswith("@" + digest) for entry in repoDigests])
+
+
+def _prefetchHost(host, image, digest, log):
+    # Connect to the host and skip it if it already has the image
+    startTime = time.time()
+    client = DockerUtils.connect(host, timeout=None)
+    if digest is not None and _hasDigest(client, image, digest):
+        log(host, "already has {}, skipping.".format(digest))
+        return {"host": host, "status": "skipped", "bytes": 0, "elapsed": 0}
+
+    # Pull the image, tracking the size of each layer that is downloaded
+    log(host, 'pulling "{}"...'.format(image))
+    repository, tag = docker.utils.parse_repository_tag(image)
+    downloaded = {}
+    sizes = {}
+    existing = set()
+    lastUpdate = time.time()
+    for event in client.api.pull(repository, tag, stream=True, decode=True):
+        if "error" in event:
+            raise RuntimeError(event["error"])
+
+        layer = event.get("id")
+        status = event.get("status", "")
+        if status == "Downloading" and layer is not None:
+            progress = event.get("progressDetail", {})
+            downloaded[layer] = max(
+                downloaded.get(layer, 0), progress.get("current", 0)
+            )
+            sizes[layer] = progress.get("total", downloaded[layer])
+        elif status == "Download complete" and layer in sizes:
+            downloaded[layer] = sizes[layer]
+        elif status == "Already exists":
+            existing.add(layer)
+
+        # Periodically report the progress of the pull
+        if time.time() - lastUpdate >= PROGRESS_INTERVAL:
+            lastUpdate = time.time()
+            log(
+                host,
+                "{} downloaded so far".format(
+                    humanfriendly.format_size(sum(downloaded.values()), binary=True)
+                ),
+            )
+
+    # Verify that the host now has the image we expected, since the tag may have been updated during the prefetch
+    if digest is not None and not _hasDigest(client, image, digest):
+        log(host, "warning: pulled image does not match {}.".format(digest))
+
+    result = {
+        "host": host,
+        "status": "pulled",
+        "bytes": sum(downloaded.values()),
+        "elapsed": time.time() - startTime,
+    }
+    log(
+        host,
+        "pulled {} in {} ({} layers downloaded, {} already present).".format(
+            humanfriendly.format_size(result["bytes"], binary=True),
+            humanfriendly.format_timespan(result["elapsed"]),
+            len(downloaded),
+            len(existing),
+        ),
+    )
+    return result
+
+
+def prefetch():
+    # Create our logger to generate coloured output on stderr
+    logger = Logger(prefix="[{} prefetch] ".format(sys.argv[0]))
+
+    # Our supported command-line arguments
+    parser = argparse.ArgumentParser(
+        prog="{} prefetch".format(sys.argv[0]),
+        description="Pulls an image onto multiple Docker hosts concurrently, so that CI agents have the image before their first job. "
+        + "The image may be specified as a tag for the ue4-full image or as a full image reference (e.g. ue4-minimal:5.4.1). "
+        + "Each host may be specified as a Docker endpoint URL (e.g. ssh://agent01 or tcp://agent01:2376) or as the name of a Docker context.",
+    )
+    parser.add_argument("image", help="The image to pull")
+    parser.add_argument(
+        "hosts", nargs="*", help="The Docker hosts to pull the image on"
+    )
+    parser.add_argument(
+        "--hosts-file",
+        default=None,
+        metavar="FILE",
+        help="Read the list of Docker hosts from the specified file (one per line)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        default=DEFAULT_JOBS,
+        type=int,
+        help="The maximum number of hosts to pull the image on concurrently (default is {})".format(
+            DEFAULT_JOBS
+        ),
+    )
+
+    # Parse the supplied command-line arguments
+    args = parser.parse_args()
+    hosts = list(args.hosts)
+    if args.hosts_file is not None:
+        hosts.extend(DockerUtils.readHostsFile(args.hosts_file))
+    hosts = list(dict.fromkeys(hosts))
+    if len(hosts) == 0:
+        logger.error("Error: no Docker hosts were specified.", False)
+        sys.exit(1)
+
+    # Determine if the user specified an image and a tag or just a tag
+    image = GlobalConfiguration.resolveTag(
+        "ue4-full:{}".format(args.image) if ":" not in args.image else args.image
+    )
+
+    # Resolve the digest of the image in the registry, so we can skip hosts that already have it
+    try:
+        digest = DockerUtils.connect().images.get_registry_data(image).id
+        logger.info('Image "{}" has digest {}'.format(image, digest), False)
+    except docker.errors.DockerException as e:
+        logger.warning(
+            'Warning: could not resolve the digest of "{}" ({}), so every host will pull the image.'.format(
+                image, e
+            ),
+            False,
+        )
+        digest = None
+
+    # Serialise output from our worker threads so that lines are not interleaved
+    lock = threading.Lock()
+
+    def _log(host, message):
+        with lock:
+            logger.info("{}: {}".format(host, message), False)
+
+    # Pull the image on each host, with bounded parallelism
+    startTime = time.time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {
+            host: executor.submit(_prefetchHost, host, image, digest, _log)
+            for host in hosts
+        }
+        concurrent.futures.wait(futures.values())
+
+    # Report the result for each host
+    results = []
+    for host in hosts:
+        try:
+            results.append(futures[host].result())
+        except Exception as e:
+            results.append({"host": host, "status": "failed", "bytes": 0})
+            logger.error("Error: {}: {}".format(host, e), False)
+
+    total = sum([result["bytes"] for result in results])
+    counts = {
+        status: len([result for result in results if result["status"] == status])
+        for status in ["pulled", "skipped", "failed"]
+    }
+    logger.action(
+        "Prefetched {} to {} hosts in {} ({} pulled, {} already up to date, {} failed, {} downloaded in total)".format(
+            image,
+            len(hosts),
+            humanfriendly.format_timespan(time.time() - startTime),
+            counts["pulled"],
+            counts["skipped"],
+            counts["failed"],
+            humanfriendly.format_size(total, binary=True),
+        )
+    )
+    if counts["failed"] > 0:
+        sys.exit(1)
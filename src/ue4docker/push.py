@@ -0,0 +1,80 @@
+import argparse, sys
+from .infrastructure import *
+from .infrastructure.ImagePusher import DEFAULT_JOBS, DEFAULT_RETRIES
+
+# The images that are pushed when only a tag is specified (ue4-source is only needed during the build process, so it is never pushed by default)
+DEFAULT_IMAGES = ["ue4-minimal", "ue4-minimal-symbols", "ue4-full"]
+
+
+def push():
+    # Create our logger to generate coloured output on stderr
+    logger = Logger(prefix="[{} push] ".format(sys.argv[0]))
+
+    # Our supported command-line arguments
+    parser = argparse.ArgumentParser(
+        prog="{} push".format(sys.argv[0]),
+        description="Pushes built container images to their registries concurrently, retrying failed pushes. "
+        + "Each image may be specified as a tag, which pushes the ue4-minimal, ue4-minimal-symbols and ue4-full images with that tag (where they exist), "
+        + "or as a full image reference (e.g. ue4-full:5.4.1).",
+    )
+    parser.add_argument("images", nargs="+", help="The images or tags to push")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        default=DEFAULT_JOBS,
+        type=int,
+        help="The maximum number of images to push concurrently (default is {})".format(
+            DEFAULT_JOBS
+        ),
+    )
+    parser.add_argument(
+        "--retries",
+        default=DEFAULT_RETRIES,
+        type=int,
+        help="The number of times to retry a failed push (default is {})".format(
+            DEFAULT_RETRIES
+        ),
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print docker commands instead of running them",
+    )
+
+    # Parse the supplied command-line arguments
+    args = parser.parse_args()
+
+    # Expand any tags into the list of images with that tag
+    images = []
+    for image in args.images:
+        if ":" in image:
+            image = GlobalConfiguration.resolveTag(image)
+            if DockerUtils.exists(image) == False:
+                logger.error(
+                    'Error: the specified container image "{}" does not exist.'.format(
+                        image
+                    ),
+                    False,
+                )
+                sys.exit(1)
+            images.append(image)
+        else:
+            matching = [
+                "{}:{}".format(GlobalConfiguration.resolveTag(name), image)
+                for name in DEFAULT_IMAGES
+            ]
+            matching = [match for match in matching if DockerUtils.exists(match)]
+            if len(matching) == 0:
+                logger.error(
+                    'Error: no built images have the tag "{}".'.format(image), False
+                )
+                sys.exit(1)
+            images.extend(matching)
+
+    # Push the images
+    pusher = ImagePusher(logger, args.jobs, args.retries, args.dry_run)
+    try:
+        pusher.pushMultiple(images)
+    except Exception as e:
+        logger.error("Error: {}".format(e), False)
+        sys.exit(1)
@@ -8,6 +8,7 @@ from docker.errors import ImageNotFound
 
 from .infrastructure import (
     ContainerUtils,
+    DockerUtils,
     GlobalConfiguration,
     Logger,
 )
@@ -18,7 +19,7 @@ def test():
     logger = Logger(prefix="[{} test] ".format(sys.argv[0]))
 
     # Create our Docker API client
-    client = docker.from_env()
+    client = DockerUtils.connect()
 
     # Check that an image tag has been specified
     if len(sys.argv) > 1 and sys.argv[1].strip("-") not in ["h", "help"]:
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+import argparse, subprocess, sys, traceback, urllib.request
+from pathlib import Path
+
+try:
+    import colorama
+    from termcolor import colored
+except:
+    print(
+        "Error: could not import colorama and termcolor! Make sure you install ue4-docker at least once before running the test suite."
+    )
+    sys.exit(1)
+
+
+# The name of the container that runs our local registry
+REGISTRY_CONTAINER = "ue4-docker-test-registry"
+
+# The Dockerfiles for our test images: a base image, an image derived from it that shares its layers, and an unrelated image
+TEST_IMAGES = {
+    "base": "FROM busybox\nRUN head -c 16777216 /dev/urandom > /base.bin\n",
+    "derived": "FROM {registry}/ue4-docker-test/base:latest\nRUN head -c 16777216 /dev/urandom > /derived.bin\n",
+    "unrelated": "FROM alpine\nRUN head -c 16777216 /dev/urandom > /unrelated.bin\n",
+}
+
+
+# Logs a message with the specified colour, making it bold to distinguish it from `ue4-docker push` log output
+def log(message: str, colour: str):
+    print(colored(message, color=colour, attrs=["bold"]), file=sys.stderr, flush=True)
+
+
+# Logs a command and runs it
+def run(command: list, **kwargs: dict) -> subprocess.CompletedProcess:
+    log(" ".join(command), colour="green")
+    return subprocess.run(command, **{"check": True, **kwargs})
+
+
+# Raises an error if the specified condition does not hold
+def check(condition: bool, message: str) -> None:
+    if not condition:
+        raise RuntimeError(message)
+    log(f"OK: {message}", colour="cyan")
+
+
+# Retrieves the digest of the manifest for the specified image from our local registry
+def registryDigest(registry: str, repository: str, tag: str) -> str:
+    request = urllib.request.Request(
+        f"http://{registry}/v2/{repository}/manifests/{tag}",
+        method="HEAD",
+        headers={
+            "Accept": ", ".join(
+                [
+                    "application/vnd.docker.distribution.manifest.v2+json",
+                    "application/vnd.oci.image.manifest.v1+json",
+                ]
+            )
+        },
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.headers["Docker-Content-Digest"]
+
+
+# Pushes our test images to the local registry and verifies the results
+def testPush(registry: str) -> None:
+    from ue4docker.infrastructure import ImagePusher, Logger
+
+    images = {name: f"{registry}/ue4-docker-test/{name}:latest" for name in TEST_IMAGES}
+    for name, dockerfile in TEST_IMAGES.items():
+        run(
+            ["docker", "build", "-t", images[name], "-"],
+            input=dockerfile.format(registry=registry).encode("utf-8"),
+        )
+
+    # Verify that only the images that share a prefix of layers are ordered
+    pusher = ImagePusher(Logger(prefix="[test-push-registry] "), jobs=4)
+    _, dependencies = pusher._scheduleImages(list(images.values()))
+    check(
+        dependencies[images["derived"]] == images["base"],
+        "the derived image is pushed after the base image",
+    )
+    check(
+        dependencies[images["base"]] is None
+        and dependencies[images["unrelated"]] is None,
+        "the base image and the unrelated image are pushed concurrently",
+    )
+
+    # Push the images and verify that the layers shared with the base image were not uploaded again
+    results = {
+        result["image"]: result for result in pusher.pushMultiple(list(images.values()))
+    }
+    check(
+        results[images["derived"]]["pushed"] == 1,
+        "only the layer that is unique to the derived image was uploaded when pushing it",
+    )
+    for name, image in images.items():
+        check(
+            registryDigest(registry, f"ue4-docker-test/{name}", "latest")
+            == results[image]["digest"],
+            f"the registry has the pushed digest for {image}",
+        )
+
+    # Verify that pushing the same images again uploads nothing
+    results = pusher.pushMultiple(list(images.values()))
+    check(
+        all([result["pushed"] == 0 for result in results]),
+        "pushing the images again does not upload any layers",
+    )
+
+    # Verify that a push to a registry that is not running fails once the retries are exhausted
+    unreachable = "localhost:1/ue4-docker-test/base:latest"
+    run(["docker", "tag", images["base"], unreachable])
+    try:
+        ImagePusher(Logger(prefix="[test-push-registry] "), retries=1).push(unreachable)
+        check(False, "a push to an unreachable registry fails")
+    except RuntimeError as e:
+        check("after 2 attempts" in str(e), "a push to an unreachable registry fails")
+    finally:
+        run(["docker", "rmi", unreachable])
+
+
+if __name__ == "__main__":
+
+    try:
+        # Initialise coloured log output under Windows
+        colorama.init()
+
+        # Resolve the path to the root of the repository
+        repoRoot = Path(__file__).parent.parent
+
+        # Parse our command-line arguments
+        parser = argparse.ArgumentParser(
+            description="Tests `ue4-docker push` against a local registry:2 instance using small test images"
+        )
+        parser.add_argument(
+            "--port",
+            type=int,
+            default=5000,
+            help="The port on which to run the local registry (default is 5000)",
+        )
+        parser.add_argument(
+            "--keep-images",
+            action="store_true",
+            help="Don't remove the test images and the registry container afterwards",
+        )
+        args = parser.parse_args()
+        registry = f"localhost:{args.port}"
+
+        # Ensure any local changes to ue4-docker are installed
+        run([sys.executable, "-m", "pip", "install", "--user", str(repoRoot)])
+
+        # Start the local registry and run the tests
+        run(
+            [
+                "docker",
+                "run",
+                "-d",
+                "-p",
+                f"{args.port}:5000",
+                "--name",
+                REGISTRY_CONTAINER,
+                "registry:2",
+            ]
+        )
+        try:
+            testPush(registry)
+        finally:
+            if not args.keep_images:
+                run(["docker", "rm", "-f", REGISTRY_CONTAINER])
+                run(
+                    ["docker", "rmi"]
+                    + [
+                        f"{registry}/ue4-docker-test/{name}:latest"
+                        for name in TEST_IMAGES
+                    ],
+                    check=False,
+                )
+
+        log("All push tests passed.", colour="green")
+
+    except Exception as e:
+        log(traceback.format_exc(), colour="red")
+        sys.exit(1)